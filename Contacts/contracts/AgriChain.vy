@@ -20,11 +20,49 @@ struct Produce:
     listed_timestamp: uint256
     sold_timestamp: uint256
 
+# Most lots accepted by a single listProduceBatch call
+MAX_BATCH_SIZE: constant(uint256) = 50
+# Most IDs returned by one getAvailableProducesPage call
+MAX_PAGE_SIZE: constant(uint256) = 500
+# Most IDs accepted by one getProduceDetailsBatch call
+MAX_DETAILS_BATCH: constant(uint256) = 200
+# Most IDs covered by one getSoldBitmap call, 256 per word
+MAX_SOLD_BITMAP_IDS: constant(uint256) = 4096
+MAX_SOLD_BITMAP_WORDS: constant(uint256) = MAX_SOLD_BITMAP_IDS // 256
+
+# Bit layout of the packed produce words
+ADDRESS_MASK: constant(uint256) = 2**160 - 1
+UINT128_MASK: constant(uint256) = 2**128 - 1
+TIMESTAMP_MASK: constant(uint256) = 2**64 - 1
+TIMESTAMP_SHIFT: constant(uint256) = 160
+NAME_LENGTH_SHIFT: constant(uint256) = 224
+# Names up to this many bytes are stored in a single word
+SHORT_NAME_LENGTH: constant(uint256) = 32
+
 # State variables
 produce_counter: public(uint256)
-produces: public(HashMap[uint256, Produce])
-farmer_produces: public(HashMap[address, DynArray[uint256, 1000]])  # farmer -> produce IDs
-buyer_purchases: public(HashMap[address, DynArray[uint256, 1000]])  # buyer -> produce IDs
+
+# Per-address produce indexes: count plus position -> produce ID, so an
+# append costs the same however many entries an account already has
+farmer_produces: public(HashMap[address, HashMap[uint256, uint256]])  # farmer -> position -> produce ID
+farmer_produce_count: HashMap[address, uint256]
+buyer_purchases: public(HashMap[address, HashMap[uint256, uint256]])  # buyer -> position -> produce ID
+buyer_purchase_count: HashMap[address, uint256]
+
+# Produces are stored packed, a few words each instead of one slot per
+# Produce field; _load_produce rebuilds the Produce struct the views return.
+# The ID is the mapping key and total_price is quantity * price_per_unit,
+# so neither is stored.
+produce_listing: HashMap[uint256, uint256]  # farmer | listed_timestamp << 160 | name length << 224
+produce_amounts: HashMap[uint256, uint256]  # quantity | price_per_unit << 128
+produce_sale: HashMap[uint256, uint256]  # buyer | sold_timestamp << 160 (0 while unsold)
+produce_short_names: HashMap[uint256, bytes32]  # names of up to SHORT_NAME_LENGTH bytes, left aligned
+produce_long_names: HashMap[uint256, String[100]]  # longer names
+
+# Unsold produce IDs as an unordered set: added on listing, swap-and-pop removed on sale
+available_ids: HashMap[uint256, uint256]  # position -> produce ID
+available_position: HashMap[uint256, uint256]  # produce ID -> position + 1 (0 = not available)
+available_count: uint256
 
 # ============================================================================
 # EVENTS
@@ -71,35 +109,69 @@ def listProduce(produce_name: String[100], quantity: uint256, price_per_unit: ui
         quantity: Quantity available (in kg or units)
         price_per_unit: Price per unit in wei
     """
+    self._list_produce(produce_name, quantity, price_per_unit)
+
+@external
+def listProduceBatch(
+    names: DynArray[String[100], MAX_BATCH_SIZE],
+    quantities: DynArray[uint256, MAX_BATCH_SIZE],
+    prices: DynArray[uint256, MAX_BATCH_SIZE]
+):
+    """
+    Farmer lists several lots in one transaction (one ProduceListed per lot)
+
+    Args:
+        names: Name/description of each lot
+        quantities: Quantity of each lot (in kg or units)
+        prices: Price per unit of each lot in wei
+    """
+    assert len(names) > 0, "Batch cannot be empty"
+    assert len(names) == len(quantities) and len(names) == len(prices), "Batch lengths differ"
+
+    for i: uint256 in range(MAX_BATCH_SIZE):
+        if i >= len(names):
+            break
+        self._list_produce(names[i], quantities[i], prices[i])
+
+@internal
+def _list_produce(produce_name: String[100], quantity: uint256, price_per_unit: uint256):
+    """Validate, store and announce one listing from msg.sender"""
     # Validation
     assert len(produce_name) > 0, "Produce name cannot be empty"
     assert quantity > 0, "Quantity must be greater than 0"
     assert price_per_unit > 0, "Price per unit must be greater than 0"
 
+    assert quantity <= UINT128_MASK, "Quantity too large"
+    assert price_per_unit <= UINT128_MASK, "Price per unit too large"
+
     # Calculate total price
     total_price: uint256 = quantity * price_per_unit
 
-    # Increment counter and create new produce
+    # Increment counter and store the packed produce
     self.produce_counter += 1
     produce_id: uint256 = self.produce_counter
 
-    # Create produce struct
-    new_produce: Produce = Produce(
-        id=produce_id,
-        farmer=msg.sender,
-        name=produce_name,
-        quantity=quantity,
-        price_per_unit=price_per_unit,
-        total_price=total_price,
-        is_sold=False,
-        buyer=empty(address),
-        listed_timestamp=block.timestamp,
-        sold_timestamp=0
+    name_length: uint256 = len(produce_name)
+    self.produce_listing[produce_id] = (
+        convert(msg.sender, uint256)
+        | block.timestamp << TIMESTAMP_SHIFT
+        | name_length << NAME_LENGTH_SHIFT
     )
-
-    # Store produce
-    self.produces[produce_id] = new_produce
-    self.farmer_produces[msg.sender].append(produce_id)
+    self.produce_amounts[produce_id] = quantity | price_per_unit << 128
+    if name_length <= SHORT_NAME_LENGTH:
+        self.produce_short_names[produce_id] = extract32(concat(convert(produce_name, Bytes[100]), empty(bytes32)), 0)
+    else:
+        self.produce_long_names[produce_id] = produce_name
+
+    # Add to the farmer's index
+    farmer_count: uint256 = self.farmer_produce_count[msg.sender]
+    self.farmer_produces[msg.sender][farmer_count] = produce_id
+    self.farmer_produce_count[msg.sender] = farmer_count + 1
+
+    # Add to the available set
+    self.available_ids[self.available_count] = produce_id
+    self.available_count += 1
+    self.available_position[produce_id] = self.available_count
 
     # Emit event
     log ProduceListed(
@@ -124,33 +196,101 @@ def buyProduce(produce_id: uint256):
     # Validation
     assert produce_id > 0 and produce_id <= self.produce_counter, "Invalid produce ID"
 
-    produce: Produce = self.produces[produce_id]
-    assert not produce.is_sold, "Produce already sold"
-    assert produce.farmer != msg.sender, "Farmer cannot buy their own produce"
-    assert msg.value == produce.total_price, "Incorrect payment amount"
+    listing: uint256 = self.produce_listing[produce_id]
+    farmer: address = convert(listing & ADDRESS_MASK, address)
+    assert self.produce_sale[produce_id] == 0, "Produce already sold"
+    assert farmer != msg.sender, "Farmer cannot buy their own produce"
+    amounts: uint256 = self.produce_amounts[produce_id]
+    quantity: uint256 = amounts & UINT128_MASK
+    total_price: uint256 = quantity * (amounts >> 128)
+    assert msg.value == total_price, "Incorrect payment amount"
 
-    # Update produce status
-    self.produces[produce_id].is_sold = True
-    self.produces[produce_id].buyer = msg.sender
-    self.produces[produce_id].sold_timestamp = block.timestamp
+    # Update produce status (one word: buyer and sale time)
+    self.produce_sale[produce_id] = convert(msg.sender, uint256) | block.timestamp << TIMESTAMP_SHIFT
 
     # Add to buyer's purchase history
-    self.buyer_purchases[msg.sender].append(produce_id)
+    buyer_count: uint256 = self.buyer_purchase_count[msg.sender]
+    self.buyer_purchases[msg.sender][buyer_count] = produce_id
+    self.buyer_purchase_count[msg.sender] = buyer_count + 1
+
+    # Remove from the available set
+    self._remove_available(produce_id)
 
     # Transfer payment to farmer
-    send(produce.farmer, msg.value)
+    send(farmer, msg.value)
 
     # Emit event
     log ProduceSold(
         produce_id=produce_id,
-        farmer=produce.farmer,
+        farmer=farmer,
         buyer=msg.sender,
-        name=produce.name,
-        quantity=produce.quantity,
-        total_price=produce.total_price,
+        name=self._load_name(produce_id, listing),
+        quantity=quantity,
+        total_price=total_price,
         timestamp=block.timestamp
     )
 
+@internal
+def _remove_available(produce_id: uint256):
+    """Swap-and-pop produce_id out of the available set (O(1))"""
+    position: uint256 = self.available_position[produce_id] - 1
+    last_position: uint256 = self.available_count - 1
+    if position != last_position:
+        last_id: uint256 = self.available_ids[last_position]
+        self.available_ids[position] = last_id
+        self.available_position[last_id] = position + 1
+    self.available_ids[last_position] = 0
+    self.available_position[produce_id] = 0
+    self.available_count = last_position
+
+@internal
+@view
+def _load_name(produce_id: uint256, listing: uint256) -> String[100]:
+    """Name of a produce, given its packed listing word"""
+    name_length: uint256 = listing >> NAME_LENGTH_SHIFT
+    if name_length > SHORT_NAME_LENGTH:
+        return self.produce_long_names[produce_id]
+    return convert(slice(self.produce_short_names[produce_id], 0, name_length), String[SHORT_NAME_LENGTH])
+
+@internal
+@view
+def _load_produce(produce_id: uint256) -> Produce:
+    """Unpack a stored produce into the Produce struct (empty if it doesn't exist)"""
+    listing: uint256 = self.produce_listing[produce_id]
+    if listing == 0:
+        return empty(Produce)
+    amounts: uint256 = self.produce_amounts[produce_id]
+    sale: uint256 = self.produce_sale[produce_id]
+    quantity: uint256 = amounts & UINT128_MASK
+    price_per_unit: uint256 = amounts >> 128
+    return Produce(
+        id=produce_id,
+        farmer=convert(listing & ADDRESS_MASK, address),
+        name=self._load_name(produce_id, listing),
+        quantity=quantity,
+        price_per_unit=price_per_unit,
+        total_price=quantity * price_per_unit,
+        is_sold=sale != 0,
+        buyer=convert(sale & ADDRESS_MASK, address),
+        listed_timestamp=(listing >> TIMESTAMP_SHIFT) & TIMESTAMP_MASK,
+        sold_timestamp=(sale >> TIMESTAMP_SHIFT) & TIMESTAMP_MASK
+    )
+
+@external
+@view
+def produces(produce_id: uint256) -> Produce:
+    """
+    Get a produce by ID (empty for unknown IDs), as the public getter of the
+    former produces mapping did
+
+    Args:
+        produce_id: ID of the produce
+
+    Returns:
+        Produce struct with all details
+    """
+    return self._load_produce(produce_id)
+
 @external
 @view
 def getProduceDetails(produce_id: uint256) -> Produce:
@@ -164,7 +304,28 @@ def getProduceDetails(produce_id: uint256) -> Produce:
         Produce struct with all details
     """
     assert produce_id > 0 and produce_id <= self.produce_counter, "Invalid produce ID"
-    return self.produces[produce_id]
+    return self._load_produce(produce_id)
+
+@external
+@view
+def getProduceDetailsBatch(ids: DynArray[uint256, MAX_DETAILS_BATCH]) -> DynArray[Produce, MAX_DETAILS_BATCH]:
+    """
+    Get the details of many produce items in one call
+
+    Invalid IDs don't revert the call: their slot holds an empty Produce
+    (id == 0), so results stay aligned with the requested IDs.
+
+    Args:
+        ids: IDs of the produces
+
+    Returns:
+        One Produce struct per requested ID
+    """
+    result: DynArray[Produce, MAX_DETAILS_BATCH] = []
+    for produce_id: uint256 in ids:
+        # Unknown IDs (0 included) have no listing word and load as empty
+        result.append(self._load_produce(produce_id))
+    return result
 
 # ============================================================================
 # VIEW FUNCTIONS
@@ -174,26 +335,67 @@ def getProduceDetails(produce_id: uint256) -> Produce:
 @view
 def getAvailableProduces() -> DynArray[uint256, 1000]:
     """
-    Get all available (unsold) produce IDs
+    Get available (unsold) produce IDs, up to the first 1000 of the set
+
+    Kept for existing clients; use getAvailableProducesPage to read them all.
+    The set is unordered (sales swap the last ID into the sold one's place).
 
     Returns:
         Array of available produce IDs
     """
     available: DynArray[uint256, 1000] = []
 
-    for i: uint256 in range(1, 1001):  # Max 1000 produces
-        if i > self.produce_counter:
+    for i: uint256 in range(1000):
+        if i >= self.available_count:
             break
-        if not self.produces[i].is_sold:
-            available.append(i)
+        available.append(self.available_ids[i])
 
     return available
 
+@external
+@view
+def getAvailableProducesPage(offset: uint256, limit: uint256) -> DynArray[uint256, MAX_PAGE_SIZE]:
+    """
+    Get one page of available (unsold) produce IDs
+
+    Cost depends on the page size only, not on how many produces were ever
+    listed. Pages are positions in the unordered available set, so walk them
+    at a single block to get a consistent snapshot.
+
+    Args:
+        offset: Position of the first ID to return
+        limit: Most IDs to return (capped at MAX_PAGE_SIZE)
+
+    Returns:
+        Array of available produce IDs
+    """
+    page: DynArray[uint256, MAX_PAGE_SIZE] = []
+
+    for i: uint256 in range(MAX_PAGE_SIZE):
+        if i >= limit or offset + i >= self.available_count:
+            break
+        page.append(self.available_ids[offset + i])
+
+    return page
+
+@external
+@view
+def getAvailableProduceCount() -> uint256:
+    """
+    Get the number of available (unsold) produces
+
+    Returns:
+        Available produce count
+    """
+    return self.available_count
+
 @external
 @view
 def getFarmerProduces(farmer: address) -> DynArray[uint256, 1000]:
     """
-    Get all produce IDs listed by a specific farmer
+    Get produce IDs listed by a specific farmer, up to their first 1000
+
+    Kept for existing clients; use getFarmerProducesPage to read them all.
 
     Args:
         farmer: Address of the farmer
@@ -201,21 +403,148 @@ def getFarmerProduces(farmer: address) -> DynArray[uint256, 1000]:
     Returns:
         Array of produce IDs listed by the farmer
     """
-    return self.farmer_produces[farmer]
+    produces: DynArray[uint256, 1000] = []
+    count: uint256 = self.farmer_produce_count[farmer]
+
+    for i: uint256 in range(1000):
+        if i >= count:
+            break
+        produces.append(self.farmer_produces[farmer][i])
+
+    return produces
+
+@external
+@view
+def getFarmerProducesPage(farmer: address, offset: uint256, limit: uint256) -> DynArray[uint256, MAX_PAGE_SIZE]:
+    """
+    Get one page of the produce IDs listed by a specific farmer, oldest first
+
+    Args:
+        farmer: Address of the farmer
+        offset: Position of the first ID to return
+        limit: Most IDs to return (capped at MAX_PAGE_SIZE)
+
+    Returns:
+        Array of produce IDs listed by the farmer
+    """
+    page: DynArray[uint256, MAX_PAGE_SIZE] = []
+    count: uint256 = self.farmer_produce_count[farmer]
+
+    for i: uint256 in range(MAX_PAGE_SIZE):
+        if i >= limit or offset + i >= count:
+            break
+        page.append(self.farmer_produces[farmer][offset + i])
+
+    return page
+
+@external
+@view
+def getFarmerProduceCount(farmer: address) -> uint256:
+    """
+    Get the number of produces listed by a specific farmer
+
+    Args:
+        farmer: Address of the farmer
+
+    Returns:
+        Farmer's produce count
+    """
+    return self.farmer_produce_count[farmer]
 
 @external
 @view
 def getBuyerPurchases(buyer: address) -> DynArray[uint256, 1000]:
     """
-    Get all produce IDs purchased by a specific buyer
+    Get produce IDs purchased by a specific buyer, up to their first 1000
+
+    Kept for existing clients; use getBuyerPurchasesPage to read them all.
+
+    Args:
+        buyer: Address of the buyer
+
+    Returns:
+        Array of produce IDs purchased by the buyer
+    """
+    purchases: DynArray[uint256, 1000] = []
+    count: uint256 = self.buyer_purchase_count[buyer]
+
+    for i: uint256 in range(1000):
+        if i >= count:
+            break
+        purchases.append(self.buyer_purchases[buyer][i])
+
+    return purchases
+
+@external
+@view
+def getBuyerPurchasesPage(buyer: address, offset: uint256, limit: uint256) -> DynArray[uint256, MAX_PAGE_SIZE]:
+    """
+    Get one page of the produce IDs purchased by a specific buyer, oldest first
 
     Args:
         buyer: Address of the buyer
+        offset: Position of the first ID to return
+        limit: Most IDs to return (capped at MAX_PAGE_SIZE)
 
     Returns:
         Array of produce IDs purchased by the buyer
     """
-    return self.buyer_purchases[buyer]
+    page: DynArray[uint256, MAX_PAGE_SIZE] = []
+    count: uint256 = self.buyer_purchase_count[buyer]
+
+    for i: uint256 in range(MAX_PAGE_SIZE):
+        if i >= limit or offset + i >= count:
+            break
+        page.append(self.buyer_purchases[buyer][offset + i])
+
+    return page
+
+@external
+@view
+def getBuyerPurchaseCount(buyer: address) -> uint256:
+    """
+    Get the number of produces purchased by a specific buyer
+
+    Args:
+        buyer: Address of the buyer
+
+    Returns:
+        Buyer's purchase count
+    """
+    return self.buyer_purchase_count[buyer]
+
+@external
+@view
+def getSoldBitmap(start_id: uint256, count: uint256) -> DynArray[uint256, MAX_SOLD_BITMAP_WORDS]:
+    """
+    Get the sold flags of a range of produce IDs, 256 to a word
+
+    Bit i (least significant first) of word i // 256 is set if produce
+    start_id + i is sold. IDs that don't exist read as unsold.
+
+    Args:
+        start_id: First produce ID of the range
+        count: Number of IDs (capped at MAX_SOLD_BITMAP_IDS)
+
+    Returns:
+        ceil(count / 256) words of sold flags
+    """
+    words: DynArray[uint256, MAX_SOLD_BITMAP_WORDS] = []
+    word: uint256 = 0
+    size: uint256 = min(count, MAX_SOLD_BITMAP_IDS)
+
+    for i: uint256 in range(MAX_SOLD_BITMAP_IDS):
+        if i >= size:
+            break
+        if self.produce_sale[start_id + i] != 0:
+            word |= 1 << (i % 256)
+        if i % 256 == 255:
+            words.append(word)
+            word = 0
+
+    if size % 256 != 0:
+        words.append(word)
+    return words
 
 @external
 @view
@@ -241,4 +570,4 @@ def isProduceSold(produce_id: uint256) -> bool:
         True if sold, False if available
     """
     assert produce_id > 0 and produce_id <= self.produce_counter, "Invalid produce ID"
-    return self.produces[produce_id].is_sold
+    return self.produce_sale[produce_id] != 0
@@ -1,7 +1,74 @@
+import contextlib
+
+import boa
 import pytest
-from script.deploy import deploy
+from boa.util.abi import Address
+from script.deploy import deploy_agrichain as deploy
 
 @pytest.fixture
 def agrichain_contract():
     """Deploy AgriChain contract for testing"""
-    return deploy()
\ No newline at end of file
+    return deploy()
+
+@contextlib.contextmanager
+def transaction_boundary(sender, to):
+    """
+    Run the calls inside as if they started a new transaction
+
+    Boa executes calls back to back in one never-committed state, so by
+    default every account and slot touched earlier is warm (EIP-2929) and an
+    SSTORE compares against the value from before the first call of the test
+    (EIP-2200), which inflates refunds. Inside this block the access list is
+    empty apart from the sender, recipient and coinbase, and the "original"
+    value of a slot is its value at the start of the block. Unlike
+    ``vm.state.lock_changes()`` nothing is committed, so boa's anchors (the
+    per-test isolation) still revert it. This reaches into py-evm's state
+    internals; titanoboa is pinned in pyproject.toml and py-evm in uv.lock.
+    """
+    state = boa.env.evm.vm.state
+    get_storage = state.get_storage
+    originals = {}
+
+    def get_storage_at_start(address, slot, from_journal=True):
+        if from_journal:
+            return get_storage(address, slot)
+        # py-evm asks for the original value from the first SSTORE to a slot
+        # on, so the current value at that point is the one the tx started with
+        if (address, slot) not in originals:
+            originals[address, slot] = get_storage(address, slot)
+        return originals[address, slot]
+
+    # A journalled clear, so an enclosing anchor restores the old entries
+    state._account_db._journal_accessed_state.clear()
+    for address in (sender, to, state.coinbase):
+        state.mark_address_warm(address)
+    state.get_storage = get_storage_at_start
+    try:
+        yield
+    finally:
+        del state.get_storage
+
+@pytest.fixture
+def transaction_gas():
+    """
+    Gas a transaction calling contract_function(*args) is charged, as in its receipt
+
+    Intrinsic gas (base + calldata) plus execution, run at a transaction
+    boundary, less the refund capped at a fifth of the total (EIP-3529), and
+    at least the calldata floor (EIP-7623).
+    """
+    def measure(contract_function, *args, **kwargs):
+        calldata = contract_function.prepare_calldata(*args)
+        zero_bytes = calldata.count(0)
+        tokens = zero_bytes + 4 * (len(calldata) - zero_bytes)
+        intrinsic = 21000 + 4 * tokens
+        contract = contract_function.contract
+        sender = Address(kwargs.get("sender") or boa.env.eoa)
+        with transaction_boundary(sender.canonical_address, contract.address.canonical_address):
+            contract_function(*args, **kwargs)
+        # The last call's computation is private to boa as well (see above)
+        computation = contract._computation
+        used = intrinsic + computation.get_gas_used()
+        used -= min(computation.get_gas_refund(), used // 5)
+        return max(used, 21000 + 10 * tokens)
+    return measure
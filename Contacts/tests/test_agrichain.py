@@ -1,6 +1,7 @@
 import pytest
 from moccasin.boa_tools import VyperContract
 import boa
+import time
 
 def test_initial_state(agrichain_contract):
     """Test initial contract state"""
@@ -170,3 +171,253 @@ def test_invalid_produce_id(agrichain_contract):
     # Test checking sold status for non-existent produce
     with pytest.raises(Exception):
         agrichain_contract.isProduceSold(999999)
+
+def test_list_produce_batch(agrichain_contract):
+    """Test listing several lots in one transaction"""
+    initial_count = agrichain_contract.getTotalProduces()
+
+    agrichain_contract.listProduceBatch(
+        ["Maize", "Beans", "Rice"], [10, 20, 30], [1000, 2000, 3000]
+    )
+
+    # One ProduceListed event per lot, in order
+    events = agrichain_contract.get_logs()
+    assert [event.name for event in events] == ["Maize", "Beans", "Rice"]
+    assert [event.produce_id for event in events] == [initial_count + 1, initial_count + 2, initial_count + 3]
+
+    assert agrichain_contract.getTotalProduces() == initial_count + 3
+    produce = agrichain_contract.getProduceDetails(initial_count + 2)
+    assert produce[2] == "Beans"
+    assert produce[5] == 20 * 2000  # total_price
+    assert initial_count + 3 in agrichain_contract.getFarmerProduces(boa.env.eoa)
+
+def test_list_produce_batch_validation(agrichain_contract):
+    """Test batch listing validation"""
+    initial_count = agrichain_contract.getTotalProduces()
+
+    # Test empty batch
+    with pytest.raises(Exception):
+        agrichain_contract.listProduceBatch([], [], [])
+
+    # Test mismatched lengths
+    with pytest.raises(Exception):
+        agrichain_contract.listProduceBatch(["Maize", "Beans"], [10], [1000, 2000])
+
+    # One invalid lot reverts the whole batch
+    with pytest.raises(Exception):
+        agrichain_contract.listProduceBatch(["Maize", "Beans"], [10, 0], [1000, 2000])
+
+    assert agrichain_contract.getTotalProduces() == initial_count
+
+def test_list_produce_batch_gas_per_item(agrichain_contract, transaction_gas):
+    """Test that batching lots is cheaper per item than listing them one by one"""
+    lots = 50
+    names = [f"Lot {i}" for i in range(lots)]
+    quantities = [10 + i for i in range(lots)]
+    prices = [1000000000000000] * lots
+
+    single_gas = sum(
+        transaction_gas(agrichain_contract.listProduce, names[i], quantities[i], prices[i])
+        for i in range(lots)
+    )
+    batch_gas = transaction_gas(agrichain_contract.listProduceBatch, names, quantities, prices)
+
+    single_per_item = single_gas / lots
+    batch_per_item = batch_gas / lots
+    print(f"\nlistProduce: {single_per_item:.0f} gas/item, listProduceBatch({lots}): {batch_per_item:.0f} gas/item")
+
+    # Batching saves (most of) the 21000 base cost per item
+    assert batch_per_item < single_per_item - 15000
+
+def test_available_set_after_sales(agrichain_contract):
+    """Test the available set stays exact when produces are sold out of order"""
+    buyer_address = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+    boa.env.set_balance(buyer_address, 10**18)
+
+    agrichain_contract.listProduceBatch(["A", "B", "C", "D"], [1, 1, 1, 1], [1000, 1000, 1000, 1000])
+    first_id = agrichain_contract.getTotalProduces() - 3
+
+    # Sell one from the middle of the set and the current last one
+    with boa.env.prank(buyer_address):
+        agrichain_contract.buyProduce(first_id + 1, value=1000)
+        agrichain_contract.buyProduce(first_id + 3, value=1000)
+
+    expected = {1, first_id, first_id + 2}  # deployment produce + unsold lots
+    assert agrichain_contract.getAvailableProduceCount() == 3
+    assert set(agrichain_contract.getAvailableProducesPage(0, 10)) == expected
+    assert set(agrichain_contract.getAvailableProduces()) == expected
+
+def test_available_produces_pagination(agrichain_contract):
+    """Test walking the available set page by page"""
+    agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(20)], [1] * 20, [1000] * 20)
+    count = agrichain_contract.getAvailableProduceCount()
+    assert count == 21
+
+    pages = [agrichain_contract.getAvailableProducesPage(offset, 8) for offset in range(0, count, 8)]
+    assert [len(page) for page in pages] == [8, 8, 5]
+    assert sorted(produce_id for page in pages for produce_id in page) == list(range(1, 22))
+
+    # Past the end is empty rather than reverting
+    assert agrichain_contract.getAvailableProducesPage(count, 8) == []
+
+def test_available_produces_past_1000(agrichain_contract):
+    """Test that produces past ID 1000 are still listed as available"""
+    # Spread over several farmers (each farmer's own produce list holds 1000 IDs)
+    for batch in range(21):
+        with boa.env.prank(boa.env.generate_address() if batch % 2 else boa.env.eoa):
+            agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+    total = agrichain_contract.getTotalProduces()
+    assert total == 1051
+
+    assert agrichain_contract.getAvailableProduceCount() == total
+    assert total in agrichain_contract.getAvailableProducesPage(1000, 100)
+
+def test_available_page_gas_independent_of_history(agrichain_contract):
+    """Test that reading a page costs the same however many produces were listed before"""
+    def page_gas():
+        agrichain_contract.getAvailableProducesPage(0, 10)
+        return agrichain_contract._computation.net_gas_used
+
+    agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(10)], [1] * 10, [1000] * 10)
+    small_history = page_gas()
+
+    for _ in range(10):
+        agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+    assert page_gas() == small_history
+
+def test_get_produce_details_batch(agrichain_contract):
+    """Test reading many produces in one call, with invalid IDs flagged instead of reverting"""
+    agrichain_contract.listProduceBatch(["Maize", "Beans"], [10, 20], [1000, 2000])
+    total = agrichain_contract.getTotalProduces()
+
+    produces = agrichain_contract.getProduceDetailsBatch([total, 0, 1, total + 1, total - 1])
+    assert len(produces) == 5
+    assert produces[0] == agrichain_contract.getProduceDetails(total)
+    assert produces[2] == agrichain_contract.getProduceDetails(1)
+    assert produces[4][2] == "Maize"
+
+    # Invalid IDs come back as empty structs in their slot
+    for invalid in (produces[1], produces[3]):
+        assert invalid[0] == 0
+        assert invalid[2] == ""
+
+    assert agrichain_contract.getProduceDetailsBatch([]) == []
+
+def test_get_produce_details_batch_gas_and_latency(agrichain_contract, transaction_gas):
+    """Compare one getProduceDetailsBatch call against N getProduceDetails calls"""
+    for _ in range(4):
+        agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+
+    print()
+    for count in (1, 50, 200):
+        ids = list(range(1, count + 1))
+
+        start = time.perf_counter()
+        single_gas = sum(transaction_gas(agrichain_contract.getProduceDetails, produce_id) for produce_id in ids)
+        single_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch_gas = transaction_gas(agrichain_contract.getProduceDetailsBatch, ids)
+        batch_seconds = time.perf_counter() - start
+
+        print(
+            f"{count:>3} IDs: getProduceDetails x{count} {single_gas:>9} gas {single_seconds * 1000:8.1f} ms, "
+            f"getProduceDetailsBatch {batch_gas:>8} gas {batch_seconds * 1000:8.1f} ms"
+        )
+        # The batch reserves memory for MAX_DETAILS_BATCH results, so it only pays off past one ID;
+        # wall time is printed for comparison but too noisy on pyevm to assert on
+        if count > 1:
+            assert batch_gas < single_gas
+
+def test_packed_storage_round_trip(agrichain_contract):
+    """Test that every Produce field survives the packed storage layout"""
+    buyer_address = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+    boa.env.set_balance(buyer_address, 10**18)
+    names = ["A" * 32, "B" * 33, "Sukuma wiki 🥬", "Grade A organic hass avocados, Murang'a, hand picked"]
+    agrichain_contract.listProduceBatch(names, [1, 2, 3, 4], [1000, 2000, 3000, 4000])
+    first_id = agrichain_contract.getTotalProduces() - 3
+
+    with boa.env.prank(buyer_address):
+        agrichain_contract.buyProduce(first_id + 1, value=4000)
+
+    for offset, name in enumerate(names):
+        produce = agrichain_contract.getProduceDetails(first_id + offset)
+        assert produce[0] == first_id + offset
+        assert produce[1] == boa.env.eoa
+        assert produce[2] == name
+        assert produce[3] == offset + 1
+        assert produce[4] == (offset + 1) * 1000
+        assert produce[5] == (offset + 1) ** 2 * 1000
+        assert produce[8] == boa.env.evm.patch.timestamp
+        assert agrichain_contract.produces(first_id + offset) == produce
+
+    sold = agrichain_contract.getProduceDetails(first_id + 1)
+    assert sold[6] and sold[7] == buyer_address and sold[9] == boa.env.evm.patch.timestamp
+    assert not agrichain_contract.getProduceDetails(first_id)[6]
+
+    # The old public getter returned an empty struct for unknown IDs
+    assert agrichain_contract.produces(first_id + 100)[0] == 0
+
+    # Quantities and prices are stored in 128 bits each
+    with pytest.raises(Exception):
+        agrichain_contract.listProduce("Too many", 2**128, 1)
+
+def test_farmer_and_buyer_pages(agrichain_contract):
+    """Test paging through farmer and buyer indexes past the old 1000-entry cap"""
+    farmer_address = boa.env.generate_address()
+    buyer_address = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+    boa.env.set_balance(buyer_address, 10**18)
+
+    with boa.env.prank(farmer_address):
+        for _ in range(21):
+            agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+    total = agrichain_contract.getTotalProduces()
+    first_id = total - 1049
+
+    assert agrichain_contract.getFarmerProduceCount(farmer_address) == 1050
+    pages = [agrichain_contract.getFarmerProducesPage(farmer_address, offset, 500) for offset in range(0, 1050, 500)]
+    assert [len(page) for page in pages] == [500, 500, 50]
+    assert [produce_id for page in pages for produce_id in page] == list(range(first_id, total + 1))
+    # Limits above MAX_PAGE_SIZE are capped, pages past the end are empty
+    assert len(agrichain_contract.getFarmerProducesPage(farmer_address, 0, 10**6)) == 500
+    assert agrichain_contract.getFarmerProducesPage(farmer_address, 1050, 10) == []
+    assert agrichain_contract.getFarmerProduces(farmer_address) == list(range(first_id, first_id + 1000))
+
+    with boa.env.prank(buyer_address):
+        for produce_id in (total, first_id, first_id + 7):
+            agrichain_contract.buyProduce(produce_id, value=1000)
+    assert agrichain_contract.getBuyerPurchaseCount(buyer_address) == 3
+    assert agrichain_contract.getBuyerPurchasesPage(buyer_address, 1, 5) == [first_id, first_id + 7]
+    assert agrichain_contract.getBuyerPurchases(buyer_address) == [total, first_id, first_id + 7]
+
+def test_farmer_index_append_gas_is_constant(agrichain_contract, transaction_gas):
+    """Test that listing costs the same however many produces the farmer already has"""
+    agrichain_contract.listProduce("Maize", 1, 1000)
+    early = transaction_gas(agrichain_contract.listProduce, "Maize", 1, 1000)
+    for _ in range(10):
+        agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+    assert transaction_gas(agrichain_contract.listProduce, "Maize", 1, 1000) == early
+
+def test_sold_bitmap(agrichain_contract):
+    """Test reading sold flags for a range of IDs packed into words"""
+    buyer_address = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+    boa.env.set_balance(buyer_address, 10**18)
+    for _ in range(6):
+        agrichain_contract.listProduceBatch([f"Lot {i}" for i in range(50)], [1] * 50, [1000] * 50)
+
+    sold = {2, 255, 256, 257, 300}
+    with boa.env.prank(buyer_address):
+        for produce_id in sold:
+            agrichain_contract.buyProduce(produce_id, value=1000)
+
+    def sold_ids(start_id, count):
+        words = agrichain_contract.getSoldBitmap(start_id, count)
+        return {start_id + i for i in range(len(words) * 256) if words[i // 256] >> (i % 256) & 1}
+
+    assert len(agrichain_contract.getSoldBitmap(1, 301)) == 2
+    assert sold_ids(1, 301) == sold
+    assert sold_ids(256, 2) == {256, 257}
+    # IDs past the counter read as unsold, the count is capped at MAX_SOLD_BITMAP_IDS
+    assert sold_ids(290, 1000) == {300}
+    assert len(agrichain_contract.getSoldBitmap(1, 10**6)) == 16
+    assert agrichain_contract.getSoldBitmap(1, 0) == []
@@ -0,0 +1,53 @@
+import boa
+
+BUYER = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+LONG_NAME = "Grade A organic hass avocados, Murang'a, hand picked"
+
+# Gas per call with the original layout (one full slot per Produce field),
+# measured on the scenarios below before the storage packing, with
+# transaction_gas charging what a real transaction would
+UNPACKED_LAYOUT_GAS = {
+    "listProduce": 291857,
+    "listProduce (long name)": 314832,
+    "listProduceBatch (10 lots)": 2601716,
+    "buyProduce": 170507,
+    "getProduceDetails": 47329,
+    "getProduceDetailsBatch (10 IDs)": 297879,
+    "isProduceSold": 25674,
+}
+
+def measure_functions(agrichain_contract, transaction_gas):
+    """Gas of each public function on a fixed scenario"""
+    boa.env.set_balance(BUYER, 10**20)
+    gas = {
+        "listProduce": transaction_gas(agrichain_contract.listProduce, "Organic Tomatoes", 100, 10**15),
+        "listProduce (long name)": transaction_gas(agrichain_contract.listProduce, LONG_NAME, 40, 2 * 10**15),
+        "listProduceBatch (10 lots)": transaction_gas(
+            agrichain_contract.listProduceBatch, [f"Lot {i}" for i in range(10)], [10] * 10, [10**15] * 10
+        ),
+    }
+    produce_id = agrichain_contract.getTotalProduces()
+    with boa.env.prank(BUYER):
+        gas["buyProduce"] = transaction_gas(agrichain_contract.buyProduce, produce_id, value=10 * 10**15)
+    gas["getProduceDetails"] = transaction_gas(agrichain_contract.getProduceDetails, produce_id)
+    gas["getProduceDetailsBatch (10 IDs)"] = transaction_gas(
+        agrichain_contract.getProduceDetailsBatch, list(range(produce_id - 9, produce_id + 1))
+    )
+    gas["isProduceSold"] = transaction_gas(agrichain_contract.isProduceSold, produce_id)
+    return gas
+
+def test_gas_per_function(agrichain_contract, transaction_gas):
+    """Compare each function's gas against the unpacked Produce layout"""
+    gas = measure_functions(agrichain_contract, transaction_gas)
+
+    print(f"\n{'function':<34}{'unpacked':>10}{'packed':>10}{'saved':>8}")
+    for name, used in gas.items():
+        baseline = UNPACKED_LAYOUT_GAS[name]
+        print(f"{name:<34}{baseline:>10}{used:>10}{(baseline - used) / baseline:>8.0%}")
+
+    # Transactions pay for the storage writes, so that is where the packing has to pay off
+    for name in ("listProduce", "listProduce (long name)", "listProduceBatch (10 lots)", "buyProduce"):
+        assert gas[name] < UNPACKED_LAYOUT_GAS[name] * 0.75, name
+    # Views unpack the words again; that may cost a little, but they are eth_calls nobody pays for
+    for name in ("getProduceDetails", "getProduceDetailsBatch (10 IDs)", "isProduceSold"):
+        assert gas[name] < UNPACKED_LAYOUT_GAS[name] * 1.25, name
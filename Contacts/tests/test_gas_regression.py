@@ -0,0 +1,175 @@
+"""
+Gas regression suite
+
+Runs each external function over representative inputs (name lengths, number
+of listings, farmer and buyer history sizes) in-process on pyevm and compares
+the gas against tests/gas_baseline.json. A scenario fails when it costs more
+than GAS_TOLERANCE (default 2%) above its baseline. The gas is what a
+transaction's receipt would report (see transaction_gas in conftest.py);
+test_transaction_gas_matches_receipts checks that against mined transactions.
+
+After an intended change, rewrite the baseline with
+    UPDATE_GAS_BASELINE=1 mox test tests/test_gas_regression.py
+For a per-line breakdown of where the gas goes, run `mox test --gas-profile`.
+"""
+import json
+import os
+from pathlib import Path
+
+import boa
+import pytest
+from boa.util.abi import Address
+from eth_account import Account
+from eth_keys import keys
+
+from script.deploy import deploy_agrichain
+
+BASELINE_PATH = Path(__file__).with_name("gas_baseline.json")
+TOLERANCE = float(os.environ.get("GAS_TOLERANCE", "0.02"))
+UPDATE_BASELINE = os.environ.get("UPDATE_GAS_BASELINE") == "1"
+
+# Fixed accounts, so calldata (and its gas) is the same on every run
+HEAVY_FARMER = "0x90F79bf6EB2c4f870365E785982E1f101E93b906"
+HEAVY_BUYER = "0x15d34AAf54267DB7D7c367839AAf71A00a2C6A65"
+BUYER = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+PRICE = 1000
+
+# The busy contract: HEAVY_FARMER has listed 1000 lots (IDs 2-1001) and
+# HEAVY_BUYER has bought the first 100 of them
+FARMER_HISTORY = 1000
+BUYER_HISTORY = 100
+
+def list_lots(contract, count, farmer=None):
+    with boa.env.prank(farmer or boa.env.eoa):
+        for start in range(0, count, 50):
+            size = min(50, count - start)
+            contract.listProduceBatch([f"Lot {start + i}" for i in range(size)], [1] * size, [PRICE] * size)
+
+def buy_lots(contract, produce_ids, buyer):
+    boa.env.set_balance(buyer, 10**20)
+    with boa.env.prank(buyer):
+        for produce_id in produce_ids:
+            contract.buyProduce(produce_id, value=PRICE)
+
+@pytest.fixture(scope="module")
+def busy_contract():
+    contract = deploy_agrichain()
+    list_lots(contract, FARMER_HISTORY, HEAVY_FARMER)
+    buy_lots(contract, range(2, 2 + BUYER_HISTORY), HEAVY_BUYER)
+    return contract
+
+@pytest.fixture(scope="module")
+def gas_baseline():
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    measured = {}
+    yield baseline, measured
+    if UPDATE_BASELINE:
+        BASELINE_PATH.write_text(json.dumps({**baseline, **measured}, indent=2, sort_keys=True) + "\n")
+
+def _buy_one(contract, gas, produce_id, buyer=BUYER):
+    boa.env.set_balance(buyer, 10**20)
+    total_price = contract.getProduceDetails(produce_id)[5]
+    with boa.env.prank(buyer):
+        return gas(contract.buyProduce, produce_id, value=total_price)
+
+def _list_one(contract, gas, farmer=None):
+    with boa.env.prank(farmer or boa.env.eoa):
+        return gas(contract.listProduce, "Organic Tomatoes", 100, PRICE)
+
+# Scenarios on a freshly deployed contract (one listing, by the deployer)
+FRESH_SCENARIOS = {
+    "listProduce/name=1B": lambda c, gas: gas(c.listProduce, "A", 100, PRICE),
+    "listProduce/name=16B": lambda c, gas: gas(c.listProduce, "Organic Tomatoes", 100, PRICE),
+    "listProduce/name=32B": lambda c, gas: gas(c.listProduce, "A" * 32, 100, PRICE),
+    "listProduce/name=33B": lambda c, gas: gas(c.listProduce, "A" * 33, 100, PRICE),
+    "listProduce/name=100B": lambda c, gas: gas(c.listProduce, "A" * 100, 100, PRICE),
+    "listProduceBatch/lots=1": lambda c, gas: gas(c.listProduceBatch, ["Lot 0"], [1], [PRICE]),
+    "listProduceBatch/lots=10": lambda c, gas: gas(
+        c.listProduceBatch, [f"Lot {i}" for i in range(10)], [1] * 10, [PRICE] * 10
+    ),
+    "listProduceBatch/lots=50": lambda c, gas: gas(
+        c.listProduceBatch, [f"Lot {i}" for i in range(50)], [1] * 50, [PRICE] * 50
+    ),
+    "buyProduce/buyer_history=0": lambda c, gas: _buy_one(c, gas, 1),
+    "getProduceDetails/name=16B": lambda c, gas: gas(c.getProduceDetails, 1),
+    "isProduceSold": lambda c, gas: gas(c.isProduceSold, 1),
+    "getTotalProduces": lambda c, gas: gas(c.getTotalProduces),
+}
+
+# Scenarios on the busy contract (see FARMER_HISTORY / BUYER_HISTORY)
+BUSY_SCENARIOS = {
+    "listProduce/listings=1001": lambda c, gas: _list_one(c, gas),
+    "listProduce/farmer_history=1000": lambda c, gas: _list_one(c, gas, HEAVY_FARMER),
+    "buyProduce/buyer_history=100": lambda c, gas: _buy_one(c, gas, 500, HEAVY_BUYER),
+    "buyProduce/available=901": lambda c, gas: _buy_one(c, gas, 500),
+    "getProduceDetailsBatch/ids=1": lambda c, gas: gas(c.getProduceDetailsBatch, [500]),
+    "getProduceDetailsBatch/ids=50": lambda c, gas: gas(c.getProduceDetailsBatch, list(range(500, 550))),
+    "getProduceDetailsBatch/ids=200": lambda c, gas: gas(c.getProduceDetailsBatch, list(range(500, 700))),
+    "getAvailableProduces/available=901": lambda c, gas: gas(c.getAvailableProduces),
+    "getAvailableProducesPage/limit=500": lambda c, gas: gas(c.getAvailableProducesPage, 0, 500),
+    "getAvailableProduceCount": lambda c, gas: gas(c.getAvailableProduceCount),
+    "getFarmerProduces/farmer_history=1000": lambda c, gas: gas(c.getFarmerProduces, HEAVY_FARMER),
+    "getFarmerProducesPage/limit=500": lambda c, gas: gas(c.getFarmerProducesPage, HEAVY_FARMER, 500, 500),
+    "getFarmerProduceCount": lambda c, gas: gas(c.getFarmerProduceCount, HEAVY_FARMER),
+    "getBuyerPurchases/buyer_history=100": lambda c, gas: gas(c.getBuyerPurchases, HEAVY_BUYER),
+    "getBuyerPurchasesPage/limit=50": lambda c, gas: gas(c.getBuyerPurchasesPage, HEAVY_BUYER, 50, 50),
+    "getBuyerPurchaseCount": lambda c, gas: gas(c.getBuyerPurchaseCount, HEAVY_BUYER),
+    "getSoldBitmap/ids=4096": lambda c, gas: gas(c.getSoldBitmap, 1, 4096),
+}
+
+def check_against_baseline(name, used, gas_baseline):
+    baseline, measured = gas_baseline
+    measured[name] = used
+    if UPDATE_BASELINE:
+        return
+    assert name in baseline, f"{name} has no baseline; run with UPDATE_GAS_BASELINE=1"
+    limit = baseline[name] * (1 + TOLERANCE)
+    assert used <= limit, (
+        f"{name} regressed: {used} gas vs baseline {baseline[name]} "
+        f"(+{(used - baseline[name]) / baseline[name]:.1%}, tolerance {TOLERANCE:.0%})"
+    )
+
+def send_transaction(account, contract, calldata, value=0):
+    """Sign a call with account's key and mine it on the pyevm chain; returns the receipt"""
+    vm = boa.env.evm.vm
+    sender = Address(account.address).canonical_address
+    transaction = vm.get_transaction_builder().create_unsigned_transaction(
+        nonce=vm.state.get_nonce(sender),
+        gas_price=vm.get_header().base_fee_per_gas,
+        gas=5_000_000,
+        to=contract.address.canonical_address,
+        value=value,
+        data=calldata,
+    ).as_signed_transaction(keys.PrivateKey(account.key), chain_id=vm.chain_context.chain_id)
+    receipt, computation = vm.apply_transaction(vm.get_header(), transaction)
+    assert computation.is_success
+    return receipt
+
+def test_transaction_gas_matches_receipts(transaction_gas):
+    """The fixture charges exactly what mined transactions pay (buyProduce/buyer_history=0, listProduce/name=16B)"""
+    account = Account.create()
+    # Mining commits state, which boa's anchors can't revert: use a throwaway env
+    with boa.swap_env(boa.Env()):
+        contract = deploy_agrichain()
+        boa.env.set_balance(account.address, 10**20)
+        total_price = contract.getProduceDetails(1)[5]
+
+        with boa.env.anchor(), boa.env.prank(account.address):
+            bought = transaction_gas(contract.buyProduce, 1, value=total_price)
+            listed = transaction_gas(contract.listProduce, "Organic Tomatoes", 100, PRICE)
+
+        receipt = send_transaction(account, contract, contract.buyProduce.prepare_calldata(1), total_price)
+        assert receipt.gas_used == bought
+        receipt = send_transaction(account, contract, contract.listProduce.prepare_calldata("Organic Tomatoes", 100, PRICE))
+        assert receipt.gas_used == listed
+
+@pytest.mark.parametrize("name", FRESH_SCENARIOS)
+def test_gas_fresh_contract(name, agrichain_contract, transaction_gas, gas_baseline):
+    """Gas per function on a freshly deployed contract"""
+    check_against_baseline(name, FRESH_SCENARIOS[name](agrichain_contract, transaction_gas), gas_baseline)
+
+@pytest.mark.parametrize("name", BUSY_SCENARIOS)
+def test_gas_busy_contract(name, busy_contract, transaction_gas, gas_baseline):
+    """Gas per function with large listing, farmer and buyer histories"""
+    with boa.env.anchor():
+        check_against_baseline(name, BUSY_SCENARIOS[name](busy_contract, transaction_gas), gas_baseline)
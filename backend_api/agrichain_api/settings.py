@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -152,6 +153,30 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache for the marketplace list responses (produce.cache). The default is
+# file based so that management commands (sync_produces, index_events,
+# reconcile_sold), which run in their own process, invalidate the responses
+# served by the web process. It lives in the checkout (not the shared temp
+# dir), so two checkouts never serve each other's responses. Point
+# CACHE_BACKEND/CACHE_LOCATION at redis or memcached to share it between
+# hosts. The test runner gets a private in-memory cache.
+if 'test' in sys.argv[1:2]:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+            'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache' / 'marketplace')),
+        }
+    }
+
+# Seconds a cached marketplace response is kept; writes invalidate it sooner
+MARKETPLACE_CACHE_TIMEOUT = int(os.getenv('MARKETPLACE_CACHE_TIMEOUT', '300'))
+
 # CORS Configuration for React Native
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -172,16 +197,63 @@ NETWORK = os.getenv('NETWORK', 'anvil')
 if NETWORK == 'sepolia':
     BLOCKCHAIN_CONFIG = {
         'RPC_URL': os.getenv('SEPOLIA_RPC_URL', 'https://ethereum-sepolia-rpc.publicnode.com'),
+        # Extra read endpoints, comma separated; RPC_URL stays the primary for writes
+        'RPC_URLS': [url.strip() for url in os.getenv('SEPOLIA_RPC_URLS', '').split(',') if url.strip()],
         'CHAIN_ID': int(os.getenv('SEPOLIA_CHAIN_ID', '11155111')),
         'CONTRACT_ADDRESS': os.getenv('CONTRACT_ADDRESS'),
         'PRIVATE_KEY': os.getenv('PRIVATE_KEY'),
-        'NETWORK': 'sepolia'
+        'NETWORK': 'sepolia',
+        'RPC_BATCH_SIZE': int(os.getenv('RPC_BATCH_SIZE', '50')),
+        'START_BLOCK': int(os.getenv('CONTRACT_START_BLOCK', '0')),
+        'LOG_CHUNK_SIZE': int(os.getenv('LOG_CHUNK_SIZE', '2000')),
+        # Blocks to stay behind the head, and block hashes kept for reorg detection
+        'CONFIRMATIONS': int(os.getenv('SEPOLIA_CONFIRMATIONS', '2')),
+        'REORG_CHECKPOINTS': int(os.getenv('REORG_CHECKPOINTS', '64')),
+        # 'memory' (per process) or 'database' (shared between workers)
+        'NONCE_STORE': os.getenv('NONCE_STORE', 'memory'),
+        'FEE_CACHE_TTL': float(os.getenv('FEE_CACHE_TTL', '12')),
+        'GAS_SAFETY_MARGIN': float(os.getenv('GAS_SAFETY_MARGIN', '1.2')),
+        'MIN_PRIORITY_FEE_WEI': int(os.getenv('MIN_PRIORITY_FEE_WEI', '1000000000')),
+        # Seconds between head-block polls of the view-call read cache
+        'READ_CACHE_HEAD_TTL': float(os.getenv('READ_CACHE_HEAD_TTL', '1')),
+        # Transaction outbox dispatcher: rows claimed per poll and send rate cap (0 = no cap)
+        'OUTBOX_BATCH_SIZE': int(os.getenv('OUTBOX_BATCH_SIZE', '20')),
+        'OUTBOX_MAX_PER_SECOND': float(os.getenv('OUTBOX_MAX_PER_SECOND', '5')),
+        # A row left 'sending' this long by a dispatcher that died is queued again
+        'OUTBOX_SENDING_TIMEOUT': int(os.getenv('OUTBOX_SENDING_TIMEOUT', '300')),
+        # Produce IDs per chunk of the full sync (produce.sync.FullSync)
+        'SYNC_CHUNK_SIZE': int(os.getenv('SYNC_CHUNK_SIZE', '1000')),
+        # A sync job silent for this long is considered dead and frees its lock
+        'SYNC_JOB_STALE_SECONDS': int(os.getenv('SYNC_JOB_STALE_SECONDS', '600')),
     }
 else:  # Default to anvil
     BLOCKCHAIN_CONFIG = {
         'RPC_URL': os.getenv('ANVIL_RPC_URL', 'http://127.0.0.1:8545'),
+        'RPC_URLS': [url.strip() for url in os.getenv('ANVIL_RPC_URLS', '').split(',') if url.strip()],
         'CHAIN_ID': int(os.getenv('CHAIN_ID', '31337')),
         'CONTRACT_ADDRESS': os.getenv('CONTRACT_ADDRESS', '0x5FbDB2315678afecb367f032d93F642f64180aa3'),
         'PRIVATE_KEY': os.getenv('PRIVATE_KEY', '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80'),
-        'NETWORK': 'anvil'
+        'NETWORK': 'anvil',
+        'RPC_BATCH_SIZE': int(os.getenv('RPC_BATCH_SIZE', '50')),
+        'START_BLOCK': int(os.getenv('CONTRACT_START_BLOCK', '0')),
+        'LOG_CHUNK_SIZE': int(os.getenv('LOG_CHUNK_SIZE', '2000')),
+        # Blocks to stay behind the head, and block hashes kept for reorg detection
+        'CONFIRMATIONS': int(os.getenv('ANVIL_CONFIRMATIONS', '0')),
+        'REORG_CHECKPOINTS': int(os.getenv('REORG_CHECKPOINTS', '64')),
+        # 'memory' (per process) or 'database' (shared between workers)
+        'NONCE_STORE': os.getenv('NONCE_STORE', 'memory'),
+        'FEE_CACHE_TTL': float(os.getenv('FEE_CACHE_TTL', '12')),
+        'GAS_SAFETY_MARGIN': float(os.getenv('GAS_SAFETY_MARGIN', '1.2')),
+        'MIN_PRIORITY_FEE_WEI': int(os.getenv('MIN_PRIORITY_FEE_WEI', '1000000000')),
+        # Seconds between head-block polls of the view-call read cache
+        'READ_CACHE_HEAD_TTL': float(os.getenv('READ_CACHE_HEAD_TTL', '1')),
+        # Transaction outbox dispatcher: rows claimed per poll and send rate cap (0 = no cap)
+        'OUTBOX_BATCH_SIZE': int(os.getenv('OUTBOX_BATCH_SIZE', '20')),
+        'OUTBOX_MAX_PER_SECOND': float(os.getenv('OUTBOX_MAX_PER_SECOND', '5')),
+        # A row left 'sending' this long by a dispatcher that died is queued again
+        'OUTBOX_SENDING_TIMEOUT': int(os.getenv('OUTBOX_SENDING_TIMEOUT', '300')),
+        # Produce IDs per chunk of the full sync (produce.sync.FullSync)
+        'SYNC_CHUNK_SIZE': int(os.getenv('SYNC_CHUNK_SIZE', '1000')),
+        # A sync job silent for this long is considered dead and frees its lock
+        'SYNC_JOB_STALE_SECONDS': int(os.getenv('SYNC_JOB_STALE_SECONDS', '600')),
     }
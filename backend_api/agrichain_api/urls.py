@@ -13,6 +13,7 @@ def api_root(request):
         'endpoints': {
             'produces': '/api/produces/',
             'categories': '/api/categories/',
+            'metrics': '/api/blockchain/metrics/',
             'admin': '/admin/',
         }
     })
@@ -21,5 +22,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('produce.urls')),
     path('api/users/', include('users.urls')),
+    path('api/blockchain/', include('blockchain.urls')),
     path('', api_root, name='api_root'),
 ]
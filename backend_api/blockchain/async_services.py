@@ -0,0 +1,263 @@
+"""
+AsyncWeb3-based twin of Web3Service for ASGI views
+
+RPCs are awaited on a non-blocking AsyncHTTPProvider, so one worker can keep
+many slow node requests in flight. Nonce allocation and fee/gas lookups are
+delegated to the synchronous service's NonceManager and FeeOracle (both are
+local caches that rarely touch the node), so transactions sent through
+either service never collide on a nonce.
+"""
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from .fees import name_length_bucket
+from .models import BlockchainTransaction
+from .nonces import is_nonce_error
+from .services import AVAILABLE_PAGE_SIZE, DETAILS_BATCH_SIZE, ProduceDetailsBatchMixin, get_web3_service
+
+
+class AsyncWeb3Service(ProduceDetailsBatchMixin):
+    """Async service for interacting with the AgriChain smart contract"""
+
+    def __init__(self, sync_service=None):
+        from web3 import AsyncWeb3
+        from web3.middleware import ExtraDataToPOAMiddleware
+
+        from .rpc_middleware import RPCMetricsMiddleware
+
+        self.sync_service = sync_service or get_web3_service()
+        self.network = self.sync_service.network
+        self.rpc_url = self.sync_service.rpc_url
+        self.chain_id = self.sync_service.chain_id
+        self.batch_size = self.sync_service.batch_size
+        self.contract_address = self.sync_service.contract_address
+        self.private_key = self.sync_service.private_key
+        self.account = self.sync_service.account
+        self.nonce_manager = self.sync_service.nonce_manager
+        self.fee_oracle = self.sync_service.fee_oracle
+
+        self.w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(self.rpc_url))
+        self.w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        self.contract = self.w3.eth.contract(
+            address=self.sync_service.contract.address,
+            abi=self.sync_service.contract_abi,
+        )
+        build_metrics = RPCMetricsMiddleware.build(RPCMetricsMiddleware.selectors_for(self.contract))
+        self.w3.middleware_onion.inject(build_metrics, name='rpc_metrics', layer=0)
+        self.rpc_metrics = build_metrics(self.w3)
+
+    async def is_connected(self) -> bool:
+        """Check if connected to the blockchain"""
+        try:
+            return await self.w3.is_connected()
+        except Exception:
+            return False
+
+    async def get_total_produces(self) -> int:
+        """Get total number of produces from the contract (raises, like the sync service)"""
+        return await self.contract.functions.getTotalProduces().call()
+
+    async def get_available_produces(self) -> List[int]:
+        """Get list of available produce IDs (all of them, in ascending order)"""
+        try:
+            block = await self.w3.eth.block_number
+            functions = self.contract.functions
+            count = await functions.getAvailableProduceCount().call(block_identifier=block)
+            pages = await asyncio.gather(*(
+                functions.getAvailableProducesPage(offset, AVAILABLE_PAGE_SIZE).call(block_identifier=block)
+                for offset in range(0, count, AVAILABLE_PAGE_SIZE)
+            ))
+            return sorted(produce_id for page in pages for produce_id in page)
+        except Exception as e:
+            print(f"Error getting available produces: {e}")
+            return []
+
+    async def get_produce_details(self, produce_id: int) -> Optional[Dict]:
+        """Get details of a specific produce"""
+        try:
+            result = await self.contract.functions.getProduceDetails(produce_id).call()
+            return self._format_produce_details(result)
+        except Exception as e:
+            print(f"Error getting produce details for ID {produce_id}: {e}")
+            return None
+
+    async def get_produce_details_many(self, produce_ids: Iterable[int],
+                                       chunk_size: Optional[int] = None) -> Dict[int, Optional[Dict]]:
+        """Get details of many produces, one getProduceDetailsBatch call per chunk, all sent concurrently"""
+        chunk_size = min(chunk_size or DETAILS_BATCH_SIZE, DETAILS_BATCH_SIZE)
+        produce_ids = list(dict.fromkeys(produce_ids))
+        chunks = [produce_ids[start:start + chunk_size] for start in range(0, len(produce_ids), chunk_size)]
+        results = await asyncio.gather(*(self._get_produce_details_chunk(chunk) for chunk in chunks))
+
+        details: Dict[int, Optional[Dict]] = {}
+        for chunk_details in results:
+            details.update(chunk_details)
+        return details
+
+    async def _get_produce_details_chunk(self, chunk: List[int]) -> Dict[int, Optional[Dict]]:
+        if self.details_batch_supported:
+            try:
+                (response,) = await self.make_batch_request(self._produce_details_batch_calls([chunk]))
+            except Exception as e:
+                print(f"Error sending produce detail batch call: {e}")
+                response = None
+            chunk_details = self._decode_produce_details_batch_call(chunk, response)
+            if chunk_details is not None:
+                return chunk_details
+
+        details: Dict[int, Optional[Dict]] = {}
+        for start in range(0, len(chunk), self.batch_size):
+            details.update(await self._get_produce_details_per_id(chunk[start:start + self.batch_size]))
+        return details
+
+    async def _get_produce_details_per_id(self, chunk: List[int]) -> Dict[int, Optional[Dict]]:
+        try:
+            responses = await self.make_batch_request(self._produce_details_batch(chunk))
+        except Exception as e:
+            print(f"Error sending batch of {len(chunk)} produce detail calls: {e}")
+            responses = None
+
+        if not isinstance(responses, list):
+            # Fall back to one call per ID for this chunk
+            results = await asyncio.gather(*(self.get_produce_details(produce_id) for produce_id in chunk))
+            return dict(zip(chunk, results))
+        return self._decode_produce_details_batch(chunk, responses)
+
+    async def make_batch_request(self, batch: List) -> List:
+        """Async counterpart of ``Web3Service.make_batch_request``"""
+        send = await self.rpc_metrics.async_wrap_make_batch_request(self.w3.provider.make_batch_request)
+        return await send(batch)
+
+    async def list_produce(self, produce_name: str, quantity: int, price_per_unit: int) -> Optional[str]:
+        """List a new produce on the blockchain"""
+        try:
+            gas_bucket = name_length_bucket(produce_name)
+            tx_params = await sync_to_async(self._list_produce_params, thread_sensitive=False)(
+                produce_name, quantity, price_per_unit, gas_bucket,
+            )
+            tx_hash = await self._send_with_managed_nonce(
+                self.contract.functions.listProduce(produce_name, quantity, price_per_unit),
+                tx_params,
+            )
+
+            # Record transaction
+            await BlockchainTransaction.objects.acreate(
+                transaction_hash=self.w3.to_hex(tx_hash),
+                transaction_type='list_produce',
+                from_address=self.account.address,
+                to_address=self.contract_address,
+                value=0,
+                gas_bucket=gas_bucket,
+            )
+
+            return self.w3.to_hex(tx_hash)
+
+        except Exception as e:
+            print(f"Error listing produce: {e}")
+            return None
+
+    def _list_produce_params(self, produce_name: str, quantity: int, price_per_unit: int, gas_bucket: int) -> Dict:
+        """Gas and fee fields from the shared oracle (may hit the node through the sync provider)"""
+        contract_function = self.sync_service.contract.functions.listProduce(produce_name, quantity, price_per_unit)
+        return {
+            'gas': self.fee_oracle.gas_limit(
+                'listProduce', gas_bucket, contract_function, {'from': self.account.address},
+            ),
+            **self.fee_oracle.get_fee_params(),
+        }
+
+    async def transaction_known(self, tx_hash) -> bool:
+        """True if the node has the transaction, pending or mined"""
+        from web3.exceptions import TransactionNotFound
+        try:
+            await self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return False
+        return True
+
+    async def _send_with_managed_nonce(self, contract_function, tx_params: Dict):
+        """Async counterpart of ``Web3Service._send_with_managed_nonce``"""
+        for attempt in range(2):
+            nonce = await sync_to_async(self.nonce_manager.allocate, thread_sensitive=False)()
+            signed_txn = None
+            try:
+                transaction = await contract_function.build_transaction({
+                    'from': self.account.address,
+                    'chainId': self.chain_id,
+                    'nonce': nonce,
+                    **tx_params,
+                })
+                signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
+                return await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                if is_nonce_error(e) and signed_txn is not None and await self.transaction_known(signed_txn.hash):
+                    return signed_txn.hash
+                if 'underpriced' in str(e).lower() or 'base fee' in str(e).lower():
+                    self.fee_oracle.invalidate()
+                if is_nonce_error(e) and attempt == 0:
+                    await sync_to_async(self.nonce_manager.resync, thread_sensitive=False)()
+                    continue
+                await sync_to_async(self.nonce_manager.release, thread_sensitive=False)(nonce)
+                raise
+
+    async def buy_produce(self, produce_id: int, buyer_address: str, buyer_private_key: str) -> Optional[str]:
+        """Buy a produce from the blockchain"""
+        try:
+            # Get produce details to determine payment amount
+            produce_details = await self.get_produce_details(produce_id)
+            if not produce_details:
+                return None
+
+            total_price = produce_details['total_price']
+            sync_function = self.sync_service.contract.functions.buyProduce(produce_id)
+            gas = await sync_to_async(self.fee_oracle.gas_limit, thread_sensitive=False)(
+                'buyProduce', None, sync_function, {'from': buyer_address, 'value': total_price},
+            )
+            fee_params = await sync_to_async(self.fee_oracle.get_fee_params, thread_sensitive=False)()
+
+            # Build transaction
+            transaction = await self.contract.functions.buyProduce(produce_id).build_transaction({
+                'from': buyer_address,
+                'chainId': self.chain_id,
+                'nonce': await self.w3.eth.get_transaction_count(buyer_address),
+                'gas': gas,
+                'value': total_price,
+                **fee_params,
+            })
+
+            # Sign and send transaction
+            signed_txn = self.w3.eth.account.sign_transaction(transaction, buyer_private_key)
+            tx_hash = await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+            # Record transaction
+            await BlockchainTransaction.objects.acreate(
+                transaction_hash=self.w3.to_hex(tx_hash),
+                transaction_type='buy_produce',
+                from_address=buyer_address,
+                to_address=self.contract_address,
+                value=total_price,
+                produce_id=produce_id
+            )
+
+            return self.w3.to_hex(tx_hash)
+
+        except Exception as e:
+            print(f"Error buying produce: {e}")
+            return None
+
+
+_async_web3_service: Optional[AsyncWeb3Service] = None
+_async_web3_service_lock = threading.Lock()
+
+
+def get_async_web3_service() -> AsyncWeb3Service:
+    """Return the shared AsyncWeb3Service, creating it on first use"""
+    global _async_web3_service
+    if _async_web3_service is None:
+        with _async_web3_service_lock:
+            if _async_web3_service is None:
+                _async_web3_service = AsyncWeb3Service()
+    return _async_web3_service
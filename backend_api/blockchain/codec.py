@@ -0,0 +1,191 @@
+"""
+Hand-written ABI codec for the hot AgriChain calls and events
+
+web3's generic path resolves the function from the ABI, builds a decoder
+for the 10-field Produce tuple and rebuilds a dict by position on every
+call. The layouts here are fixed by the contract, so bulk sync and indexing
+slice the words straight out of the return data / log data into a slotted
+``ProduceRecord``. tests.py checks every constant and layout against the ABI.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Union
+
+# keccak('getProduceDetails(uint256)')[:4]
+GET_PRODUCE_DETAILS_SELECTOR = '0x31d7ba1e'
+# keccak('getProduceDetailsBatch(uint256[])')[:4]
+GET_PRODUCE_DETAILS_BATCH_SELECTOR = '0x06fc3a47'
+# keccak of the event signatures (topic 0)
+PRODUCE_LISTED_TOPIC = '0x660743b873ab3b99293d0998a24cdddabd6045ceb930aef18eaec5b777191eba'
+PRODUCE_SOLD_TOPIC = '0xb5a082e53c7cd3f937d2070de1ee14370db64cd29d8249025e637b19e0656f1f'
+
+EVENT_TOPICS = {
+    PRODUCE_LISTED_TOPIC: 'ProduceListed',
+    PRODUCE_SOLD_TOPIC: 'ProduceSold',
+}
+
+BytesLike = Union[bytes, bytearray, str]
+
+
+class ProduceRecord:
+    """Decoded getProduceDetails result; also readable like the dict get_produce_details returns"""
+
+    __slots__ = ('id', 'farmer', 'name', 'quantity', 'price_per_unit', 'total_price',
+                 'is_sold', 'buyer', 'listed_timestamp', 'sold_timestamp')
+
+    def __init__(self, id, farmer, name, quantity, price_per_unit, total_price,
+                 is_sold, buyer, listed_timestamp, sold_timestamp):
+        self.id = id
+        self.farmer = farmer
+        self.name = name
+        self.quantity = quantity
+        self.price_per_unit = price_per_unit
+        self.total_price = total_price
+        self.is_sold = is_sold
+        self.buyer = buyer
+        self.listed_timestamp = listed_timestamp
+        self.sold_timestamp = sold_timestamp
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, ProduceRecord):
+            return self.as_dict() == other.as_dict()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ProduceRecord(id={self.id}, name={self.name!r}, is_sold={self.is_sold})"
+
+    def as_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def _to_bytes(value: BytesLike) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith('0x') else value)
+    return bytes(value)
+
+
+@lru_cache(maxsize=4096)
+def _checksum(address_bytes: bytes) -> str:
+    # Farmers and buyers repeat across produces, so the keccak is paid once per address
+    from eth_utils import to_checksum_address
+    return to_checksum_address(address_bytes)
+
+
+def _word(data: bytes, offset: int) -> int:
+    return int.from_bytes(data[offset:offset + 32], 'big')
+
+
+def _string(data: bytes, offset: int) -> str:
+    length = _word(data, offset)
+    return data[offset + 32:offset + 32 + length].decode('utf-8')
+
+
+def encode_get_produce_details(produce_id: int) -> str:
+    """Call data for getProduceDetails(produce_id)"""
+    return f'{GET_PRODUCE_DETAILS_SELECTOR}{produce_id:064x}'
+
+
+def encode_get_produce_details_batch(produce_ids: Iterable[int]) -> str:
+    """Call data for getProduceDetailsBatch(produce_ids)"""
+    produce_ids = list(produce_ids)
+    words = ''.join(f'{produce_id:064x}' for produce_id in produce_ids)
+    return f'{GET_PRODUCE_DETAILS_BATCH_SELECTOR}{32:064x}{len(produce_ids):064x}{words}'
+
+
+def _decode_produce(data: bytes, base: int) -> ProduceRecord:
+    # The 10 head words of the tuple start at base; the name offset (head
+    # word 2) is relative to base
+    if len(data) < base + 352:
+        raise ValueError(f'Produce tuple at {base} runs past the return data ({len(data)} bytes)')
+    return ProduceRecord(
+        _word(data, base),
+        _checksum(data[base + 44:base + 64]),
+        _string(data, base + _word(data, base + 64)),
+        _word(data, base + 96),
+        _word(data, base + 128),
+        _word(data, base + 160),
+        _word(data, base + 192) != 0,
+        _checksum(data[base + 236:base + 256]),
+        _word(data, base + 256),
+        _word(data, base + 288),
+    )
+
+
+def decode_produce_details(return_data: BytesLike) -> ProduceRecord:
+    """
+    Decode the getProduceDetails return data
+
+    Layout: one offset word pointing at the tuple (it contains a string), the
+    10 head words of the tuple, then the name (length word + bytes) at the
+    offset given by head word 2, relative to the start of the tuple.
+    """
+    data = _to_bytes(return_data)
+    return _decode_produce(data, _word(data, 0))
+
+
+def decode_produce_details_batch(return_data: BytesLike) -> List[Optional[ProduceRecord]]:
+    """
+    Decode the getProduceDetailsBatch return data, one entry per requested ID
+
+    Layout: an offset word pointing at the array, its length, one offset per
+    tuple (relative to the word after the length), then the tuples laid out
+    as in getProduceDetails. The contract flags invalid IDs with an empty
+    struct (id 0); those come back as None.
+    """
+    data = _to_bytes(return_data)
+    array = _word(data, 0)
+    heads = array + 32
+    records: List[Optional[ProduceRecord]] = []
+    for index in range(_word(data, array)):
+        record = _decode_produce(data, heads + _word(data, heads + index * 32))
+        records.append(record if record.id else None)
+    return records
+
+
+def decode_event_log(log) -> Optional[Dict]:
+    """
+    Decode a raw ProduceListed/ProduceSold log into the shape of web3's
+    ``process_log`` (event, args, blockNumber, logIndex, transactionHash)
+
+    Returns None for logs with an unknown topic.
+    """
+    topics = [_to_bytes(topic) for topic in log['topics']]
+    name = EVENT_TOPICS.get('0x' + topics[0].hex())
+    if name is None:
+        return None
+
+    data = _to_bytes(log['data'])
+    if name == 'ProduceListed':
+        # data: name offset, quantity, price_per_unit, total_price, timestamp
+        args = {
+            'produce_id': int.from_bytes(topics[1], 'big'),
+            'farmer': _checksum(topics[2][12:]),
+            'name': _string(data, _word(data, 0)),
+            'quantity': _word(data, 32),
+            'price_per_unit': _word(data, 64),
+            'total_price': _word(data, 96),
+            'timestamp': _word(data, 128),
+        }
+    else:
+        # data: name offset, quantity, total_price, timestamp
+        args = {
+            'produce_id': int.from_bytes(topics[1], 'big'),
+            'farmer': _checksum(topics[2][12:]),
+            'buyer': _checksum(topics[3][12:]),
+            'name': _string(data, _word(data, 0)),
+            'quantity': _word(data, 32),
+            'total_price': _word(data, 64),
+            'timestamp': _word(data, 96),
+        }
+    return {
+        'event': name,
+        'args': args,
+        'address': log.get('address'),
+        'blockNumber': log['blockNumber'],
+        'blockHash': log.get('blockHash'),
+        'logIndex': log['logIndex'],
+        'transactionHash': log['transactionHash'],
+        'transactionIndex': log.get('transactionIndex'),
+    }
@@ -0,0 +1,123 @@
+"""
+Fee oracle for transactions sent by the backend
+
+Caches EIP-1559 fees derived from eth_feeHistory for a short TTL (refetched
+only when a new block has arrived) and learns per-function gas limits from
+observed gas usage, so building a transaction doesn't cost extra RPCs and
+doesn't reserve a fixed 500k gas.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# How many recent observations to keep per (function, bucket)
+GAS_SAMPLES = 20
+
+# Names up to this many bytes fit the contract's single-word short name slot
+SHORT_NAME_LENGTH = 32
+
+
+def name_length_bucket(name: str) -> int:
+    """
+    Storage words a produce name occupies, the main driver of listProduce gas
+
+    A short name is one word; a longer one is a String[100] (a length word
+    plus its data words).
+    """
+    length = len(name.encode('utf-8'))
+    if length <= SHORT_NAME_LENGTH:
+        return 1
+    return 1 + math.ceil(length / 32)
+
+
+def batch_bucket(names: List[str]) -> int:
+    """Gas bucket for listProduceBatch: the lot count and the longest name's storage words"""
+    return len(names) * 10 + max(name_length_bucket(name) for name in names)
+
+
+class FeeOracle:
+    """Cached EIP-1559 fee parameters and learned gas limits"""
+
+    def __init__(self, w3, ttl: float = 12.0, safety_margin: float = 1.2,
+                 reward_percentile: float = 50.0, history_blocks: int = 5,
+                 min_priority_fee: int = 10**9):
+        self.w3 = w3
+        self.ttl = ttl
+        self.safety_margin = safety_margin
+        self.reward_percentile = reward_percentile
+        self.history_blocks = history_blocks
+        self.min_priority_fee = min_priority_fee
+        self._lock = threading.Lock()
+        self._fees: Optional[Dict[str, int]] = None
+        self._fees_block: Optional[int] = None
+        self._fees_checked_at = 0.0
+        self._gas_used: Dict[Tuple[str, Hashable], deque] = {}
+        self._estimates: Dict[Tuple[str, Hashable], int] = {}
+
+    # -- fees -- #
+
+    def get_fee_params(self) -> Dict[str, int]:
+        """Fee fields for a transaction: maxFeePerGas/maxPriorityFeePerGas, or gasPrice on legacy nodes"""
+        with self._lock:
+            now = time.monotonic()
+            if self._fees is not None and now - self._fees_checked_at < self.ttl:
+                return dict(self._fees)
+
+            block_number = self.w3.eth.block_number
+            if self._fees is None or block_number != self._fees_block:
+                self._fees = self._fetch_fees()
+                self._fees_block = block_number
+            self._fees_checked_at = now
+            return dict(self._fees)
+
+    def invalidate(self):
+        """Forget cached fees, e.g. after a transaction was rejected as underpriced"""
+        with self._lock:
+            self._fees = None
+
+    def _fetch_fees(self) -> Dict[str, int]:
+        try:
+            history = self.w3.eth.fee_history(self.history_blocks, 'latest', [self.reward_percentile])
+        except Exception as e:
+            print(f"eth_feeHistory unavailable, falling back to gasPrice: {e}")
+            return {'gasPrice': self.w3.eth.gas_price}
+
+        # The last baseFeePerGas entry is the base fee of the next block
+        base_fee = history['baseFeePerGas'][-1]
+        rewards = sorted(reward[0] for reward in history.get('reward') or [] if reward)
+        priority_fee = rewards[len(rewards) // 2] if rewards else 0
+        priority_fee = max(priority_fee, self.min_priority_fee)
+        # Twice the base fee keeps the transaction valid through several
+        # consecutive full blocks; only the actual base fee is charged
+        return {
+            'maxFeePerGas': 2 * base_fee + priority_fee,
+            'maxPriorityFeePerGas': priority_fee,
+        }
+
+    # -- gas limits -- #
+
+    def observe_gas_used(self, function_name: str, bucket: Hashable, gas_used: int):
+        """Record the gas a mined transaction actually used"""
+        with self._lock:
+            key = (function_name, bucket)
+            self._gas_used.setdefault(key, deque(maxlen=GAS_SAMPLES)).append(gas_used)
+
+    def gas_limit(self, function_name: str, bucket: Hashable, contract_function,
+                  tx_params: Optional[Dict] = None) -> int:
+        """
+        Gas limit for a call: the largest recently observed usage plus a safety
+        margin, falling back to a one-off eth_estimateGas for unseen buckets
+        """
+        key = (function_name, bucket)
+        with self._lock:
+            samples = self._gas_used.get(key)
+            baseline = max(samples) if samples else self._estimates.get(key)
+
+        if baseline is None:
+            baseline = contract_function.estimate_gas(tx_params or {})
+            with self._lock:
+                self._estimates[key] = baseline
+
+        return int(baseline * self.safety_margin)
@@ -0,0 +1,337 @@
+"""
+Event-log indexer for the AgriChain contract
+
+Reads ProduceListed/ProduceSold logs from the last indexed block onwards,
+stores them as ContractEvent rows and applies them to Produce as upserts, so
+the cost of a sync depends on the new blocks rather than on every produce
+ever listed.
+
+The indexer stays CONFIRMATIONS blocks behind the head and records the hash
+of every block it checkpoints. If a stored hash no longer matches the chain,
+the events above the newest surviving checkpoint are rolled back: their sales
+are undone and their listings marked unconfirmed (rows are kept, with their
+images and local users) until the re-index sees them again. Logs whose block
+hash is not canonical when checked after the read are never applied.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from produce.cache import bump_version
+from produce.models import Produce
+
+from .codec import EVENT_TOPICS, decode_event_log
+from .models import BlockCheckpoint, ContractEvent, IndexerState
+from .services import get_web3_service
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+def _to_datetime(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def _to_hex(value) -> str:
+    """Normalize HexBytes/str hashes and topics to a 0x-prefixed string"""
+    if isinstance(value, str):
+        return value if value.startswith('0x') else '0x' + value
+    return '0x' + bytes(value).hex()
+
+
+def produce_from_details(data: Dict, contract_address: str) -> Produce:
+    """Build an unsaved Produce from a ``Web3Service.get_produce_details`` dict"""
+    return Produce(
+        blockchain_id=data['id'],
+        contract_address=contract_address,
+        name=data['name'],
+        quantity=data['quantity'],
+        price_per_unit=data['price_per_unit'],
+        total_price=data['total_price'],
+        farmer_address=data['farmer'].lower(),
+        buyer_address=data['buyer'] if data['buyer'] != ZERO_ADDRESS else None,
+        is_sold=data['is_sold'],
+        listed_timestamp=_to_datetime(data['listed_timestamp']),
+        sold_timestamp=_to_datetime(data['sold_timestamp']) if data['sold_timestamp'] > 0 else None,
+    )
+
+
+class EventIndexer:
+    """Incrementally index contract events into ContractEvent and Produce"""
+
+    def __init__(self, service=None, chunk_size: Optional[int] = None):
+        self.service = service or get_web3_service()
+        self.chunk_size = chunk_size or settings.BLOCKCHAIN_CONFIG.get('LOG_CHUNK_SIZE', 2000)
+        self.start_block = settings.BLOCKCHAIN_CONFIG.get('START_BLOCK', 0)
+        self.confirmations = settings.BLOCKCHAIN_CONFIG.get('CONFIRMATIONS', 0)
+        self.checkpoints_kept = settings.BLOCKCHAIN_CONFIG.get('REORG_CHECKPOINTS', 64)
+        self.contract_address = self.service.contract_address
+
+    def get_state(self) -> IndexerState:
+        state, _ = IndexerState.objects.get_or_create(
+            contract_address=self.contract_address,
+            defaults={'last_indexed_block': max(self.start_block - 1, 0)},
+        )
+        return state
+
+    def get_target_block(self) -> int:
+        """Highest block the indexer should read up to (head minus confirmations)"""
+        return max(self.service.w3.eth.block_number - self.confirmations, 0)
+
+    def get_block_hash(self, block_number: int) -> str:
+        return _to_hex(self.service.w3.eth.get_block(block_number)['hash'])
+
+    def run_once(self, to_block: Optional[int] = None, progress=None) -> Dict:
+        """
+        Index all confirmed blocks after the persisted checkpoint
+
+        ``progress(blocks_done, blocks_total)`` is called after each chunk.
+        """
+        state = self.get_state()
+        rolled_back_to = self.check_for_reorg()
+        if rolled_back_to is not None:
+            self.rollback(rolled_back_to)
+            state.refresh_from_db()
+
+        target_block = self.get_target_block() if to_block is None else to_block
+        stats = {
+            'from_block': state.last_indexed_block + 1,
+            'to_block': target_block,
+            'events': 0,
+            'listed': 0,
+            'sold': 0,
+            'rolled_back_to': rolled_back_to,
+        }
+
+        from_block = state.last_indexed_block + 1
+        while from_block <= target_block:
+            chunk_end = min(from_block + self.chunk_size - 1, target_block)
+            # The checkpoint hash is read before the logs: a reorg after this
+            # point either shows in the logs' block hashes or fails the
+            # checkpoint on the next run
+            block_hash = self.get_block_hash(chunk_end)
+            logs = self.fetch_logs(from_block, chunk_end)
+            if not self.logs_are_canonical(logs, {chunk_end: block_hash}):
+                print(f"Logs in blocks {from_block}-{chunk_end} are off the canonical chain, stopping at block {from_block - 1}")
+                stats['to_block'] = from_block - 1
+                break
+            with transaction.atomic():
+                chunk_stats = self.apply_logs(logs)
+                IndexerState.objects.filter(pk=state.pk).update(last_indexed_block=chunk_end)
+                self.save_checkpoint(chunk_end, block_hash)
+            for key in ('events', 'listed', 'sold'):
+                stats[key] += chunk_stats[key]
+            from_block = chunk_end + 1
+            if progress is not None:
+                progress(chunk_end - stats['from_block'] + 1, target_block - stats['from_block'] + 1)
+
+        return stats
+
+    def logs_are_canonical(self, logs, known_hashes: Dict[int, str]) -> bool:
+        """Whether every log's blockHash is the chain's hash for that block"""
+        hashes = dict(known_hashes)
+        for log in logs:
+            block_number = log['blockNumber']
+            if block_number not in hashes:
+                hashes[block_number] = self.get_block_hash(block_number)
+            if _to_hex(log['blockHash']) != hashes[block_number]:
+                return False
+        return True
+
+    def save_checkpoint(self, block_number: int, block_hash: str):
+        """Remember a processed block's hash and prune checkpoints past the window"""
+        BlockCheckpoint.objects.update_or_create(
+            contract_address=self.contract_address,
+            block_number=block_number,
+            defaults={'block_hash': block_hash},
+        )
+        stale = BlockCheckpoint.objects.filter(
+            contract_address=self.contract_address,
+        ).order_by('-block_number').values_list('pk', flat=True)[self.checkpoints_kept:]
+        BlockCheckpoint.objects.filter(pk__in=list(stale)).delete()
+
+    def check_for_reorg(self) -> Optional[int]:
+        """
+        Compare stored checkpoints against the chain, newest first
+
+        Returns None when the newest checkpoint is still canonical, otherwise
+        the block number to roll back to (the newest checkpoint that survived).
+        """
+        checkpoints = list(BlockCheckpoint.objects.filter(
+            contract_address=self.contract_address,
+        ).order_by('-block_number'))
+
+        for index, checkpoint in enumerate(checkpoints):
+            if self.get_block_hash(checkpoint.block_number) == checkpoint.block_hash:
+                return None if index == 0 else checkpoint.block_number
+
+        if not checkpoints:
+            return None
+        # The reorg is deeper than the checkpoint window, so start over from
+        # just before the oldest block we still know about
+        print(f"Reorg deeper than {len(checkpoints)} checkpoints, re-indexing from block {checkpoints[-1].block_number}")
+        return max(checkpoints[-1].block_number - 1, self.start_block - 1, 0)
+
+    def rollback(self, to_block: int):
+        """Undo events above ``to_block`` and the Produce state derived from them"""
+        with transaction.atomic():
+            orphaned = ContractEvent.objects.filter(block_number__gt=to_block)
+            listed_ids = set()
+            sold_ids = set()
+            for event_name, produce_id in orphaned.values_list('event_name', 'produce_id'):
+                (listed_ids if event_name == 'ProduceListed' else sold_ids).add(produce_id)
+
+            # Listings that only existed on the orphaned branch: keep the rows
+            # (images, categories and users hang off them) but hide them until
+            # the re-index or a full sync finds them on the canonical chain
+            Produce.objects.filter(blockchain_id__in=listed_ids).update(
+                is_confirmed=False, updated_at=timezone.now(),
+            )
+            # Sales that only existed on the orphaned branch
+            Produce.objects.filter(blockchain_id__in=sold_ids).update(
+                is_sold=False, buyer_address=None, sold_timestamp=None, updated_at=timezone.now(),
+            )
+            orphaned.delete()
+
+            BlockCheckpoint.objects.filter(
+                contract_address=self.contract_address, block_number__gt=to_block,
+            ).delete()
+            IndexerState.objects.filter(contract_address=self.contract_address).update(
+                last_indexed_block=to_block,
+            )
+            bump_version()
+        print(f"Rolled back {len(listed_ids)} listings and {len(sold_ids)} sales above block {to_block}")
+
+    def run_forever(self, poll_interval: float = 12.0, stdout=None):
+        """Keep indexing new blocks until interrupted"""
+        while True:
+            stats = self.run_once()
+            if stdout is not None and stats['events']:
+                stdout.write(
+                    f"Indexed {stats['events']} events "
+                    f"(blocks {stats['from_block']}-{stats['to_block']})"
+                )
+            time.sleep(poll_interval)
+
+    def fetch_logs(self, from_block: int, to_block: int) -> List:
+        return self.service.w3.eth.get_logs({
+            'address': self.service.contract.address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [list(EVENT_TOPICS)],
+        })
+
+    def decode_logs(self, logs) -> List:
+        """Decode raw logs, ordered by (block_number, log_index)"""
+        decoded = [event for event in map(decode_event_log, logs) if event is not None]
+        decoded.sort(key=lambda event: (event['blockNumber'], event['logIndex']))
+        return decoded
+
+    def apply_logs(self, logs) -> Dict:
+        """Store decoded events and upsert the produces they describe"""
+        events = self.decode_logs(logs)
+        if not events:
+            return {'events': 0, 'listed': 0, 'sold': 0}
+
+        ContractEvent.objects.bulk_create(
+            [self._to_contract_event(event) for event in events],
+            ignore_conflicts=True,
+        )
+
+        listings: Dict[int, Dict] = {}
+        sales: Dict[int, Dict] = {}
+        for event in events:
+            args = event['args']
+            produce_id = args['produce_id']
+            if event['event'] == 'ProduceListed':
+                listings[produce_id] = {
+                    'contract_address': self.contract_address,
+                    'name': args['name'],
+                    'quantity': args['quantity'],
+                    'price_per_unit': args['price_per_unit'],
+                    'total_price': args['total_price'],
+                    'farmer_address': args['farmer'].lower(),
+                    'listed_timestamp': _to_datetime(args['timestamp']),
+                    'is_confirmed': True,
+                }
+            else:
+                sales[produce_id] = {
+                    'is_sold': True,
+                    'buyer_address': args['buyer'],
+                    'sold_timestamp': _to_datetime(args['timestamp']),
+                }
+
+        self._apply_listings(listings, sales)
+        self._apply_sales(sales, exclude=listings.keys())
+        # The bulk writes above send no signals
+        bump_version()
+
+        return {'events': len(events), 'listed': len(listings), 'sold': len(sales)}
+
+    def _to_contract_event(self, event) -> ContractEvent:
+        args = dict(event['args'])
+        return ContractEvent(
+            event_name=event['event'],
+            transaction_hash=_to_hex(event['transactionHash']),
+            block_number=event['blockNumber'],
+            log_index=event['logIndex'],
+            event_data=args,
+            produce_id=args.get('produce_id'),
+            farmer_address=args.get('farmer', '').lower(),
+            buyer_address=args.get('buyer', ''),
+            block_timestamp=_to_datetime(args['timestamp']),
+        )
+
+    def _apply_listings(self, listings: Dict[int, Dict], sales: Dict[int, Dict]):
+        """Upsert listed produces, folding in sales from the same range"""
+        if not listings:
+            return
+        produces = []
+        for produce_id, fields in listings.items():
+            sale = sales.get(produce_id, {
+                'is_sold': False, 'buyer_address': None, 'sold_timestamp': None,
+            })
+            produces.append(Produce(blockchain_id=produce_id, **fields, **sale))
+
+        Produce.objects.bulk_create(
+            produces,
+            update_conflicts=True,
+            unique_fields=['blockchain_id'],
+            update_fields=[
+                'contract_address', 'name', 'quantity', 'price_per_unit', 'total_price',
+                'farmer_address', 'listed_timestamp', 'is_confirmed', 'is_sold', 'buyer_address',
+                'sold_timestamp', 'updated_at',
+            ],
+        )
+
+    def _apply_sales(self, sales: Dict[int, Dict], exclude):
+        """Mark already-known produces as sold"""
+        sold_ids = [produce_id for produce_id in sales if produce_id not in exclude]
+        if not sold_ids:
+            return
+
+        now = timezone.now()
+        produces = list(Produce.objects.filter(blockchain_id__in=sold_ids))
+        for produce in produces:
+            for field, value in sales[produce.blockchain_id].items():
+                setattr(produce, field, value)
+            # A canonical sale means the listing is canonical too
+            produce.is_confirmed = True
+            produce.updated_at = now
+        Produce.objects.bulk_update(
+            produces, ['is_sold', 'buyer_address', 'sold_timestamp', 'is_confirmed', 'updated_at'],
+        )
+
+        # Sales of produces listed before the indexer's start block: fetch
+        # the listing from the contract so the row can be created
+        missing_ids = set(sold_ids) - {produce.blockchain_id for produce in produces}
+        if not missing_ids:
+            return
+        details = self.service.get_produce_details_many(sorted(missing_ids))
+        Produce.objects.bulk_create(
+            [produce_from_details(data, self.contract_address) for data in details.values() if data],
+            ignore_conflicts=True,
+        )
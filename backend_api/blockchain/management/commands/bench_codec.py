@@ -0,0 +1,107 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from ...codec import decode_event_log, decode_produce_details
+
+FARMER = '0x70997970C51812dc3A010C7d01b50e0d17dc79C8'
+BUYER = '0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC'
+
+
+class Command(BaseCommand):
+    help = 'Compare decode throughput of the hand-written codec against the web3 ABI path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=20000, help='Encoded results/logs per run')
+        parser.add_argument('--farmers', type=int, default=50, help='Distinct farmer addresses in the sample')
+
+    def handle(self, *args, **options):
+        from eth_utils import to_checksum_address
+        from eth_utils.abi import get_abi_output_types
+        from hexbytes import HexBytes
+        from web3 import Web3
+
+        from ...services import Web3Service
+
+        abi = json.loads((Path(__file__).resolve().parents[2] / 'AgriChain.json').read_text())['abi']
+        w3 = Web3()
+        contract = w3.eth.contract(address='0x5FbDB2315678afecb367f032d93F642f64180aa3', abi=abi)
+        items = options['items']
+        farmers = [to_checksum_address(f'0x{index + 1:040x}') for index in range(options['farmers'])]
+
+        # getProduceDetails return data, as it comes back from eth_call
+        output_types = get_abi_output_types(contract.get_function_by_name('getProduceDetails').abi)
+        results = [
+            '0x' + w3.codec.encode(output_types, [(
+                produce_id, farmers[produce_id % len(farmers)], f'Produce {produce_id}', 10, 1000, 10000,
+                produce_id % 3 == 0, BUYER if produce_id % 3 == 0 else '0x' + '0' * 40, 1700000000, 0,
+            )]).hex()
+            for produce_id in range(1, items + 1)
+        ]
+
+        def generic_details():
+            # What Web3Service did per result before the codec: decode, checksum, rebuild the dict
+            for result in results:
+                (values,) = w3.codec.decode(output_types, HexBytes(result))
+                values = list(values)
+                values[1] = to_checksum_address(values[1])
+                values[7] = to_checksum_address(values[7])
+                Web3Service._format_produce_details(values)
+
+        def fast_details():
+            for result in results:
+                decode_produce_details(result)
+
+        # ProduceListed logs, as they come back from eth_getLogs
+        event = contract.events.ProduceListed()
+        data_types = ['string', 'uint256', 'uint256', 'uint256', 'uint256']
+        logs = [
+            {
+                'address': contract.address,
+                'topics': [
+                    HexBytes(event.topic),
+                    HexBytes(produce_id.to_bytes(32, 'big')),
+                    HexBytes(bytes(12) + bytes.fromhex(farmers[produce_id % len(farmers)][2:])),
+                ],
+                'data': HexBytes(w3.codec.encode(data_types, [f'Produce {produce_id}', 10, 1000, 10000, 1700000000])),
+                'blockNumber': produce_id,
+                'blockHash': HexBytes(produce_id.to_bytes(32, 'big')),
+                'logIndex': 0,
+                'transactionHash': HexBytes(produce_id.to_bytes(32, 'big')),
+                'transactionIndex': 0,
+                'removed': False,
+            }
+            for produce_id in range(1, items + 1)
+        ]
+
+        def generic_logs():
+            for log in logs:
+                event.process_log(log)
+
+        def fast_logs():
+            for log in logs:
+                decode_event_log(log)
+
+        self.stdout.write(f"{items} items, {len(farmers)} distinct farmers")
+        for label, generic, fast in (
+            ('getProduceDetails', generic_details, fast_details),
+            ('ProduceListed log', generic_logs, fast_logs),
+        ):
+            generic_rate = items / self._time(generic)
+            fast_rate = items / self._time(fast)
+            self.stdout.write(f"  {label}:")
+            self.stdout.write(f"    web3 ABI: {generic_rate:10.0f} decodes/s")
+            self.stdout.write(f"    codec:    {fast_rate:10.0f} decodes/s")
+            self.stdout.write(self.style.SUCCESS(f"    speedup:  {fast_rate / generic_rate:.1f}x"))
+
+    @staticmethod
+    def _time(run) -> float:
+        # Best of three, to keep a cold cache or a GC pause out of the number
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+
+class StandInNode(ThreadingHTTPServer):
+    """
+    Minimal JSON-RPC node standing in for anvil
+
+    Answers getProduceDetails/getTotalProduces eth_calls (and chain metadata)
+    after a fixed delay, so the benchmark measures how well each service
+    overlaps slow RPCs rather than how fast a real node executes them.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, encode_produce):
+        super().__init__(('127.0.0.1', 0), StandInNodeHandler)
+        self.latency = latency
+        self.encode_produce = encode_produce
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StandInNodeHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.latency)
+        if isinstance(payload, list):
+            response = [self._answer(request) for request in payload]
+        else:
+            response = self._answer(payload)
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, request):
+        method = request['method']
+        if method == 'eth_chainId':
+            result = hex(31337)
+        elif method == 'eth_blockNumber':
+            result = hex(1)
+        elif method == 'eth_call':
+            result = self.server.encode_produce(request['params'][0]['data'])
+        else:
+            result = None
+        return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec of Web3Service and AsyncWeb3Service against a local stand-in node.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='getProduceDetails calls per run')
+        parser.add_argument('--latency', type=float, default=0.05, help='Simulated RPC latency in seconds')
+        parser.add_argument('--threads', type=int, default=4, help='Threads for the sync service (sync worker pool)')
+        parser.add_argument('--concurrency', type=int, default=100, help='In-flight requests for the async service')
+
+    def handle(self, *args, **options):
+        from eth_abi import encode
+
+        def encode_produce(data):
+            if len(data) == 10:
+                # Selector without arguments: getTotalProduces
+                return '0x' + encode(['uint256'], [options['requests']]).hex()
+            produce_id = int(data[10:], 16)
+            produce = (
+                produce_id, '0x70997970C51812dc3A010C7d01b50e0d17dc79C8', f'Produce {produce_id}',
+                10, 1000, 10000, False, '0x0000000000000000000000000000000000000000', 1700000000, 0,
+            )
+            return '0x' + encode(
+                ['(uint256,address,string,uint256,uint256,uint256,bool,address,uint256,uint256)'], [produce]
+            ).hex()
+
+        node = StandInNode(options['latency'], encode_produce)
+        threading.Thread(target=node.serve_forever, daemon=True).start()
+        config = {**settings.BLOCKCHAIN_CONFIG, 'RPC_URL': node.url}
+        produce_ids = range(1, options['requests'] + 1)
+
+        try:
+            with override_settings(BLOCKCHAIN_CONFIG=config):
+                from ...async_services import AsyncWeb3Service
+                from ...services import Web3Service
+
+                sync_service = Web3Service()
+                async_service = AsyncWeb3Service(sync_service=sync_service)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(sync_service.get_produce_details, produce_ids))
+            sync_elapsed = time.perf_counter() - start
+
+            async def run_async():
+                semaphore = asyncio.Semaphore(options['concurrency'])
+
+                async def fetch(produce_id):
+                    async with semaphore:
+                        return await async_service.get_produce_details(produce_id)
+
+                return await asyncio.gather(*(fetch(produce_id) for produce_id in produce_ids))
+
+            start = time.perf_counter()
+            asyncio.run(run_async())
+            async_elapsed = time.perf_counter() - start
+        finally:
+            node.shutdown()
+
+        total = options['requests']
+        self.stdout.write(f"{total} getProduceDetails calls, {options['latency'] * 1000:.0f}ms simulated RPC latency")
+        self.stdout.write(f"  sync  ({options['threads']} threads):   {total / sync_elapsed:8.1f} req/s")
+        self.stdout.write(f"  async ({options['concurrency']} in flight): {total / async_elapsed:8.1f} req/s")
+        self.stdout.write(self.style.SUCCESS(f"Async speedup: {sync_elapsed / async_elapsed:.1f}x"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ...receipts import ReceiptWorker
+
+
+class Command(BaseCommand):
+    help = 'Poll receipts for pending BlockchainTransaction rows and record their outcome.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for receipts')
+        parser.add_argument('--interval', type=float, default=4.0, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, help='Receipts per JSON-RPC batch request')
+
+    def handle(self, *args, **options):
+        worker = ReceiptWorker(batch_size=options['batch_size'])
+
+        if options['loop']:
+            self.stdout.write(f"Confirming transactions every {options['interval']}s (Ctrl+C to stop)")
+            try:
+                worker.run_forever(poll_interval=options['interval'], stdout=self.stdout)
+            except KeyboardInterrupt:
+                return
+
+        stats = worker.run_once()
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {stats['checked']} transactions: {stats['confirmed']} confirmed, "
+            f"{stats['failed']} failed, {stats['pending']} still pending."
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ...outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Sign and send queued OutboxTransaction rows in queue order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching new rows')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, help='Rows claimed per poll')
+        parser.add_argument('--max-per-second', type=float, help='Cap on transactions sent per second (0 = no cap)')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'], max_per_second=options['max_per_second'])
+
+        if options['loop']:
+            self.stdout.write(f"Dispatching outbox every {options['interval']}s (Ctrl+C to stop)")
+            try:
+                dispatcher.run_forever(poll_interval=options['interval'], stdout=self.stdout)
+            except KeyboardInterrupt:
+                return
+
+        stats = dispatcher.run_once()
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox: {stats['sent']} sent, {stats['failed']} failed, {stats['retrying']} retrying."
+        ))
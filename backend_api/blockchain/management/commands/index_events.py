@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from produce.jobs import enqueue_sync, run_sync_job
+
+from ...indexer import EventIndexer
+
+
+class Command(BaseCommand):
+    help = 'Index ProduceListed/ProduceSold contract events into ContractEvent and Produce.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new blocks')
+        parser.add_argument('--interval', type=float, default=12.0, help='Seconds between polls with --loop')
+        parser.add_argument('--from-block', type=int, help='Re-index starting at this block')
+        parser.add_argument('--chunk-size', type=int, help='Blocks per eth_getLogs request')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.run_job(options, options['from_block'])
+            return
+
+        self.stdout.write(f"Indexing events every {options['interval']}s (Ctrl+C to stop)")
+        from_block = options['from_block']
+        try:
+            while True:
+                try:
+                    self.run_job(options, from_block)
+                    from_block = None
+                except CommandError as e:
+                    self.stderr.write(str(e))
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            return
+
+    def run_job(self, options, from_block):
+        """Index new blocks as a SyncJob, under the same per-contract lock as the API's syncs"""
+        job, created = enqueue_sync('events', start=False)
+        if not created:
+            raise CommandError(f"Sync job #{job.pk} ({job.kind}) is already {job.status}")
+
+        if from_block is not None:
+            state = EventIndexer().get_state()
+            state.last_indexed_block = max(from_block - 1, 0)
+            state.save(update_fields=['last_indexed_block', 'updated_at'])
+
+        job = run_sync_job(job.pk, chunk_size=options['chunk_size'])
+        if job.status != 'succeeded':
+            raise CommandError(f"Sync job #{job.pk} failed: {job.error}")
+
+        stats = job.result
+        if stats['events'] or not options['loop']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {stats['events']} events ({stats['listed']} listed, {stats['sold']} sold) "
+                f"from blocks {stats['from_block']}-{stats['to_block']}."
+            ))
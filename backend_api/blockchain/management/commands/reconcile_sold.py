@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from ...services import get_web3_service
+
+
+class Command(BaseCommand):
+    help = "Bring Produce.is_sold in line with the contract's sold flags (getSoldBitmap)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences without updating rows')
+
+    def handle(self, *args, **options):
+        result = get_web3_service().reconcile_sold_status(apply=not options['dry_run'])
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(f"Checked {result['checked']} produces at block {result['block']}")
+        if result['newly_sold']:
+            self.stdout.write(f"  sold on chain: {result['newly_sold']}")
+        if result['unsold']:
+            self.stdout.write(f"  unsold on chain: {result['unsold']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(result['newly_sold']) + len(result['unsold'])} rows."
+        ))
@@ -0,0 +1,149 @@
+"""
+In-process RPC metrics
+
+Counts, latency histograms, payload sizes and errors per JSON-RPC method and
+contract function, filled in by ``RPCMetricsMiddleware`` and read back either
+as a snapshot dict or in the Prometheus text exposition format.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RPCSeries:
+    """Accumulated measurements for one (method, function) pair"""
+
+    __slots__ = ('count', 'errors', 'latency_sum', 'latency_max', 'buckets',
+                 'request_bytes', 'response_bytes', 'last_error')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.last_error: Optional[str] = None
+
+    def observe(self, elapsed: float, request_bytes: int, response_bytes: int, error: Optional[str]):
+        self.count += 1
+        self.latency_sum += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        if error:
+            self.errors += 1
+            self.last_error = error[:200]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket upper bound below which ``q`` of the observations fall"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            seen += self.buckets[index]
+            if seen >= target:
+                return bound
+        return self.latency_max
+
+
+class RPCMetrics:
+    """Thread-safe registry of RPC series"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], RPCSeries] = {}
+
+    def record(self, method: str, function: str, elapsed: float, request_bytes: int = 0,
+               response_bytes: int = 0, error: Optional[str] = None):
+        key = (method, function or '')
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = RPCSeries()
+            series.observe(elapsed, request_bytes, response_bytes, error)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> List[Dict]:
+        """Per-series totals, slowest (by total time) first"""
+        with self._lock:
+            items = list(self._series.items())
+            rows = []
+            for (method, function), series in items:
+                p50, p95 = series.quantile(0.5), series.quantile(0.95)
+                rows.append({
+                    'method': method,
+                    'function': function,
+                    'count': series.count,
+                    'errors': series.errors,
+                    'total_seconds': round(series.latency_sum, 6),
+                    'avg_ms': round(series.latency_sum / series.count * 1000, 3) if series.count else None,
+                    'p50_ms_le': p50 * 1000 if p50 is not None else None,
+                    'p95_ms_le': p95 * 1000 if p95 is not None else None,
+                    'max_ms': round(series.latency_max * 1000, 3),
+                    'request_bytes': series.request_bytes,
+                    'response_bytes': series.response_bytes,
+                    'last_error': series.last_error,
+                })
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            items = sorted(self._series.items())
+            lines = [
+                '# HELP agrichain_rpc_requests_total JSON-RPC requests sent to the node.',
+                '# TYPE agrichain_rpc_requests_total counter',
+            ]
+            lines += [f'agrichain_rpc_requests_total{_labels(key)} {series.count}' for key, series in items]
+            lines += [
+                '# HELP agrichain_rpc_errors_total JSON-RPC requests that raised or returned an error.',
+                '# TYPE agrichain_rpc_errors_total counter',
+            ]
+            lines += [f'agrichain_rpc_errors_total{_labels(key)} {series.errors}' for key, series in items]
+            lines += [
+                '# HELP agrichain_rpc_request_bytes_total Size of JSON-RPC request params.',
+                '# TYPE agrichain_rpc_request_bytes_total counter',
+            ]
+            lines += [f'agrichain_rpc_request_bytes_total{_labels(key)} {series.request_bytes}' for key, series in items]
+            lines += [
+                '# HELP agrichain_rpc_response_bytes_total Size of JSON-RPC responses.',
+                '# TYPE agrichain_rpc_response_bytes_total counter',
+            ]
+            lines += [f'agrichain_rpc_response_bytes_total{_labels(key)} {series.response_bytes}' for key, series in items]
+            lines += [
+                '# HELP agrichain_rpc_latency_seconds JSON-RPC round trip time.',
+                '# TYPE agrichain_rpc_latency_seconds histogram',
+            ]
+            for key, series in items:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, series.buckets):
+                    cumulative += count
+                    lines.append(f'agrichain_rpc_latency_seconds_bucket{_labels(key, le=bound)} {cumulative}')
+                lines.append(f'agrichain_rpc_latency_seconds_bucket{_labels(key, le="+Inf")} {series.count}')
+                lines.append(f'agrichain_rpc_latency_seconds_sum{_labels(key)} {series.latency_sum}')
+                lines.append(f'agrichain_rpc_latency_seconds_count{_labels(key)} {series.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key: Tuple[str, str], le=None) -> str:
+    method, function = key
+    labels = f'method="{method}",function="{function}"'
+    if le is not None:
+        labels += f',le="{le}"'
+    return '{' + labels + '}'
+
+
+# Process-wide registry shared by every service instance
+rpc_metrics = RPCMetrics()
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0002_indexerstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_address', models.CharField(max_length=42)),
+                ('block_number', models.PositiveIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-block_number'],
+                'unique_together': {('contract_address', 'block_number')},
+            },
+        ),
+    ]
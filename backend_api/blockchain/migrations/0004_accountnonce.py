@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0003_blockcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNonce',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=42, unique=True)),
+                ('next_nonce', models.PositiveIntegerField(default=0)),
+                ('released', models.JSONField(blank=True, default=list, help_text='Nonces handed back for reuse')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0004_accountnonce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockchaintransaction',
+            name='check_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blockchaintransaction',
+            name='gas_bucket',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Fee oracle gas bucket', null=True),
+        ),
+        migrations.AddField(
+            model_name='blockchaintransaction',
+            name='next_check_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When to poll for the receipt next'),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['status', 'next_check_at'], name='blockchain__status_5ed046_idx'),
+        ),
+    ]
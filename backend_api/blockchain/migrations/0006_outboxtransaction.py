@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0005_transaction_receipt_polling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('list_produce', 'List Produce'), ('buy_produce', 'Buy Produce')], max_length=20)),
+                ('payload', models.JSONField(help_text='Contract call arguments (wei amounts as strings)')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox_entry', to='blockchain.blockchaintransaction')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='blockchain__status_ce8795_idx')],
+            },
+        ),
+    ]
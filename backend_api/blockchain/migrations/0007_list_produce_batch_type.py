@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0006_outboxtransaction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blockchaintransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('list_produce', 'List Produce'), ('list_produce_batch', 'List Produce Batch'), ('buy_produce', 'Buy Produce')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='outboxtransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('list_produce', 'List Produce'), ('list_produce_batch', 'List Produce Batch'), ('buy_produce', 'Buy Produce')], max_length=20),
+        ),
+    ]
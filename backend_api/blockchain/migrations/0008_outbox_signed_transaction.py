@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blockchain', '0007_list_produce_batch_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxtransaction',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a dispatcher started sending it', null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxtransaction',
+            name='nonce',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxtransaction',
+            name='raw_transaction',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='outboxtransaction',
+            name='transaction_hash',
+            field=models.CharField(blank=True, max_length=66),
+        ),
+    ]
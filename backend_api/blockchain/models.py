@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class BlockchainTransaction(models.Model):
@@ -6,6 +7,7 @@ class BlockchainTransaction(models.Model):
 
     TRANSACTION_TYPES = [
         ('list_produce', 'List Produce'),
+        ('list_produce_batch', 'List Produce Batch'),
         ('buy_produce', 'Buy Produce'),
     ]
 
@@ -33,6 +35,11 @@ class BlockchainTransaction(models.Model):
     # Metadata
     produce_id = models.PositiveIntegerField(null=True, blank=True, help_text="Related produce ID")
     error_message = models.TextField(blank=True)
+    gas_bucket = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Fee oracle gas bucket")
+
+    # Receipt polling
+    check_attempts = models.PositiveIntegerField(default=0)
+    next_check_at = models.DateTimeField(default=timezone.now, help_text="When to poll for the receipt next")
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -44,6 +51,7 @@ class BlockchainTransaction(models.Model):
             models.Index(fields=['transaction_hash']),
             models.Index(fields=['status']),
             models.Index(fields=['produce_id']),
+            models.Index(fields=['status', 'next_check_at']),
         ]
 
     def __str__(self):
@@ -87,3 +95,84 @@ class ContractEvent(models.Model):
 
     def __str__(self):
         return f"{self.event_name} - Block {self.block_number}"
+
+
+class IndexerState(models.Model):
+    """Persisted progress of the contract event indexer"""
+
+    contract_address = models.CharField(max_length=42, unique=True)
+    last_indexed_block = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.contract_address[:10]}... indexed to block {self.last_indexed_block}"
+
+
+class BlockCheckpoint(models.Model):
+    """Hash of a block the indexer has processed, used to detect chain reorganizations"""
+
+    contract_address = models.CharField(max_length=42)
+    block_number = models.PositiveIntegerField()
+    block_hash = models.CharField(max_length=66)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-block_number']
+        unique_together = ['contract_address', 'block_number']
+
+    def __str__(self):
+        return f"Block {self.block_number} - {self.block_hash[:10]}..."
+
+
+class AccountNonce(models.Model):
+    """Shared nonce counter for a server signing account (used by the database nonce store)"""
+
+    address = models.CharField(max_length=42, unique=True)
+    next_nonce = models.PositiveIntegerField(default=0)
+    released = models.JSONField(default=list, blank=True, help_text="Nonces handed back for reuse")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.address[:10]}... next nonce {self.next_nonce}"
+
+
+class OutboxTransaction(models.Model):
+    """A server-account transaction accepted by the API and waiting to be signed and sent by the dispatcher"""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    transaction_type = models.CharField(max_length=20, choices=BlockchainTransaction.TRANSACTION_TYPES)
+    payload = models.JSONField(help_text="Contract call arguments (wei amounts as strings)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+
+    # Dispatch bookkeeping
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    transaction = models.OneToOneField(
+        BlockchainTransaction, null=True, blank=True, on_delete=models.SET_NULL, related_name='outbox_entry',
+    )
+
+    # The signed transaction, stored before it is broadcast so retries resend the same bytes
+    raw_transaction = models.TextField(blank=True)
+    transaction_hash = models.CharField(max_length=66, blank=True)
+    nonce = models.PositiveBigIntegerField(null=True, blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a dispatcher started sending it")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} #{self.pk} ({self.status})"
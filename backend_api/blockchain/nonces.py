@@ -0,0 +1,156 @@
+"""
+Local nonce allocation for the server signing account
+
+Handing out nonces locally saves an eth_getTransactionCount round trip per
+transaction and lets several listings from the same account be in flight in
+one block without colliding on the same nonce.
+"""
+import heapq
+import threading
+import time
+from typing import List, Optional
+
+from django.db import transaction
+
+from .models import AccountNonce
+
+# Node error messages that mean our idea of the next nonce is out of date
+NONCE_ERROR_MARKERS = (
+    'nonce too low',
+    'already known',
+    'replacement transaction underpriced',
+    'known transaction',
+)
+
+
+def is_nonce_error(error: Exception) -> bool:
+    """True if a send failed because the nonce was already used on chain"""
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+
+class NonceManager:
+    """
+    Thread-safe nonce allocator for one account
+
+    Nonces are counted up locally from the account's pending transaction
+    count. A nonce whose transaction never reached the node is handed back
+    with ``release`` and reused first so it doesn't leave a gap. ``resync``
+    re-reads the chain and only ever moves the counter forward (after "nonce
+    too low" errors or another signer using the account): a pending count
+    below the counter usually means the node hasn't caught up with
+    transactions still in flight, and reissuing those nonces would replace
+    or duplicate them. Nonces of transactions known to be dropped are handed
+    back with ``reclaim_dropped``.
+
+    With ``use_database=True`` the counter lives in an AccountNonce row
+    locked with select_for_update, so several worker processes can share
+    one signing account.
+    """
+
+    def __init__(self, w3, address: str, use_database: bool = False, resync_interval: float = 60.0):
+        self.w3 = w3
+        self.address = address
+        self.use_database = use_database
+        self.resync_interval = resync_interval
+        self._lock = threading.Lock()
+        self._next_nonce: Optional[int] = None
+        self._released: List[int] = []
+        self._last_sync = 0.0
+
+    def allocate(self) -> int:
+        """Reserve the next nonce for a transaction"""
+        with self._lock:
+            if self.use_database:
+                return self._allocate_from_database()
+            if self._next_nonce is None or time.monotonic() - self._last_sync > self.resync_interval:
+                self._sync_locked()
+            if self._released:
+                return heapq.heappop(self._released)
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int):
+        """Hand back a nonce whose transaction was never accepted by the node"""
+        with self._lock:
+            self._release_locked([nonce])
+
+    def reclaim_dropped(self, nonces: List[int]) -> List[int]:
+        """
+        Hand back the nonces of transactions the node dropped
+
+        Only nonces at or above the chain's pending count are reclaimed; a
+        lower one was used after all. Returns the reclaimed nonces.
+        """
+        with self._lock:
+            chain_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            dropped = [nonce for nonce in nonces if nonce >= chain_nonce]
+            self._release_locked(dropped)
+            return dropped
+
+    def _release_locked(self, nonces: List[int]):
+        if not nonces:
+            return
+        if self.use_database:
+            with transaction.atomic():
+                record = self._locked_record()
+                released = set(record.released)
+                released.update(nonce for nonce in nonces if nonce < record.next_nonce)
+                if released != set(record.released):
+                    record.released = sorted(released)
+                    record.save(update_fields=['released', 'updated_at'])
+            return
+        for nonce in nonces:
+            if self._next_nonce is not None and nonce < self._next_nonce and nonce not in self._released:
+                heapq.heappush(self._released, nonce)
+
+    def resync(self):
+        """Re-read the account's nonce from the chain"""
+        with self._lock:
+            if self.use_database:
+                with transaction.atomic():
+                    record = self._locked_record()
+                    record.next_nonce, record.released = self._reconcile(record.next_nonce, record.released)
+                    record.save(update_fields=['next_nonce', 'released', 'updated_at'])
+                return
+            self._sync_locked()
+
+    def _sync_locked(self):
+        self._next_nonce, self._released = self._reconcile(self._next_nonce, self._released)
+        heapq.heapify(self._released)
+        self._last_sync = time.monotonic()
+
+    def _reconcile(self, next_nonce: Optional[int], released: List[int]):
+        """
+        Merge the chain's pending count with local state
+
+        The counter becomes max(local, chain) and is never rewound. Released
+        nonces below the chain count were used by someone else and are
+        dropped from the pool.
+        """
+        chain_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+        if next_nonce is None or chain_nonce >= next_nonce:
+            return chain_nonce, []
+        return next_nonce, sorted(nonce for nonce in released if nonce >= chain_nonce)
+
+    def _locked_record(self) -> AccountNonce:
+        record = AccountNonce.objects.select_for_update().filter(address=self.address.lower()).first()
+        if record is None:
+            record = AccountNonce.objects.create(
+                address=self.address.lower(),
+                next_nonce=self.w3.eth.get_transaction_count(self.address, 'pending'),
+            )
+        return record
+
+    def _allocate_from_database(self) -> int:
+        with transaction.atomic():
+            record = self._locked_record()
+            if record.released:
+                nonce = record.released[0]
+                record.released = record.released[1:]
+            else:
+                nonce = record.next_nonce
+                record.next_nonce += 1
+            record.save(update_fields=['next_nonce', 'released', 'updated_at'])
+            return nonce
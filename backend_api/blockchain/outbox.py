@@ -0,0 +1,221 @@
+"""
+Dispatcher for the transaction outbox
+
+The API only validates a request and queues an OutboxTransaction, so its
+latency no longer depends on the node. The dispatcher sends queued rows
+oldest first from a single loop. The NonceManager hands out nonces in that
+same order.
+
+A transient failure (timeout, rate limit, nonce or fee race) stops the
+run and the row is retried after a backoff, so later rows never overtake
+it. A permanent failure (the call reverts, funds are short) fails that row
+and dispatch carries on. Sent rows are linked to the BlockchainTransaction
+that ReceiptWorker then confirms.
+
+The signed transaction is saved on the row before it is broadcast. A retry
+resends those same bytes, so a send that timed out after the node accepted
+it can't list the produce a second time under another nonce. The row is
+only signed again when the node has definitely rejected the bytes. Rows
+left 'sending' by a dispatcher that died are queued again after
+OUTBOX_SENDING_TIMEOUT.
+"""
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fees import batch_bucket, name_length_bucket
+from .models import OutboxTransaction
+from .nonces import is_nonce_error
+from .services import get_web3_service
+
+PERMANENT_ERROR_MARKERS = ('revert', 'insufficient funds', 'invalid')
+FEE_ERROR_MARKERS = ('underpriced', 'base fee')
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Errors that will fail the same way on every retry"""
+    if isinstance(error, NotImplementedError):
+        return True
+    if is_nonce_error(error):
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in PERMANENT_ERROR_MARKERS)
+
+
+class OutboxDispatcher:
+    """Sign and send queued OutboxTransaction rows in queue order"""
+
+    def __init__(self, service=None, batch_size: Optional[int] = None, max_per_second: Optional[float] = None,
+                 base_backoff: float = 2.0, max_backoff: float = 120.0, max_attempts: int = 10,
+                 sending_timeout: Optional[float] = None):
+        self.service = service or get_web3_service()
+        self.batch_size = batch_size or settings.BLOCKCHAIN_CONFIG.get('OUTBOX_BATCH_SIZE', 20)
+        if sending_timeout is None:
+            sending_timeout = settings.BLOCKCHAIN_CONFIG.get('OUTBOX_SENDING_TIMEOUT', 300)
+        self.sending_timeout = sending_timeout
+        if max_per_second is None:
+            max_per_second = settings.BLOCKCHAIN_CONFIG.get('OUTBOX_MAX_PER_SECOND', 0)
+        self.min_interval = 1.0 / max_per_second if max_per_second else 0.0
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._last_sent_at = 0.0
+
+    def due_entries(self) -> List[OutboxTransaction]:
+        """Queued rows in queue order, up to the first one still backing off"""
+        now = timezone.now()
+        entries = []
+        for entry in OutboxTransaction.objects.filter(status='queued').order_by('id')[:self.batch_size]:
+            if entry.next_attempt_at > now:
+                # Don't let later rows take the nonce this one is waiting to use
+                break
+            entries.append(entry)
+        return entries
+
+    def reclaim_stale(self) -> int:
+        """Queue rows again that a dispatcher claimed and never finished"""
+        return OutboxTransaction.objects.filter(
+            status='sending',
+            claimed_at__lt=timezone.now() - timedelta(seconds=self.sending_timeout),
+        ).update(status='queued')
+
+    def reclaim_dropped_nonces(self) -> List[int]:
+        """
+        Hand back the nonces of sent rows whose transaction was dropped
+
+        ReceiptWorker fails a transaction it never found a receipt for; the
+        nonce manager checks the chain before reusing its nonce.
+        """
+        dropped = OutboxTransaction.objects.filter(
+            status='sent', nonce__isnull=False, transaction__status='failed', transaction__block_number__isnull=True,
+        )
+        nonces = list(dropped.values_list('nonce', flat=True))
+        if not nonces:
+            return []
+        reclaimed = self.service.nonce_manager.reclaim_dropped(nonces)
+        # Settled either way: reclaimed now, or used on chain after all
+        dropped.filter(nonce__in=nonces).update(nonce=None)
+        return reclaimed
+
+    def run_once(self) -> Dict:
+        stats = {'sent': 0, 'failed': 0, 'retrying': 0}
+        self.reclaim_stale()
+        self.reclaim_dropped_nonces()
+        for entry in self.due_entries():
+            # Claim the row, so a second dispatcher can't send it too
+            claimed_at = timezone.now()
+            if not OutboxTransaction.objects.filter(pk=entry.pk, status='queued').update(
+                status='sending', claimed_at=claimed_at,
+            ):
+                continue
+            entry.claimed_at = claimed_at
+            outcome = self.dispatch(entry)
+            stats[outcome] += 1
+            if outcome == 'retrying':
+                break
+        return stats
+
+    def run_forever(self, poll_interval: float = 1.0, stdout=None):
+        """Keep dispatching until interrupted"""
+        while True:
+            stats = self.run_once()
+            if stdout is not None and any(stats.values()):
+                stdout.write(
+                    f"Outbox: {stats['sent']} sent, {stats['failed']} failed, {stats['retrying']} retrying"
+                )
+            time.sleep(poll_interval)
+
+    def dispatch(self, entry: OutboxTransaction) -> str:
+        """Send one claimed row and record the outcome ('sent', 'failed' or 'retrying')"""
+        self._throttle()
+        entry.attempts += 1
+        try:
+            entry.transaction = self.send(entry)
+        except Exception as e:
+            entry.last_error = f"{type(e).__name__}: {e}"[:1000]
+            if is_permanent_error(e) or entry.attempts >= self.max_attempts:
+                entry.status = 'failed'
+                if entry.nonce is not None and not entry.raw_transaction:
+                    # Reserved for this row but never accepted by the node
+                    self.service.nonce_manager.release(entry.nonce)
+                    entry.nonce = None
+            else:
+                entry.status = 'queued'
+                delay = min(self.base_backoff * 2 ** (entry.attempts - 1), self.max_backoff)
+                entry.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            entry.save(update_fields=[
+                'status', 'attempts', 'last_error', 'next_attempt_at', 'raw_transaction', 'transaction_hash', 'nonce',
+            ])
+            return 'failed' if entry.status == 'failed' else 'retrying'
+
+        entry.status = 'sent'
+        entry.last_error = ''
+        entry.sent_at = timezone.now()
+        entry.save(update_fields=['status', 'attempts', 'last_error', 'transaction', 'sent_at'])
+        return 'sent'
+
+    def send(self, entry: OutboxTransaction):
+        """Broadcast the row's signed transaction, signing it first if needed"""
+        if not entry.raw_transaction:
+            signed = self.sign(entry)
+            entry.raw_transaction = signed['raw_transaction']
+            entry.transaction_hash = signed['transaction_hash']
+            entry.nonce = signed['nonce']
+            entry.save(update_fields=['raw_transaction', 'transaction_hash', 'nonce'])
+
+        try:
+            self.service.broadcast(entry.raw_transaction)
+        except Exception as e:
+            if is_nonce_error(e) and self.service.transaction_known(entry.transaction_hash):
+                # An earlier attempt got through and has been mined since
+                pass
+            elif is_nonce_error(e):
+                # The nonce went to another transaction, so these bytes can never be mined
+                self.service.nonce_manager.resync()
+                self._discard_signed(entry, keep_nonce=False)
+                raise
+            elif any(marker in str(e).lower() for marker in FEE_ERROR_MARKERS):
+                # Rejected outright: sign again with the same nonce and fresh fees
+                self._discard_signed(entry, keep_nonce=True)
+                raise
+            else:
+                if is_permanent_error(e):
+                    # The node refused the bytes; dispatch hands the nonce back
+                    self._discard_signed(entry, keep_nonce=True)
+                raise
+
+        return self.service.record_transaction(entry.transaction_hash, entry.transaction_type, self.gas_bucket(entry))
+
+    def sign(self, entry: OutboxTransaction) -> Dict:
+        if entry.transaction_type == 'list_produce':
+            payload = entry.payload
+            return self.service.sign_list_produce(
+                payload['name'], int(payload['quantity']), int(payload['price_per_unit']), nonce=entry.nonce,
+            )
+        if entry.transaction_type == 'list_produce_batch':
+            return self.service.sign_list_produce_batch(entry.payload['items'], nonce=entry.nonce)
+        raise NotImplementedError(f"Unsupported outbox transaction type: {entry.transaction_type}")
+
+    @staticmethod
+    def gas_bucket(entry: OutboxTransaction) -> Optional[int]:
+        if entry.transaction_type == 'list_produce':
+            return name_length_bucket(entry.payload['name'])
+        return batch_bucket([item['name'] for item in entry.payload['items']])
+
+    @staticmethod
+    def _discard_signed(entry: OutboxTransaction, keep_nonce: bool):
+        entry.raw_transaction = ''
+        entry.transaction_hash = ''
+        if not keep_nonce:
+            entry.nonce = None
+
+    def _throttle(self):
+        """Spread a burst of queued rows out to at most max_per_second sends"""
+        if self.min_interval:
+            wait = self._last_sent_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_sent_at = time.monotonic()
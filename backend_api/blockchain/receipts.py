@@ -0,0 +1,154 @@
+"""
+Receipt confirmation worker for BlockchainTransaction
+
+Polls receipts for pending transaction hashes with batched
+eth_getTransactionReceipt requests, fills in block/gas/confirmation details,
+marks reverted transactions as failed and backs off on hashes the node
+doesn't know about yet.
+"""
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import BlockchainTransaction
+from .services import get_web3_service
+
+FUNCTION_NAMES = {
+    'list_produce': 'listProduce',
+    'list_produce_batch': 'listProduceBatch',
+    'buy_produce': 'buyProduce',
+}
+
+UPDATE_FIELDS = [
+    'status', 'block_number', 'gas_used', 'gas_price', 'error_message',
+    'confirmed_at', 'check_attempts', 'next_check_at',
+]
+
+
+def _hex_to_int(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+class ReceiptWorker:
+    """Confirm pending BlockchainTransaction rows from their receipts"""
+
+    def __init__(self, service=None, batch_size: Optional[int] = None, limit: int = 500,
+                 base_backoff: float = 4.0, max_backoff: float = 300.0, max_attempts: int = 60):
+        self.service = service or get_web3_service()
+        self.batch_size = batch_size or settings.BLOCKCHAIN_CONFIG.get('RPC_BATCH_SIZE', 50)
+        self.limit = limit
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+    def due_transactions(self) -> List[BlockchainTransaction]:
+        """Pending transactions whose next check is due, oldest first (served by the status/next_check_at index)"""
+        return list(
+            BlockchainTransaction.objects
+            .filter(status='pending', next_check_at__lte=timezone.now())
+            .order_by('next_check_at')
+            # Every field bulk_update writes must be loaded, or it fetches each one per row
+            .only('id', 'transaction_hash', 'transaction_type', 'gas_bucket', *UPDATE_FIELDS)
+            [:self.limit]
+        )
+
+    def run_once(self) -> Dict:
+        transactions = self.due_transactions()
+        stats = {'checked': len(transactions), 'confirmed': 0, 'failed': 0, 'pending': 0}
+
+        for start in range(0, len(transactions), self.batch_size):
+            chunk = transactions[start:start + self.batch_size]
+            receipts = self.fetch_receipts([tx.transaction_hash for tx in chunk])
+            now = timezone.now()
+            for tx in chunk:
+                outcome = self.apply_receipt(tx, receipts.get(tx.transaction_hash), now)
+                stats[outcome] += 1
+            BlockchainTransaction.objects.bulk_update(chunk, UPDATE_FIELDS)
+
+        return stats
+
+    def run_forever(self, poll_interval: float = 4.0, stdout=None):
+        """Keep confirming transactions until interrupted"""
+        while True:
+            stats = self.run_once()
+            if stdout is not None and stats['checked']:
+                stdout.write(
+                    f"Checked {stats['checked']} transactions: {stats['confirmed']} confirmed, "
+                    f"{stats['failed']} failed, {stats['pending']} still pending"
+                )
+            time.sleep(poll_interval)
+
+    def fetch_receipts(self, tx_hashes: List[str]) -> Dict[str, Optional[Dict]]:
+        """Receipts keyed by hash; None for hashes without a receipt (yet) or failed lookups"""
+        batch = [('eth_getTransactionReceipt', [self._prefixed(tx_hash)]) for tx_hash in tx_hashes]
+        try:
+            responses = self.service.make_batch_request(batch)
+        except Exception as e:
+            print(f"Error fetching {len(tx_hashes)} receipts: {e}")
+            return {}
+        if not isinstance(responses, list):
+            print(f"Receipt batch rejected: {responses.get('error') if isinstance(responses, dict) else responses}")
+            return {}
+
+        receipts = {}
+        for tx_hash, response in zip(tx_hashes, responses):
+            receipts[tx_hash] = response.get('result') if 'error' not in response else None
+        return receipts
+
+    def apply_receipt(self, tx: BlockchainTransaction, receipt: Optional[Dict], now) -> str:
+        """Update ``tx`` in memory from its receipt and return the outcome"""
+        if receipt is None:
+            tx.check_attempts += 1
+            if tx.check_attempts >= self.max_attempts:
+                tx.status = 'failed'
+                tx.error_message = f'No receipt after {tx.check_attempts} checks, transaction was likely dropped'
+                return 'failed'
+            delay = min(self.base_backoff * 2 ** (tx.check_attempts - 1), self.max_backoff)
+            tx.next_check_at = now + timedelta(seconds=delay)
+            return 'pending'
+
+        tx.block_number = _hex_to_int(receipt.get('blockNumber'))
+        tx.gas_used = _hex_to_int(receipt.get('gasUsed'))
+        tx.gas_price = _hex_to_int(receipt.get('effectiveGasPrice'))
+        tx.confirmed_at = now
+        tx.check_attempts += 1
+
+        if _hex_to_int(receipt.get('status')) == 1:
+            tx.status = 'confirmed'
+            self._observe_gas(tx)
+            return 'confirmed'
+
+        tx.status = 'failed'
+        tx.error_message = f'Transaction reverted: {self.revert_reason(tx.transaction_hash, tx.block_number)}'
+        return 'failed'
+
+    def revert_reason(self, tx_hash: str, block_number: int) -> str:
+        """Replay a reverted transaction as an eth_call to recover its reason string"""
+        try:
+            tx = self.service.w3.eth.get_transaction(self._prefixed(tx_hash))
+            self.service.w3.eth.call({
+                'from': tx['from'],
+                'to': tx['to'],
+                'data': tx['input'],
+                'value': tx['value'],
+                'gas': tx['gas'],
+            }, block_number - 1)
+        except Exception as e:
+            message = getattr(e, 'message', None) or str(e)
+            return message.removeprefix('execution reverted: ') or 'unknown reason'
+        return 'unknown reason'
+
+    def _observe_gas(self, tx: BlockchainTransaction):
+        """Teach the fee oracle what this kind of transaction actually costs"""
+        function_name = FUNCTION_NAMES.get(tx.transaction_type)
+        if function_name and tx.gas_used:
+            self.service.fee_oracle.observe_gas_used(function_name, tx.gas_bucket, tx.gas_used)
+
+    @staticmethod
+    def _prefixed(tx_hash: str) -> str:
+        return tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
@@ -0,0 +1,154 @@
+"""
+web3 middleware feeding blockchain.metrics
+
+Sits innermost in the onion (next to the provider), so the recorded latency
+is the node round trip. Contract calls are labelled with the function name
+looked up from the 4-byte selector of the call data.
+"""
+import json
+import time
+from typing import Any, Dict, Optional
+
+from web3.middleware.base import Web3MiddlewareBuilder
+
+from .metrics import rpc_metrics
+
+# Methods whose first param is a transaction dict with call data
+CALL_METHODS = {'eth_call', 'eth_estimateGas', 'eth_sendTransaction'}
+
+
+def _payload_size(payload: Any) -> int:
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _response_error(response) -> Optional[str]:
+    if isinstance(response, dict) and response.get('error'):
+        return str(response['error'])
+    return None
+
+
+class RPCMetricsMiddleware(Web3MiddlewareBuilder):
+    """Records count, latency, payload sizes and errors for every RPC"""
+
+    selectors: Dict[str, str] = {}
+    metrics = rpc_metrics
+
+    @staticmethod
+    def build(selectors: Optional[Dict[str, str]] = None, metrics=None):
+        """Middleware factory for ``middleware_onion.inject(..., layer=0)`` (w3 is curried in later)"""
+        def builder(w3):
+            middleware = RPCMetricsMiddleware(w3)
+            middleware.selectors = selectors or {}
+            middleware.metrics = metrics or rpc_metrics
+            return middleware
+        return builder
+
+    @staticmethod
+    def selectors_for(contract) -> Dict[str, str]:
+        """Map of '0x'-prefixed selector -> function name for a web3 contract"""
+        from eth_utils import function_abi_to_4byte_selector
+
+        return {
+            '0x' + function_abi_to_4byte_selector(abi).hex(): abi['name']
+            for abi in contract.abi if abi.get('type') == 'function'
+        }
+
+    def function_name(self, method: str, params: Any) -> str:
+        try:
+            if method in CALL_METHODS:
+                data = params[0].get('data') or params[0].get('input') or ''
+            elif method == 'eth_sendRawTransaction':
+                data = self._raw_transaction_data(params[0])
+            else:
+                return ''
+        except (AttributeError, IndexError, KeyError, TypeError):
+            return ''
+        if not isinstance(data, str):
+            data = '0x' + bytes(data).hex()
+        return self.selectors.get(data[:10].lower(), '')
+
+    @staticmethod
+    def _raw_transaction_data(raw) -> str:
+        from eth_account.typed_transactions import TypedTransaction
+        from hexbytes import HexBytes
+
+        try:
+            data = TypedTransaction.from_bytes(HexBytes(raw)).as_dict().get('data', b'')
+        except Exception:
+            return ''
+        return '0x' + bytes(data).hex()
+
+    def _record(self, method, params, elapsed, response=None, error=None):
+        self.metrics.record(
+            method,
+            self.function_name(method, params),
+            elapsed,
+            request_bytes=_payload_size(params),
+            response_bytes=_payload_size(response) if response is not None else 0,
+            error=error or _response_error(response),
+        )
+
+    def _record_batch(self, requests_info, elapsed, response=None, error=None):
+        # Every call in a batch is charged the batch's wall time, which is what its caller waited
+        responses = response if isinstance(response, list) else [response] * len(requests_info)
+        for (method, params), item in zip(requests_info, responses):
+            self._record(method, params, elapsed, item, error)
+
+    # -- sync -- #
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception as e:
+                self._record(method, params, time.perf_counter() - start, error=f'{type(e).__name__}: {e}')
+                raise
+            self._record(method, params, time.perf_counter() - start, response)
+            return response
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            start = time.perf_counter()
+            try:
+                response = make_batch_request(requests_info)
+            except Exception as e:
+                self._record_batch(requests_info, time.perf_counter() - start, error=f'{type(e).__name__}: {e}')
+                raise
+            self._record_batch(requests_info, time.perf_counter() - start, response)
+            return response
+
+        return middleware
+
+    # -- async -- #
+
+    async def async_wrap_make_request(self, make_request):
+        async def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                response = await make_request(method, params)
+            except Exception as e:
+                self._record(method, params, time.perf_counter() - start, error=f'{type(e).__name__}: {e}')
+                raise
+            self._record(method, params, time.perf_counter() - start, response)
+            return response
+
+        return middleware
+
+    async def async_wrap_make_batch_request(self, make_batch_request):
+        async def middleware(requests_info):
+            start = time.perf_counter()
+            try:
+                response = await make_batch_request(requests_info)
+            except Exception as e:
+                self._record_batch(requests_info, time.perf_counter() - start, error=f'{type(e).__name__}: {e}')
+                raise
+            self._record_batch(requests_info, time.perf_counter() - start, response)
+            return response
+
+        return middleware
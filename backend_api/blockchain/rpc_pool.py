@@ -0,0 +1,206 @@
+"""
+Multi-endpoint JSON-RPC provider
+
+Reads go to the healthy endpoint with the lowest recent latency and fail
+over to the next one; writes (and the nonce lookups they depend on) are
+pinned to the primary endpoint so a transaction and its nonce always come
+from the same mempool. Each endpoint keeps its own keep-alive HTTP session
+and a circuit breaker that takes it out of rotation after repeated failures;
+once the cooldown has passed, a single trial call decides whether it comes
+back. A read for a block a lagging endpoint hasn't seen yet ("header not
+found") is retried on the next endpoint instead of surfacing as an error.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from web3 import HTTPProvider
+from web3.exceptions import ProviderConnectionError
+from web3.providers.base import JSONBaseProvider
+
+# Methods that must always hit the primary endpoint
+PINNED_METHODS = {
+    'eth_sendRawTransaction',
+    'eth_sendTransaction',
+    'eth_getTransactionCount',
+}
+
+# JSON-RPC error codes that mean the endpoint (not the request) is the problem
+ENDPOINT_ERROR_CODES = {-32005, -32603, 429}
+ENDPOINT_ERROR_MARKERS = ('rate limit', 'too many requests', 'limit exceeded', 'timeout')
+# Errors (usually -32000) from an endpoint behind the head that another endpoint may answer
+LAGGING_ERROR_MARKERS = ('header not found', 'unknown block', 'block not found', 'missing trie node')
+
+
+def _is_endpoint_error(response) -> bool:
+    """True for JSON-RPC errors caused by the provider rather than the call itself"""
+    responses = response if isinstance(response, list) else [response]
+    for item in responses:
+        error = item.get('error') if isinstance(item, dict) else None
+        if not error:
+            continue
+        if not isinstance(error, dict):
+            return True
+        message = str(error.get('message', '')).lower()
+        if error.get('code') in ENDPOINT_ERROR_CODES or any(
+            marker in message for marker in ENDPOINT_ERROR_MARKERS + LAGGING_ERROR_MARKERS
+        ):
+            return True
+    return False
+
+
+class RPCEndpoint:
+    """One upstream node with latency/health tracking and a circuit breaker"""
+
+    def __init__(self, url: str, provider, failure_threshold: int = 3, cooldown: float = 30.0,
+                 latency_decay: float = 0.3):
+        self.url = url
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency_decay = latency_decay
+        self._lock = threading.Lock()
+        self.latency: Optional[float] = None  # exponentially weighted, seconds
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+
+    def is_tripped(self) -> bool:
+        return self.consecutive_failures >= self.failure_threshold
+
+    def is_available(self, now: float) -> bool:
+        """Closed breaker, or open breaker whose cooldown has passed with no trial call in flight"""
+        return not self.is_tripped() or (self.open_until <= now and not self.trial_in_flight)
+
+    def try_acquire(self, now: float, early: bool = False) -> bool:
+        """
+        Claim the endpoint for one request
+
+        A closed breaker lets everything through. A tripped one lets a single
+        trial call through once the cooldown has passed (or ``early``, when
+        every endpoint is down); its outcome closes or re-opens the breaker.
+        """
+        with self._lock:
+            if not self.is_tripped():
+                return True
+            if self.trial_in_flight or (self.open_until > now and not early):
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def score(self) -> float:
+        # Endpoints without samples yet sort first so they get measured
+        return self.latency if self.latency is not None else 0.0
+
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self.requests += 1
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self.trial_in_flight = False
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency = self.latency_decay * elapsed + (1 - self.latency_decay) * self.latency
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.is_tripped():
+                self.open_until = time.monotonic() + self.cooldown
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'requests': self.requests,
+            'failures': self.failures,
+            'circuit_open': self.open_until > time.monotonic(),
+        }
+
+
+def _build_http_provider(url: str, pool_size: int, timeout: float) -> HTTPProvider:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # No per-endpoint retries: failing over to another endpoint is faster
+    return HTTPProvider(
+        url, session=session, request_kwargs={'timeout': timeout}, exception_retry_configuration=None,
+    )
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """web3 provider spreading requests over several RPC endpoints"""
+
+    def __init__(self, urls: List[str], pool_size: int = 20, timeout: float = 10.0,
+                 failure_threshold: int = 3, cooldown: float = 30.0):
+        super().__init__()
+        if not urls:
+            raise ValueError('PooledHTTPProvider needs at least one RPC URL')
+        self.endpoints = [
+            RPCEndpoint(url, _build_http_provider(url, pool_size, timeout), failure_threshold, cooldown)
+            for url in urls
+        ]
+        self.primary = self.endpoints[0]
+
+    def __str__(self):
+        return f"RPC pool {[endpoint.url for endpoint in self.endpoints]}"
+
+    def candidates(self, method: Optional[str] = None) -> List[RPCEndpoint]:
+        """Endpoints to try for a request, best first"""
+        if method in PINNED_METHODS:
+            return [self.primary]
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)]
+        if not available:
+            # Every breaker is open: try the one closest to recovering
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.open_until)
+        return sorted(available, key=RPCEndpoint.score)
+
+    def make_request(self, method, params):
+        return self._dispatch(method, lambda provider: provider.make_request(method, params))
+
+    def make_batch_request(self, requests):
+        # A batch is pinned if any of its calls is
+        method = next((m for m, _ in requests if m in PINNED_METHODS), None)
+        return self._dispatch(method, lambda provider: provider.make_batch_request(requests))
+
+    def _dispatch(self, method, send):
+        last_error: Optional[Exception] = None
+        last_response = None
+        pinned = method in PINNED_METHODS
+        now = time.monotonic()
+        all_down = not any(endpoint.is_available(now) for endpoint in self.endpoints)
+        for endpoint in self.candidates(method):
+            if not pinned and not endpoint.try_acquire(now, early=all_down):
+                continue
+            start = time.perf_counter()
+            try:
+                response = send(endpoint.provider)
+            except Exception as e:
+                endpoint.record_failure()
+                last_error = e
+                continue
+            if _is_endpoint_error(response):
+                endpoint.record_failure()
+                last_response = response
+                continue
+            endpoint.record_success(time.perf_counter() - start)
+            return response
+
+        if last_response is not None:
+            return last_response
+        if last_error is None:
+            raise ProviderConnectionError(f"No RPC endpoint available for {method or 'request'}: circuits open")
+        raise ProviderConnectionError(f"All RPC endpoints failed for {method or 'request'}: {last_error}")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-endpoint health, for diagnostics"""
+        return [endpoint.snapshot() for endpoint in self.endpoints]
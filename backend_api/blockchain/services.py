@@ -1,33 +1,291 @@
 """
 Web3 service for interacting with AgriChain smart contract
 """
+import copy
 import json
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
 
 from django.conf import settings
-from web3 import Web3
-try:
-    from web3.middleware import geth_poa_middleware
-except ImportError:
-    # For newer versions of web3.py
-    from web3.middleware import ExtraDataToPOAMiddleware as geth_poa_middleware
-from eth_account import Account
+from django.db import transaction
+from django.utils import timezone
 
+from .codec import (
+    decode_produce_details,
+    decode_produce_details_batch,
+    encode_get_produce_details,
+    encode_get_produce_details_batch,
+)
+from .fees import FeeOracle, batch_bucket, name_length_bucket
 from .models import BlockchainTransaction, ContractEvent
+from .nonces import NonceManager, is_nonce_error
 
+# Mirrors MAX_BATCH_SIZE in AgriChain.vy: most lots one listProduceBatch call accepts
+MAX_LIST_BATCH_SIZE = 50
+# Mirrors MAX_PAGE_SIZE in AgriChain.vy: most IDs one getAvailableProducesPage call returns
+AVAILABLE_PAGE_SIZE = 500
+# Mirrors MAX_DETAILS_BATCH in AgriChain.vy: most IDs one getProduceDetailsBatch call accepts
+DETAILS_BATCH_SIZE = 200
+# Mirrors MAX_SOLD_BITMAP_IDS in AgriChain.vy: most IDs one getSoldBitmap call covers
+SOLD_BITMAP_SIZE = 4096
 
-class Web3Service:
+
+class _InFlightCall:
+    """A view call being loaded by one thread while others wait for its result"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class BlockAwareReadCache:
+    """
+    Read-through cache for contract view calls, keyed by
+    (contract, function, args, block number)
+
+    View results can only change when a block is mined, so each result is
+    valid until the head moves. The head is polled with eth_blockNumber at
+    most once per ``head_ttl`` seconds, and calls are pinned to that block
+    so a cached value is exactly what the node returns for it. Identical
+    calls that arrive while one is in flight wait for it instead of sending
+    their own RPC (single-flight).
+    """
+
+    def __init__(self, w3, head_ttl: float = 1.0, max_entries: int = 4096):
+        self.w3 = w3
+        self.head_ttl = head_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._head_lock = threading.Lock()
+        self._head: Optional[int] = None
+        self._head_checked_at = 0.0
+        self._entries: 'OrderedDict[Tuple, Any]' = OrderedDict()
+        self._in_flight: Dict[Tuple, _InFlightCall] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def head_block(self) -> Optional[int]:
+        """Latest block number, polled at most once per head_ttl (None if the node can't be reached)"""
+        if self._head is not None and time.monotonic() - self._head_checked_at < self.head_ttl:
+            return self._head
+        with self._head_lock:
+            # Another thread may have polled while we waited for the lock
+            if self._head is not None and time.monotonic() - self._head_checked_at < self.head_ttl:
+                return self._head
+            try:
+                head = self.w3.eth.block_number
+            except Exception as e:
+                print(f"Error polling head block: {e}")
+                return None
+            with self._lock:
+                if self._head is None or head > self._head:
+                    # Everything cached so far belongs to an older block
+                    self._entries.clear()
+                self._head = head
+                self._head_checked_at = time.monotonic()
+            return head
+
+    def get(self, key: Hashable, block: int) -> Tuple[bool, Any]:
+        """(found, value) for ``key`` at ``block`` without loading it"""
+        with self._lock:
+            full_key = (key, block)
+            if full_key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(full_key)
+                return True, copy.copy(self._entries[full_key])
+        return False, None
+
+    def set(self, key: Hashable, block: int, value: Any):
+        with self._lock:
+            # A slow load can finish after the head moved on; don't keep stale blocks
+            if self._head is not None and block < self._head:
+                return
+            self._entries[(key, block)] = value
+            self._entries.move_to_end((key, block))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[Any], Any]) -> Any:
+        """
+        Cached value of ``key`` at the current head, calling ``loader(block)`` on a miss
+
+        ``loader`` gets the block number to pin the call to ('latest' when the
+        head is unknown, in which case nothing is cached).
+        """
+        block = self.head_block()
+        if block is None:
+            return loader('latest')
+
+        full_key = (key, block)
+        with self._lock:
+            if full_key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(full_key)
+                return copy.copy(self._entries[full_key])
+            call = self._in_flight.get(full_key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[full_key] = _InFlightCall()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.copy(call.value)
+
+        try:
+            call.value = loader(block)
+        except BaseException as e:
+            # Failures are handed to the waiters but never cached
+            call.error = e
+            raise
+        else:
+            self.set(key, block, call.value)
+            return copy.copy(call.value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(full_key, None)
+            call.done.set()
+
+    def call(self, contract, function_name: str, *args) -> Any:
+        """Cached ``contract.functions.<function_name>(*args).call()``"""
+        return self.get_or_load(
+            (contract.address, function_name, args),
+            lambda block: contract.functions[function_name](*args).call(block_identifier=block),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'head_block': self._head,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+            }
+
+
+class ProduceDetailsBatchMixin:
+    """Request building and decoding for batched getProduceDetails calls (shared by the sync and async services)"""
+
+    # Cleared the first time getProduceDetailsBatch reverts, i.e. the
+    # deployed contract predates it; reads then go one call per ID
+    details_batch_supported = True
+
+    def _produce_details_batch_calls(self, chunks: List[List[int]], block_identifier='latest') -> List:
+        """One getProduceDetailsBatch eth_call per chunk of IDs"""
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        return [
+            ('eth_call', [{
+                'to': self.contract.address,
+                'data': encode_get_produce_details_batch(chunk),
+            }, block_identifier])
+            for chunk in chunks
+        ]
+
+    def _decode_produce_details_batch_call(self, chunk: List[int], response) -> Optional[Dict[int, Optional[Dict]]]:
+        """Details for one chunk, or None if the call failed and the chunk needs the per-ID path"""
+        if not isinstance(response, dict) or 'error' in response or not response.get('result'):
+            error = response.get('error', 'no result') if isinstance(response, dict) else 'no response'
+            print(f"Error getting details for {len(chunk)} produces in one call: {error}")
+            if 'revert' in str(error).lower():
+                self.details_batch_supported = False
+            return None
+        try:
+            records = decode_produce_details_batch(response['result'])
+        except Exception as e:
+            print(f"Error decoding details for {len(chunk)} produces: {e}")
+            return None
+        return {
+            produce_id: record.as_dict() if record is not None else None
+            for produce_id, record in zip(chunk, records)
+        }
+
+    def _produce_details_batch(self, produce_ids: List[int], block_identifier='latest') -> List:
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        return [
+            ('eth_call', [{
+                'to': self.contract.address,
+                'data': encode_get_produce_details(produce_id),
+            }, block_identifier])
+            for produce_id in produce_ids
+        ]
+
+    def _decode_produce_details_batch(self, produce_ids: List[int], responses: List) -> Dict[int, Optional[Dict]]:
+        details: Dict[int, Optional[Dict]] = {}
+        for index, produce_id in enumerate(produce_ids):
+            response = responses[index] if index < len(responses) else {}
+            if 'error' in response or not response.get('result'):
+                print(f"Error getting produce details for ID {produce_id}: {response.get('error', 'no result')}")
+                details[produce_id] = None
+                continue
+            try:
+                details[produce_id] = decode_produce_details(response['result']).as_dict()
+            except Exception as e:
+                print(f"Error decoding produce details for ID {produce_id}: {e}")
+                details[produce_id] = None
+        return details
+
+    @staticmethod
+    def _format_produce_details(result) -> Dict:
+        """Turn a getProduceDetails return tuple into a dict"""
+        return {
+            'id': result[0],
+            'farmer': result[1],
+            'name': result[2],
+            'quantity': result[3],
+            'price_per_unit': result[4],
+            'total_price': result[5],
+            'is_sold': result[6],
+            'buyer': result[7],
+            'listed_timestamp': result[8],
+            'sold_timestamp': result[9]
+        }
+
+
+class Web3Service(ProduceDetailsBatchMixin):
     """Service for interacting with the AgriChain smart contract"""
     
     def __init__(self):
+        # web3 and eth_account are imported here rather than at module level
+        # so that importing this module (and everything that imports it,
+        # e.g. produce.views) stays cheap until the service is actually used.
+        from web3 import Web3
+        try:
+            from web3.middleware import geth_poa_middleware
+        except ImportError:
+            # For newer versions of web3.py
+            from web3.middleware import ExtraDataToPOAMiddleware as geth_poa_middleware
+        from eth_account import Account
+
         # Get network configuration
         self.network = settings.BLOCKCHAIN_CONFIG['NETWORK']
         self.rpc_url = settings.BLOCKCHAIN_CONFIG['RPC_URL']
         self.chain_id = settings.BLOCKCHAIN_CONFIG['CHAIN_ID']
+        self.batch_size = settings.BLOCKCHAIN_CONFIG.get('RPC_BATCH_SIZE', 50)
+        self.rpc_urls = list(dict.fromkeys(
+            [self.rpc_url] + list(settings.BLOCKCHAIN_CONFIG.get('RPC_URLS', []))
+        ))
 
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        if len(self.rpc_urls) > 1:
+            # Reads go to the fastest healthy endpoint, writes stay on RPC_URL
+            from .rpc_pool import PooledHTTPProvider
+            self.w3 = Web3(PooledHTTPProvider(self.rpc_urls))
+        else:
+            self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
 
         # Add middleware for POA networks (like Anvil and some testnets)
         try:
@@ -40,6 +298,21 @@ class Web3Service:
         self.contract_address = settings.BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS']
         self.private_key = settings.BLOCKCHAIN_CONFIG['PRIVATE_KEY']
         self.account = Account.from_key(self.private_key)
+        self.nonce_manager = NonceManager(
+            self.w3,
+            self.account.address,
+            use_database=settings.BLOCKCHAIN_CONFIG.get('NONCE_STORE', 'memory') == 'database',
+        )
+        self.fee_oracle = FeeOracle(
+            self.w3,
+            ttl=settings.BLOCKCHAIN_CONFIG.get('FEE_CACHE_TTL', 12.0),
+            safety_margin=settings.BLOCKCHAIN_CONFIG.get('GAS_SAFETY_MARGIN', 1.2),
+            min_priority_fee=settings.BLOCKCHAIN_CONFIG.get('MIN_PRIORITY_FEE_WEI', 10**9),
+        )
+        self.read_cache = BlockAwareReadCache(
+            self.w3,
+            head_ttl=settings.BLOCKCHAIN_CONFIG.get('READ_CACHE_HEAD_TTL', 1.0),
+        )
 
         print(f"🌐 Blockchain Service initialized for {self.network} network")
         print(f"🔗 RPC URL: {self.rpc_url}")
@@ -52,7 +325,25 @@ class Web3Service:
             address=self.contract_address,
             abi=self.contract_abi
         )
+
+        # Per-method/function RPC metrics (innermost, so latency is the node round trip)
+        from .rpc_middleware import RPCMetricsMiddleware
+        build_metrics = RPCMetricsMiddleware.build(RPCMetricsMiddleware.selectors_for(self.contract))
+        # layer=0 is the innermost layer; add() would make it the outermost
+        self.w3.middleware_onion.inject(build_metrics, name='rpc_metrics', layer=0)
+        self.rpc_metrics = build_metrics(self.w3)
     
+    def make_batch_request(self, batch: List) -> List:
+        """
+        Send raw JSON-RPC calls as one batch, recorded in the RPC metrics
+
+        Unlike ``w3.batch_requests()`` this returns the raw responses, so one
+        failed call doesn't fail the whole batch. Only the metrics middleware
+        is applied: the validation middleware would add an eth_chainId
+        round trip per eth_call.
+        """
+        return self.rpc_metrics.wrap_make_batch_request(self.w3.provider.make_batch_request)(batch)
+
     def _load_contract_abi(self) -> List[Dict]:
         """Load the contract ABI from the compiled contract"""
         import os
@@ -81,74 +372,407 @@ class Web3Service:
         except Exception:
             return False
     
-    def get_total_produces(self) -> int:
-        """Get total number of produces from the contract"""
-        try:
-            return self.contract.functions.getTotalProduces().call()
-        except Exception as e:
-            print(f"Error getting total produces: {e}")
-            return 0
+    def get_total_produces(self, block: Optional[int] = None) -> int:
+        """
+        Get total number of produces from the contract (at ``block``, default the head)
+
+        Raises if the call fails: a count of 0 would let a full sync finish
+        "successfully" without looking at a single produce.
+        """
+        if block is not None:
+            return self.contract.functions.getTotalProduces().call(block_identifier=block)
+        return self.read_cache.call(self.contract, 'getTotalProduces')
     
     def get_available_produces(self) -> List[int]:
-        """Get list of available produce IDs"""
+        """Get list of available produce IDs (all of them, in ascending order)"""
         try:
-            return self.contract.functions.getAvailableProduces().call()
+            return self.read_cache.get_or_load(
+                (self.contract.address, 'getAvailableProducesPage', ()), self._walk_available_pages,
+            )
         except Exception as e:
             print(f"Error getting available produces: {e}")
             return []
     
+    def _walk_available_pages(self, block) -> List[int]:
+        """Read the contract's available-ID set page by page, every page at the same block"""
+        functions = self.contract.functions
+        count = functions.getAvailableProduceCount().call(block_identifier=block)
+        produce_ids: List[int] = []
+        for offset in range(0, count, AVAILABLE_PAGE_SIZE):
+            produce_ids.extend(
+                functions.getAvailableProducesPage(offset, AVAILABLE_PAGE_SIZE).call(block_identifier=block)
+            )
+        return sorted(produce_ids)
+
     def get_produce_details(self, produce_id: int) -> Optional[Dict]:
         """Get details of a specific produce"""
         try:
-            result = self.contract.functions.getProduceDetails(produce_id).call()
-            return {
-                'id': result[0],
-                'farmer': result[1],
-                'name': result[2],
-                'quantity': result[3],
-                'price_per_unit': result[4],
-                'total_price': result[5],
-                'is_sold': result[6],
-                'buyer': result[7],
-                'listed_timestamp': result[8],
-                'sold_timestamp': result[9]
-            }
+            return self.read_cache.get_or_load(
+                (self.contract.address, 'getProduceDetails', (produce_id,)),
+                lambda block: self._format_produce_details(
+                    self.contract.functions.getProduceDetails(produce_id).call(block_identifier=block)
+                ),
+            )
         except Exception as e:
             print(f"Error getting produce details for ID {produce_id}: {e}")
             return None
-    
+
+    def get_produce_details_many(self, produce_ids: Iterable[int], chunk_size: Optional[int] = None,
+                                 block: Optional[int] = None) -> Dict[int, Optional[Dict]]:
+        """
+        Get details of many produces in as few round trips as possible
+
+        IDs go ``chunk_size`` (at most DETAILS_BATCH_SIZE) at a time into
+        getProduceDetailsBatch calls, which are themselves packed into JSON-RPC
+        batches. Chunks whose call fails (e.g. a contract deployed before
+        getProduceDetailsBatch existed) are fetched one getProduceDetails call
+        per ID instead. Returns a dict mapping each requested ID to the same
+        dict ``get_produce_details`` returns, or None if that item is invalid
+        or failed. Reads happen at ``block`` (default the head); IDs already in
+        the read cache for that block are not re-fetched, and the ones fetched
+        here warm it.
+        """
+        chunk_size = min(chunk_size or DETAILS_BATCH_SIZE, DETAILS_BATCH_SIZE)
+        if block is None:
+            block = self.read_cache.head_block()
+        block_identifier = 'latest' if block is None else block
+
+        details: Dict[int, Optional[Dict]] = {}
+        missing_ids = []
+        for produce_id in dict.fromkeys(produce_ids):
+            found, value = (False, None) if block is None else self.read_cache.get(
+                (self.contract.address, 'getProduceDetails', (produce_id,)), block,
+            )
+            if found:
+                details[produce_id] = value
+            else:
+                missing_ids.append(produce_id)
+
+        fetched: Dict[int, Optional[Dict]] = {}
+        fallback_ids = missing_ids
+        if self.details_batch_supported and missing_ids:
+            fallback_ids = []
+            chunks = [missing_ids[start:start + chunk_size] for start in range(0, len(missing_ids), chunk_size)]
+            for start in range(0, len(chunks), self.batch_size):
+                group = chunks[start:start + self.batch_size]
+                try:
+                    responses = self.make_batch_request(self._produce_details_batch_calls(group, block_identifier))
+                except Exception as e:
+                    print(f"Error sending {len(group)} produce detail batch calls: {e}")
+                    responses = None
+                for index, chunk in enumerate(group):
+                    response = responses[index] if isinstance(responses, list) and index < len(responses) else None
+                    chunk_details = self._decode_produce_details_batch_call(chunk, response)
+                    if chunk_details is None:
+                        fallback_ids.extend(chunk)
+                    else:
+                        fetched.update(chunk_details)
+
+        fetched.update(self._get_produce_details_per_id(fallback_ids, block_identifier))
+        details.update(fetched)
+        if block is not None:
+            for produce_id, value in fetched.items():
+                if value is not None:
+                    self.read_cache.set((self.contract.address, 'getProduceDetails', (produce_id,)), block, dict(value))
+        return details
+
+    def _get_produce_details_per_id(self, produce_ids: List[int], block_identifier) -> Dict[int, Optional[Dict]]:
+        """One getProduceDetails call per ID, packed ``batch_size`` at a time into JSON-RPC batches"""
+        details: Dict[int, Optional[Dict]] = {}
+        for start in range(0, len(produce_ids), self.batch_size):
+            chunk = produce_ids[start:start + self.batch_size]
+            try:
+                responses = self.make_batch_request(self._produce_details_batch(chunk, block_identifier))
+            except Exception as e:
+                print(f"Error sending batch of {len(chunk)} produce detail calls: {e}")
+                responses = None
+
+            if not isinstance(responses, list):
+                # The node rejected the batch as a whole (or does not support
+                # batching), fall back to one call per ID for this chunk
+                for produce_id in chunk:
+                    details[produce_id] = self.get_produce_details(produce_id)
+                continue
+            details.update(self._decode_produce_details_batch(chunk, responses))
+        return details
+
+    def get_sold_ids(self, start_id: int, count: int, block_identifier='latest') -> Set[int]:
+        """
+        IDs in [start_id, start_id + count) that the contract reports sold
+
+        Reads getSoldBitmap SOLD_BITMAP_SIZE IDs at a time, with the calls
+        packed into JSON-RPC batches. Raises if any call fails, since a
+        missing range would read as "unsold".
+        """
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        ranges = [
+            (range_start, min(SOLD_BITMAP_SIZE, start_id + count - range_start))
+            for range_start in range(start_id, start_id + count, SOLD_BITMAP_SIZE)
+        ]
+
+        sold: Set[int] = set()
+        for start in range(0, len(ranges), self.batch_size):
+            group = ranges[start:start + self.batch_size]
+            responses = self.make_batch_request([
+                ('eth_call', [{
+                    'to': self.contract.address,
+                    'data': self.contract.encode_abi('getSoldBitmap', args=[range_start, range_count]),
+                }, block_identifier])
+                for range_start, range_count in group
+            ])
+            for (range_start, range_count), response in zip(group, responses):
+                if 'error' in response or not response.get('result'):
+                    raise RuntimeError(f"getSoldBitmap({range_start}, {range_count}) failed: {response.get('error')}")
+                (words,) = self.w3.codec.decode(['uint256[]'], bytes.fromhex(response['result'][2:]))
+                sold.update(self._sold_ids_from_bitmap(range_start, words))
+        return sold
+
+    @staticmethod
+    def _sold_ids_from_bitmap(start_id: int, words) -> List[int]:
+        ids = []
+        for index, word in enumerate(words):
+            while word:
+                lowest = word & -word
+                ids.append(start_id + index * 256 + lowest.bit_length() - 1)
+                word ^= lowest
+        return ids
+
+    def reconcile_sold_status(self, apply: bool = True) -> Dict:
+        """
+        Diff the contract's sold flags against Produce.is_sold
+
+        Covers every stored produce with ceil(max ID / SOLD_BITMAP_SIZE)
+        getSoldBitmap calls instead of one RPC per produce. With ``apply``,
+        rows the chain reports sold get is_sold, buyer and sale time (from
+        getProduceDetailsBatch), and rows marked sold that the chain reports
+        unsold (e.g. after a reorg) are reset.
+        """
+        from produce.cache import bump_version
+        from produce.models import Produce
+
+        block = self.read_cache.head_block()
+        stored = dict(Produce.objects.values_list('blockchain_id', 'is_sold'))
+        if not stored:
+            return {'block': block, 'checked': 0, 'newly_sold': [], 'unsold': []}
+
+        chain_sold = self.get_sold_ids(1, max(stored), 'latest' if block is None else block)
+        newly_sold = sorted(produce_id for produce_id, is_sold in stored.items() if not is_sold and produce_id in chain_sold)
+        unsold = sorted(produce_id for produce_id, is_sold in stored.items() if is_sold and produce_id not in chain_sold)
+
+        if apply and (newly_sold or unsold):
+            details = self.get_produce_details_many(newly_sold)
+            now = timezone.now()
+            with transaction.atomic():
+                produces = list(Produce.objects.filter(blockchain_id__in=newly_sold + unsold))
+                for produce in produces:
+                    data = details.get(produce.blockchain_id)
+                    if produce.blockchain_id in chain_sold:
+                        if not data:
+                            continue
+                        produce.is_sold = True
+                        produce.buyer_address = data['buyer']
+                        produce.sold_timestamp = datetime.fromtimestamp(data['sold_timestamp'], tz=dt_timezone.utc)
+                    else:
+                        produce.is_sold = False
+                        produce.buyer_address = None
+                        produce.sold_timestamp = None
+                    produce.updated_at = now
+                Produce.objects.bulk_update(produces, ['is_sold', 'buyer_address', 'sold_timestamp', 'updated_at'])
+                bump_version()
+
+        return {'block': block, 'checked': len(stored), 'newly_sold': newly_sold, 'unsold': unsold}
+
     def list_produce(self, produce_name: str, quantity: int, price_per_unit: int) -> Optional[str]:
         """List a new produce on the blockchain"""
         try:
-            # Build transaction
-            transaction = self.contract.functions.listProduce(
-                produce_name, quantity, price_per_unit
-            ).build_transaction({
+            return self.submit_list_produce(produce_name, quantity, price_per_unit).transaction_hash
+        except Exception as e:
+            print(f"Error listing produce: {e}")
+            return None
+
+    def submit_list_produce(self, produce_name: str, quantity: int, price_per_unit: int) -> BlockchainTransaction:
+        """Sign and send a listProduce transaction and record it; raises on failure"""
+        contract_function, gas_bucket = self._list_produce_call(produce_name, quantity, price_per_unit)
+        tx_hash = self._send_with_managed_nonce(
+            contract_function, self._tx_params('listProduce', gas_bucket, contract_function),
+        )
+
+        # Record transaction
+        return BlockchainTransaction.objects.create(
+            transaction_hash=self.w3.to_hex(tx_hash),
+            transaction_type='list_produce',
+            from_address=self.account.address,
+            to_address=self.contract_address,
+            value=0,
+            gas_bucket=gas_bucket,
+        )
+
+    def list_produce_many(self, items: List[Dict]) -> List[Optional[str]]:
+        """
+        List many produces with listProduceBatch, MAX_LIST_BATCH_SIZE lots per transaction
+
+        ``items`` are dicts with name, quantity and price_per_unit (wei).
+        Returns one transaction hash per batch (None for a batch that failed).
+        """
+        tx_hashes = []
+        for start in range(0, len(items), MAX_LIST_BATCH_SIZE):
+            chunk = items[start:start + MAX_LIST_BATCH_SIZE]
+            try:
+                tx_hashes.append(self.submit_list_produce_batch(chunk).transaction_hash)
+            except Exception as e:
+                print(f"Error listing batch of {len(chunk)} produces: {e}")
+                tx_hashes.append(None)
+        return tx_hashes
+
+    def submit_list_produce_batch(self, items: List[Dict]) -> BlockchainTransaction:
+        """Sign and send one listProduceBatch transaction and record it; raises on failure"""
+        contract_function, gas_bucket = self._list_produce_batch_call(items)
+        tx_hash = self._send_with_managed_nonce(
+            contract_function, self._tx_params('listProduceBatch', gas_bucket, contract_function),
+        )
+
+        # Record transaction
+        return BlockchainTransaction.objects.create(
+            transaction_hash=self.w3.to_hex(tx_hash),
+            transaction_type='list_produce_batch',
+            from_address=self.account.address,
+            to_address=self.contract_address,
+            value=0,
+            gas_bucket=gas_bucket,
+        )
+
+    def _list_produce_call(self, produce_name: str, quantity: int, price_per_unit: int):
+        contract_function = self.contract.functions.listProduce(produce_name, quantity, price_per_unit)
+        return contract_function, name_length_bucket(produce_name)
+
+    def _list_produce_batch_call(self, items: List[Dict]):
+        if not 0 < len(items) <= MAX_LIST_BATCH_SIZE:
+            raise ValueError(f"Invalid batch size {len(items)} (1-{MAX_LIST_BATCH_SIZE} lots per transaction)")
+        names = [item['name'] for item in items]
+        contract_function = self.contract.functions.listProduceBatch(
+            names,
+            [int(item['quantity']) for item in items],
+            [int(item['price_per_unit']) for item in items],
+        )
+        return contract_function, batch_bucket(names)
+
+    def _tx_params(self, gas_key: str, gas_bucket, contract_function) -> Dict:
+        return {
+            'gas': self.fee_oracle.gas_limit(gas_key, gas_bucket, contract_function, {'from': self.account.address}),
+            **self.fee_oracle.get_fee_params(),
+        }
+
+    def sign_list_produce(self, produce_name: str, quantity: int, price_per_unit: int,
+                          nonce: Optional[int] = None) -> Dict:
+        """Build and sign a listProduce transaction without sending it (see _sign)"""
+        contract_function, gas_bucket = self._list_produce_call(produce_name, quantity, price_per_unit)
+        return self._sign(contract_function, 'listProduce', gas_bucket, nonce)
+
+    def sign_list_produce_batch(self, items: List[Dict], nonce: Optional[int] = None) -> Dict:
+        """Build and sign a listProduceBatch transaction without sending it (see _sign)"""
+        contract_function, gas_bucket = self._list_produce_batch_call(items)
+        return self._sign(contract_function, 'listProduceBatch', gas_bucket, nonce)
+
+    def _sign(self, contract_function, gas_key: str, gas_bucket, nonce: Optional[int] = None) -> Dict:
+        """
+        Sign a server-account transaction
+
+        Returns the raw transaction and its hash (hex), the nonce and the gas
+        bucket. Without ``nonce`` one is allocated, and released again if
+        building or signing fails; with it, the transaction takes the place
+        of an earlier signing that the node rejected.
+        """
+        allocated = nonce is None
+        if allocated:
+            nonce = self.nonce_manager.allocate()
+        try:
+            transaction = contract_function.build_transaction({
                 'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                'gas': 500000,
-                'gasPrice': self.w3.eth.gas_price,
+                'chainId': self.chain_id,
+                'nonce': nonce,
+                **self._tx_params(gas_key, gas_bucket, contract_function),
             })
-            
-            # Sign and send transaction
             signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
-            
-            # Record transaction
-            BlockchainTransaction.objects.create(
-                transaction_hash=tx_hash.hex(),
-                transaction_type='list_produce',
-                from_address=self.account.address,
-                to_address=self.contract_address,
-                value=0
-            )
-            
-            return tx_hash.hex()
-            
+        except Exception:
+            if allocated:
+                self.nonce_manager.release(nonce)
+            raise
+        return {
+            'raw_transaction': self.w3.to_hex(signed_txn.raw_transaction),
+            'transaction_hash': self.w3.to_hex(signed_txn.hash),
+            'nonce': nonce,
+            'gas_bucket': gas_bucket,
+        }
+
+    def broadcast(self, raw_transaction: str):
+        """Send signed transaction bytes; bytes the node already has count as sent"""
+        try:
+            self.w3.eth.send_raw_transaction(raw_transaction)
         except Exception as e:
-            print(f"Error listing produce: {e}")
-            return None
-    
+            if 'already known' in str(e).lower() or 'known transaction' in str(e).lower():
+                return
+            if 'underpriced' in str(e).lower() or 'base fee' in str(e).lower():
+                # Cached fees went stale faster than the TTL
+                self.fee_oracle.invalidate()
+            raise
+
+    def transaction_known(self, tx_hash: str) -> bool:
+        """True if the node has the transaction, pending or mined"""
+        from web3.exceptions import TransactionNotFound
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return False
+        return True
+
+    def record_transaction(self, tx_hash: str, transaction_type: str, gas_bucket=None) -> BlockchainTransaction:
+        """The BlockchainTransaction row ReceiptWorker confirms, created once per hash"""
+        return BlockchainTransaction.objects.get_or_create(
+            transaction_hash=tx_hash,
+            defaults={
+                'transaction_type': transaction_type,
+                'from_address': self.account.address,
+                'to_address': self.contract_address,
+                'value': 0,
+                'gas_bucket': gas_bucket,
+            },
+        )[0]
+
+    def _send_with_managed_nonce(self, contract_function, tx_params: Dict):
+        """
+        Sign and send a transaction from the server account using a locally allocated nonce
+
+        The nonce goes back to the pool if the node rejects the transaction;
+        on "nonce too low" the manager resyncs from the chain and the send is
+        retried once with a fresh nonce. A nonce error for bytes the node
+        already has ("already known") means they were sent, so their hash is
+        returned instead: a resend under a new nonce would list twice.
+        """
+        for attempt in range(2):
+            nonce = self.nonce_manager.allocate()
+            signed_txn = None
+            try:
+                transaction = contract_function.build_transaction({
+                    'from': self.account.address,
+                    'chainId': self.chain_id,
+                    'nonce': nonce,
+                    **tx_params,
+                })
+                signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
+                return self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                if is_nonce_error(e) and signed_txn is not None and self.transaction_known(signed_txn.hash):
+                    return signed_txn.hash
+                if 'underpriced' in str(e).lower() or 'base fee' in str(e).lower():
+                    # Cached fees went stale faster than the TTL
+                    self.fee_oracle.invalidate()
+                if is_nonce_error(e) and attempt == 0:
+                    self.nonce_manager.resync()
+                    continue
+                self.nonce_manager.release(nonce)
+                raise
+
     def buy_produce(self, produce_id: int, buyer_address: str, buyer_private_key: str) -> Optional[str]:
         """Buy a produce from the blockchain"""
         try:
@@ -158,15 +782,19 @@ class Web3Service:
                 return None
             
             total_price = produce_details['total_price']
-            buyer_account = Account.from_key(buyer_private_key)
             
             # Build transaction
-            transaction = self.contract.functions.buyProduce(produce_id).build_transaction({
+            contract_function = self.contract.functions.buyProduce(produce_id)
+            transaction = contract_function.build_transaction({
                 'from': buyer_address,
+                'chainId': self.chain_id,
                 'nonce': self.w3.eth.get_transaction_count(buyer_address),
-                'gas': 500000,
-                'gasPrice': self.w3.eth.gas_price,
+                'gas': self.fee_oracle.gas_limit(
+                    'buyProduce', None, contract_function,
+                    {'from': buyer_address, 'value': total_price},
+                ),
                 'value': total_price,
+                **self.fee_oracle.get_fee_params(),
             })
             
             # Sign and send transaction
@@ -175,7 +803,7 @@ class Web3Service:
             
             # Record transaction
             BlockchainTransaction.objects.create(
-                transaction_hash=tx_hash.hex(),
+                transaction_hash=self.w3.to_hex(tx_hash),
                 transaction_type='buy_produce',
                 from_address=buyer_address,
                 to_address=self.contract_address,
@@ -183,12 +811,45 @@ class Web3Service:
                 produce_id=produce_id
             )
             
-            return tx_hash.hex()
+            return self.w3.to_hex(tx_hash)
             
         except Exception as e:
             print(f"Error buying produce: {e}")
             return None
 
 
-# Global instance
-web3_service = Web3Service()
+_web3_service: Optional[Web3Service] = None
+_web3_service_lock = threading.Lock()
+
+
+def get_web3_service() -> Web3Service:
+    """Return the shared Web3Service, creating it on first use"""
+    global _web3_service
+    if _web3_service is None:
+        with _web3_service_lock:
+            # Re-check under the lock so concurrent first callers build it once
+            if _web3_service is None:
+                _web3_service = Web3Service()
+    return _web3_service
+
+
+def reset_web3_service() -> None:
+    """Drop the shared Web3Service so the next use rebuilds it (tests, settings changes)"""
+    global _web3_service
+    with _web3_service_lock:
+        _web3_service = None
+
+
+class _LazyWeb3Service:
+    """Module-level stand-in that defers Web3Service construction to first attribute access"""
+
+    def __getattr__(self, name):
+        return getattr(get_web3_service(), name)
+
+    def __repr__(self):
+        state = 'initialized' if _web3_service is not None else 'not initialized'
+        return f"<lazy Web3Service ({state})>"
+
+
+# Global instance (constructed lazily on first use)
+web3_service = _LazyWeb3Service()
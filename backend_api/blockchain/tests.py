@@ -1,3 +1,1257 @@
-from django.test import TestCase
+import io
+import json
+import subprocess
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+from pathlib import Path
 
-# Create your tests here.
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from hexbytes import HexBytes
+
+from produce.models import Produce, ProduceImage
+
+from . import codec, services
+from .fees import FeeOracle, name_length_bucket
+from .indexer import EventIndexer, produce_from_details
+from .metrics import rpc_metrics
+from .models import (
+    AccountNonce, BlockchainTransaction, BlockCheckpoint, ContractEvent, IndexerState, OutboxTransaction,
+)
+from .nonces import NonceManager, is_nonce_error
+from .outbox import OutboxDispatcher
+from .receipts import ReceiptWorker
+from .rpc_pool import PooledHTTPProvider
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+TEST_BLOCKCHAIN_CONFIG = {
+    'RPC_URL': 'http://127.0.0.1:8545',
+    'CHAIN_ID': 31337,
+    'CONTRACT_ADDRESS': '0x5FbDB2315678afecb367f032d93F642f64180aa3',
+    'PRIVATE_KEY': '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80',
+    'NETWORK': 'anvil',
+    'RPC_BATCH_SIZE': 2,
+}
+
+FARMER = '0x70997970C51812dc3A010C7d01b50e0d17dc79C8'
+BUYER = '0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+def make_test_service():
+    """Build a Web3Service against the test config without chatter on stdout"""
+    with override_settings(BLOCKCHAIN_CONFIG=TEST_BLOCKCHAIN_CONFIG), redirect_stdout(io.StringIO()):
+        return services.Web3Service()
+
+
+def produce_tuple(produce_id, name='Tomatoes', is_sold=False):
+    if is_sold:
+        return (produce_id, FARMER, name, 10, 1000, 10000, True, BUYER, 1700000000, 1700000600)
+    return (produce_id, FARMER, name, 10, 1000, 10000, False, ZERO_ADDRESS, 1700000000, 0)
+
+
+class FakeBatchProvider:
+    """Answers getProduceDetails(Batch) batches from an in-memory table of produce tuples"""
+
+    def __init__(self, service, produces, supports_details_batch=True):
+        self.service = service
+        self.produces = produces
+        self.supports_details_batch = supports_details_batch
+        self.batches = []
+
+    def make_batch_request(self, batch):
+        self.batches.append(batch)
+        return [self._answer(request_id, params[0]['data']) for request_id, (method, params) in enumerate(batch)]
+
+    def _answer(self, request_id, data):
+        from eth_utils.abi import get_abi_output_types
+
+        if data.startswith(self.service.contract.encode_abi('getSoldBitmap', args=[0, 0])[:10]):
+            start_id, count = self.service.w3.codec.decode(['uint256', 'uint256'], bytes.fromhex(data[10:]))
+            words = [0] * ((count + 255) // 256)
+            for produce_id, produce in self.produces.items():
+                if produce[6] and start_id <= produce_id < start_id + count:
+                    words[(produce_id - start_id) // 256] |= 1 << (produce_id - start_id) % 256
+            encoded = self.service.w3.codec.encode(['uint256[]'], [words])
+            return {'jsonrpc': '2.0', 'id': request_id, 'result': '0x' + encoded.hex()}
+
+        function_name = 'getProduceDetails'
+        if data.startswith(codec.GET_PRODUCE_DETAILS_BATCH_SELECTOR):
+            if not self.supports_details_batch:
+                return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32000, 'message': 'execution reverted'}}
+            function_name = 'getProduceDetailsBatch'
+        output_types = get_abi_output_types(self.service.contract.get_function_by_name(function_name).abi)
+
+        if function_name == 'getProduceDetailsBatch':
+            (produce_ids,) = self.service.w3.codec.decode(['uint256[]'], bytes.fromhex(data[10:]))
+            empty = (0, ZERO_ADDRESS, '', 0, 0, 0, False, ZERO_ADDRESS, 0, 0)
+            value = [self.produces.get(produce_id, empty) for produce_id in produce_ids]
+        else:
+            produce_id = int(data[10:], 16)
+            if produce_id not in self.produces:
+                return {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': 3, 'message': 'execution reverted: Invalid produce ID'}}
+            value = self.produces[produce_id]
+        encoded = self.service.w3.codec.encode(output_types, [value])
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': '0x' + encoded.hex()}
+
+
+def make_event_log(service, event_name, block_number, log_index, **args):
+    """Encode a raw eth_getLogs entry for one of the contract's events"""
+    event = getattr(service.contract.events, event_name)()
+    indexed = [item for item in event.abi['inputs'] if item['indexed']]
+    unindexed = [item for item in event.abi['inputs'] if not item['indexed']]
+    topics = [HexBytes(event.topic)] + [
+        HexBytes(service.w3.codec.encode([item['type']], [args[item['name']]]))
+        for item in indexed
+    ]
+    data = service.w3.codec.encode(
+        [item['type'] for item in unindexed], [args[item['name']] for item in unindexed]
+    )
+    return {
+        'address': service.contract.address,
+        'topics': topics,
+        'data': HexBytes(data),
+        'blockNumber': block_number,
+        'blockHash': HexBytes(block_number.to_bytes(32, 'big')),
+        'logIndex': log_index,
+        'transactionHash': HexBytes((block_number * 1000 + log_index).to_bytes(32, 'big')),
+        'transactionIndex': 0,
+        'removed': False,
+    }
+
+
+def listed_log(service, block_number, log_index, produce_id, name='Tomatoes', timestamp=1700000000):
+    return make_event_log(
+        service, 'ProduceListed', block_number, log_index,
+        produce_id=produce_id, farmer=FARMER, name=name, quantity=10,
+        price_per_unit=1000, total_price=10000, timestamp=timestamp,
+    )
+
+
+def sold_log(service, block_number, log_index, produce_id, name='Tomatoes', timestamp=1700000100):
+    return make_event_log(
+        service, 'ProduceSold', block_number, log_index,
+        produce_id=produce_id, farmer=FARMER, buyer=BUYER, name=name,
+        quantity=10, total_price=10000, timestamp=timestamp,
+    )
+
+
+# Wall-clock budget for importing the WSGI entry point plus the URLConf
+# (which pulls in every view module). Measured at ~0.5s on a laptop; the
+# budget leaves headroom for slow CI machines while still catching a
+# regression back to connecting to the chain at import time.
+STARTUP_IMPORT_BUDGET_SECONDS = 3.0
+
+_STARTUP_PROBE = """
+import io, json, sys, time
+from contextlib import redirect_stdout
+buffer = io.StringIO()
+start = time.perf_counter()
+with redirect_stdout(buffer):
+    import agrichain_api.wsgi
+    import agrichain_api.urls
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'elapsed': elapsed,
+    'stdout': buffer.getvalue(),
+    'web3_loaded': 'web3' in sys.modules,
+    'eth_account_loaded': 'eth_account' in sys.modules,
+}))
+"""
+
+
+class StartupImportBudgetTests(SimpleTestCase):
+    """Importing the app must not pay the blockchain setup cost"""
+
+    def _run_probe(self):
+        result = subprocess.run(
+            [sys.executable, '-c', _STARTUP_PROBE],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_wsgi_import_does_not_load_web3(self):
+        probe = self._run_probe()
+        self.assertFalse(probe['web3_loaded'])
+        self.assertFalse(probe['eth_account_loaded'])
+        self.assertEqual(probe['stdout'], '')
+
+    def test_wsgi_import_within_budget(self):
+        probe = self._run_probe()
+        self.assertLess(probe['elapsed'], STARTUP_IMPORT_BUDGET_SECONDS)
+
+
+class LazyWeb3ServiceTests(SimpleTestCase):
+
+    def tearDown(self):
+        services.reset_web3_service()
+
+    def test_service_is_not_built_at_import(self):
+        services.reset_web3_service()
+        self.assertIsNone(services._web3_service)
+        self.assertIn('not initialized', repr(services.web3_service))
+
+
+class ProduceDetailsBatchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        self.provider = FakeBatchProvider(self.service, {
+            1: produce_tuple(1, 'Tomatoes'),
+            2: produce_tuple(2, 'Maize', is_sold=True),
+            3: produce_tuple(3, 'Beans'),
+        })
+        self.service.w3.provider = self.provider
+        self.service.read_cache.head_block = lambda: None
+
+    def test_decodes_into_get_produce_details_shape(self):
+        with redirect_stdout(io.StringIO()):
+            details = self.service.get_produce_details_many([1, 2, 3])
+
+        # All three IDs go in one getProduceDetailsBatch call
+        (batch,) = self.provider.batches
+        self.assertEqual(len(batch), 1)
+        self.assertTrue(batch[0][1][0]['data'].startswith(codec.GET_PRODUCE_DETAILS_BATCH_SELECTOR))
+        self.assertEqual(details[1], services.Web3Service._format_produce_details(produce_tuple(1, 'Tomatoes')))
+        self.assertTrue(details[2]['is_sold'])
+        self.assertEqual(details[3]['name'], 'Beans')
+        self.assertEqual(details[1]['farmer'], FARMER)
+
+    def test_failed_item_does_not_fail_the_batch(self):
+        with redirect_stdout(io.StringIO()):
+            details = self.service.get_produce_details_many([1, 99, 3], chunk_size=10)
+
+        self.assertEqual(len(self.provider.batches), 1)
+        self.assertIsNone(details[99])
+        self.assertEqual(details[1]['name'], 'Tomatoes')
+        self.assertEqual(details[3]['name'], 'Beans')
+
+    def test_chunks_are_packed_into_one_json_rpc_batch(self):
+        with redirect_stdout(io.StringIO()):
+            details = self.service.get_produce_details_many([1, 2, 3], chunk_size=1)
+
+        # Three single-ID calls, two per JSON-RPC batch (RPC_BATCH_SIZE=2)
+        self.assertEqual([len(batch) for batch in self.provider.batches], [2, 1])
+        self.assertEqual(details[2]['name'], 'Maize')
+
+    def test_falls_back_to_one_call_per_id_on_an_old_contract(self):
+        self.provider.supports_details_batch = False
+        with redirect_stdout(io.StringIO()):
+            details = self.service.get_produce_details_many([1, 2, 3])
+            self.assertEqual(len(self.provider.batches), 3)  # failed batch call, then 2 + 1 per-ID calls
+            self.assertFalse(self.service.details_batch_supported)
+
+            self.service.get_produce_details_many([1])
+        self.assertEqual(len(self.provider.batches), 4)  # no second attempt at the batch call
+        self.assertEqual(details[3]['name'], 'Beans')
+        self.assertEqual(details[1]['farmer'], FARMER)
+
+
+class FakeHead:
+    """Stands in for ``w3`` in BlockAwareReadCache: a head block that tests move by hand"""
+
+    def __init__(self, block_number=100):
+        self.block_number = block_number
+        self.polls = 0
+        self.eth = self
+
+    def __getattribute__(self, name):
+        if name == 'block_number':
+            object.__setattr__(self, 'polls', object.__getattribute__(self, 'polls') + 1)
+        return object.__getattribute__(self, name)
+
+
+class CodecTests(SimpleTestCase):
+    """The hand-written codec must agree with web3's ABI machinery"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.service = make_test_service()
+
+    def test_constants_match_abi(self):
+        from eth_utils import function_abi_to_4byte_selector
+
+        function = self.service.contract.get_function_by_name('getProduceDetails')
+        self.assertEqual(
+            codec.encode_get_produce_details(42),
+            self.service.contract.encode_abi('getProduceDetails', args=[42]),
+        )
+        self.assertEqual(codec.GET_PRODUCE_DETAILS_SELECTOR, '0x' + function_abi_to_4byte_selector(function.abi).hex())
+        self.assertEqual(codec.PRODUCE_LISTED_TOPIC, self.service.w3.to_hex(HexBytes(self.service.contract.events.ProduceListed().topic)))
+        self.assertEqual(codec.PRODUCE_SOLD_TOPIC, self.service.w3.to_hex(HexBytes(self.service.contract.events.ProduceSold().topic)))
+
+    def test_produce_details_match_generic_decoder(self):
+        from eth_utils.abi import get_abi_output_types
+
+        output_types = get_abi_output_types(self.service.contract.get_function_by_name('getProduceDetails').abi)
+        for produce in (produce_tuple(7, 'Sukuma wiki 🥬'), (2**200, BUYER, '', 0, 1, 2, True, FARMER, 3, 4)):
+            encoded = self.service.w3.codec.encode(output_types, [produce])
+            record = codec.decode_produce_details('0x' + encoded.hex())
+            self.assertEqual(record.as_dict(), services.Web3Service._format_produce_details(produce))
+            self.assertEqual(record['name'], produce[2])
+
+    def test_produce_details_batch_match_generic_decoder(self):
+        from eth_utils.abi import get_abi_output_types
+
+        self.assertEqual(
+            codec.encode_get_produce_details_batch([1, 2**70, 3]),
+            self.service.contract.encode_abi('getProduceDetailsBatch', args=[[1, 2**70, 3]]),
+        )
+        output_types = get_abi_output_types(self.service.contract.get_function_by_name('getProduceDetailsBatch').abi)
+        empty = (0, ZERO_ADDRESS, '', 0, 0, 0, False, ZERO_ADDRESS, 0, 0)
+        produces = [produce_tuple(7, 'Sukuma wiki 🥬'), empty, produce_tuple(9, 'A' * 100, is_sold=True)]
+        encoded = self.service.w3.codec.encode(output_types, [produces])
+
+        records = codec.decode_produce_details_batch(encoded)
+        self.assertEqual(records[0].as_dict(), services.Web3Service._format_produce_details(produces[0]))
+        self.assertIsNone(records[1])
+        self.assertEqual(records[2].as_dict(), services.Web3Service._format_produce_details(produces[2]))
+        self.assertEqual(codec.decode_produce_details_batch(self.service.w3.codec.encode(output_types, [[]])), [])
+
+    def test_event_logs_match_process_log(self):
+        for log in (listed_log(self.service, 5, 0, 3, name='Avocado'), sold_log(self.service, 6, 1, 3)):
+            decoded = codec.decode_event_log(log)
+            expected = getattr(self.service.contract.events, decoded['event'])().process_log(log)
+            self.assertEqual(decoded['args'], dict(expected['args']))
+            self.assertEqual((decoded['blockNumber'], decoded['logIndex']), (expected['blockNumber'], expected['logIndex']))
+
+    def test_unknown_topic_is_skipped(self):
+        log = listed_log(self.service, 5, 0, 3)
+        log['topics'] = [HexBytes(b'\x00' * 32)] + log['topics'][1:]
+        self.assertIsNone(codec.decode_event_log(log))
+
+
+class BlockAwareReadCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.head = FakeHead()
+        self.cache = services.BlockAwareReadCache(self.head, head_ttl=60)
+
+    def test_concurrent_identical_calls_share_one_rpc(self):
+        loads = []
+        release = threading.Event()
+
+        def loader(block):
+            loads.append(block)
+            release.wait(5)
+            return [1, 2, 3]
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_load(('getAvailableProduces', ()), loader)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.cache.stats()['shared'] < 19:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(loads, [100])
+        self.assertEqual(results, [[1, 2, 3]] * 20)
+        # Callers get their own copy of the cached value
+        results[0].append(4)
+        self.assertEqual(self.cache.get_or_load(('getAvailableProduces', ()), loader), [1, 2, 3])
+
+    def test_new_block_invalidates(self):
+        loader = mock.Mock(side_effect=lambda block: block * 10)
+        key = ('getTotalProduces', ())
+        self.assertEqual(self.cache.get_or_load(key, loader), 1000)
+        self.assertEqual(self.cache.get_or_load(key, loader), 1000)
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(self.head.polls, 1)
+
+        self.head.block_number = 101
+        self.cache._head_checked_at = 0  # head_ttl elapsed
+        self.assertEqual(self.cache.get_or_load(key, loader), 1010)
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_errors_are_not_cached(self):
+        loader = mock.Mock(side_effect=[ConnectionError('node down'), 7])
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_load(('getTotalProduces', ()), loader)
+        self.assertEqual(self.cache.get_or_load(('getTotalProduces', ()), loader), 7)
+
+    def test_batched_details_are_served_from_cache(self):
+        service = make_test_service()
+        service.read_cache = self.cache
+        provider = FakeBatchProvider(service, {1: produce_tuple(1), 2: produce_tuple(2)})
+        service.w3.provider = provider
+
+        service.get_produce_details_many([1, 2])
+        details = service.get_produce_details_many([1, 2])
+        self.assertEqual(len(provider.batches), 1)
+        self.assertEqual(provider.batches[0][0][1][1], hex(100))
+        self.assertEqual(details[2]['id'], 2)
+
+
+class RPCMetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        rpc_metrics.reset()
+        self.service = make_test_service()
+        self.service.w3.provider = FakeBatchProvider(self.service, {1: produce_tuple(1)})
+        self.service.read_cache.head_block = lambda: None
+
+    def tearDown(self):
+        rpc_metrics.reset()
+
+    def test_batched_calls_are_labelled_by_contract_function(self):
+        self.service.w3.provider.supports_details_batch = False
+        with redirect_stdout(io.StringIO()):
+            self.service.get_produce_details_many([1, 99], chunk_size=10)
+
+        series = {row['function']: row for row in rpc_metrics.snapshot()}
+        self.assertEqual(series['getProduceDetailsBatch']['errors'], 1)
+        per_id = series['getProduceDetails']
+        self.assertEqual(per_id['method'], 'eth_call')
+        self.assertEqual(per_id['count'], 2)
+        self.assertEqual(per_id['errors'], 1)
+        self.assertIn('Invalid produce ID', per_id['last_error'])
+        self.assertGreater(per_id['response_bytes'], 0)
+
+    def test_metrics_middleware_is_innermost(self):
+        from .async_services import AsyncWeb3Service
+
+        for w3 in (self.service.w3, AsyncWeb3Service(sync_service=self.service).w3):
+            # Listed outermost first; the last one talks to the provider
+            names = [name for _, name in w3.middleware_onion.middleware]
+            self.assertEqual(names[-1], 'rpc_metrics')
+
+    def test_prometheus_endpoint(self):
+        with redirect_stdout(io.StringIO()):
+            self.service.get_produce_details_many([1])
+
+        response = self.client.get('/api/blockchain/metrics/')
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('agrichain_rpc_requests_total{method="eth_call",function="getProduceDetailsBatch"} 1', body)
+        self.assertIn('agrichain_rpc_latency_seconds_bucket{method="eth_call",function="getProduceDetailsBatch",le="+Inf"} 1', body)
+
+        snapshot = self.client.get('/api/blockchain/metrics/snapshot/').json()
+        self.assertEqual(snapshot['rpc'][0]['count'], 1)
+
+
+class EventIndexerTests(TestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        self.logs = []
+        self.fetched_ranges = []
+        self.indexer = EventIndexer(service=self.service, chunk_size=10)
+        self.fork = 0
+        # Fork the node served eth_getLogs from, when it lags behind self.fork
+        self.logs_fork = None
+        mock.patch.object(self.indexer, 'fetch_logs', side_effect=self._fetch_logs).start()
+        mock.patch.object(self.indexer, 'get_block_hash', side_effect=self._block_hash).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _block_hash(self, block_number, fork=None):
+        # Blocks at or above 10 belong to the current fork
+        fork = (self.fork if fork is None else fork) if block_number >= 10 else 0
+        return '0x' + f'{fork:02x}'.ljust(64 - 8, '0') + f'{block_number:08x}'
+
+    def _fetch_logs(self, from_block, to_block):
+        self.fetched_ranges.append((from_block, to_block))
+        # Logs carry the hash of the block they were read from
+        return [
+            {**log, 'blockHash': HexBytes(self._block_hash(log['blockNumber'], self.logs_fork))}
+            for log in self.logs if from_block <= log['blockNumber'] <= to_block
+        ]
+
+    def test_indexes_listings_and_sales(self):
+        self.logs = [
+            listed_log(self.service, 3, 0, 1, 'Tomatoes'),
+            listed_log(self.service, 4, 0, 2, 'Maize'),
+            sold_log(self.service, 15, 1, 1, 'Tomatoes'),
+        ]
+        stats = self.indexer.run_once(to_block=20)
+
+        self.assertEqual(stats['events'], 3)
+        self.assertEqual(self.fetched_ranges, [(1, 10), (11, 20)])
+        self.assertEqual(ContractEvent.objects.count(), 3)
+        self.assertEqual(IndexerState.objects.get().last_indexed_block, 20)
+
+        tomatoes = Produce.objects.get(blockchain_id=1)
+        self.assertTrue(tomatoes.is_sold)
+        self.assertEqual(tomatoes.buyer_address, BUYER)
+        self.assertIsNotNone(tomatoes.sold_timestamp)
+        self.assertEqual(tomatoes.farmer_address, FARMER.lower())
+        self.assertFalse(Produce.objects.get(blockchain_id=2).is_sold)
+
+    def test_only_new_blocks_are_fetched(self):
+        self.logs = [listed_log(self.service, 3, 0, 1)]
+        self.indexer.run_once(to_block=10)
+        self.fetched_ranges.clear()
+
+        self.logs.append(sold_log(self.service, 12, 0, 1))
+        stats = self.indexer.run_once(to_block=12)
+
+        self.assertEqual(self.fetched_ranges, [(11, 12)])
+        self.assertEqual(stats['sold'], 1)
+        self.assertTrue(Produce.objects.get(blockchain_id=1).is_sold)
+
+    def test_reindexing_is_idempotent(self):
+        self.logs = [listed_log(self.service, 3, 0, 1), sold_log(self.service, 4, 0, 1)]
+        self.indexer.run_once(to_block=10)
+        IndexerState.objects.update(last_indexed_block=0)
+        self.indexer.run_once(to_block=10)
+
+        self.assertEqual(ContractEvent.objects.count(), 2)
+        self.assertEqual(Produce.objects.count(), 1)
+        self.assertTrue(Produce.objects.get().is_sold)
+
+    def test_reorg_rolls_back_and_reapplies(self):
+        self.logs = [
+            listed_log(self.service, 3, 0, 1, 'Tomatoes'),
+            listed_log(self.service, 12, 0, 2, 'Phantom Maize'),
+            sold_log(self.service, 14, 0, 1, 'Tomatoes'),
+        ]
+        self.indexer.run_once(to_block=9)
+        self.indexer.run_once(to_block=15)
+        self.assertTrue(Produce.objects.get(blockchain_id=1).is_sold)
+        self.assertTrue(Produce.objects.filter(blockchain_id=2).exists())
+
+        # Blocks 10+ get replaced: the listing of #2 and the sale of #1 vanish
+        self.fork = 1
+        self.logs = [
+            listed_log(self.service, 3, 0, 1, 'Tomatoes'),
+            listed_log(self.service, 13, 0, 2, 'Real Beans'),
+        ]
+        with redirect_stdout(io.StringIO()):
+            stats = self.indexer.run_once(to_block=15)
+
+        self.assertEqual(stats['rolled_back_to'], 9)
+        self.assertFalse(Produce.objects.get(blockchain_id=1).is_sold)
+        self.assertIsNone(Produce.objects.get(blockchain_id=1).buyer_address)
+        self.assertEqual(Produce.objects.get(blockchain_id=2).name, 'Real Beans')
+        self.assertTrue(Produce.objects.get(blockchain_id=2).is_confirmed)
+        self.assertEqual(ContractEvent.objects.filter(block_number__gt=9).count(), 1)
+        self.assertEqual(
+            BlockCheckpoint.objects.get(block_number=15).block_hash, self._block_hash(15)
+        )
+
+    def test_reorged_listing_is_kept_unconfirmed(self):
+        self.logs = [listed_log(self.service, 12, 0, 1, 'Tomatoes')]
+        self.indexer.run_once(to_block=15)
+        produce = Produce.objects.get(blockchain_id=1)
+        ProduceImage.objects.create(produce=produce, image='produce_images/tomatoes.jpg')
+
+        # The listing is not in the new fork
+        self.fork = 1
+        self.logs = []
+        with redirect_stdout(io.StringIO()):
+            self.indexer.run_once(to_block=15)
+
+        produce.refresh_from_db()
+        self.assertFalse(produce.is_confirmed)
+        self.assertEqual(produce.images.count(), 1)
+        self.assertEqual(self.client.get('/api/produces/available/').json()['results'], [])
+
+        # Mined again in a later block
+        self.logs = [listed_log(self.service, 17, 0, 1, 'Tomatoes')]
+        self.indexer.run_once(to_block=20)
+        produce.refresh_from_db()
+        self.assertTrue(produce.is_confirmed)
+
+    def test_logs_off_the_canonical_chain_are_not_applied(self):
+        self.logs = [listed_log(self.service, 3, 0, 1), listed_log(self.service, 12, 0, 2)]
+        self.logs_fork = 1
+        with redirect_stdout(io.StringIO()):
+            stats = self.indexer.run_once(to_block=20)
+
+        self.assertEqual(stats['to_block'], 10)
+        self.assertEqual(IndexerState.objects.get().last_indexed_block, 10)
+        self.assertEqual(list(Produce.objects.values_list('blockchain_id', flat=True)), [1])
+
+    @override_settings(BLOCKCHAIN_CONFIG={**TEST_BLOCKCHAIN_CONFIG, 'CONFIRMATIONS': 5})
+    def test_stays_confirmations_behind_head(self):
+        indexer = EventIndexer(service=self.service)
+        with mock.patch.object(type(self.service.w3.eth), 'block_number', new_callable=mock.PropertyMock, return_value=100):
+            self.assertEqual(indexer.get_target_block(), 95)
+
+
+class FakeNonceChain:
+    """Stand-in for w3 that only knows an account's pending transaction count"""
+
+    def __init__(self, pending_count):
+        self.pending_count = pending_count
+        self.count_calls = 0
+        self.eth = self
+
+    def get_transaction_count(self, address, block_identifier='latest'):
+        self.count_calls += 1
+        return self.pending_count
+
+
+class NonceManagerTests(TestCase):
+
+    def test_concurrent_allocations_are_unique_and_need_one_rpc(self):
+        chain = FakeNonceChain(7)
+        manager = NonceManager(chain, FARMER)
+        nonces = []
+        nonces_lock = threading.Lock()
+
+        def allocate_many():
+            for _ in range(25):
+                nonce = manager.allocate()
+                with nonces_lock:
+                    nonces.append(nonce)
+
+        threads = [threading.Thread(target=allocate_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(nonces), list(range(7, 7 + 200)))
+        self.assertEqual(chain.count_calls, 1)
+
+    def test_released_nonce_is_reused_first(self):
+        manager = NonceManager(FakeNonceChain(0), FARMER)
+        first, second = manager.allocate(), manager.allocate()
+        manager.release(first)
+        self.assertEqual(manager.allocate(), first)
+        self.assertEqual(manager.allocate(), second + 1)
+
+    def test_resync_moves_past_nonce_too_low(self):
+        chain = FakeNonceChain(3)
+        manager = NonceManager(chain, FARMER)
+        manager.allocate()
+        chain.pending_count = 10  # another signer used the account
+        manager.resync()
+        self.assertEqual(manager.allocate(), 10)
+
+    def test_resync_never_rewinds(self):
+        chain = FakeNonceChain(0)
+        manager = NonceManager(chain, FARMER, resync_interval=0)
+        for _ in range(5):
+            manager.allocate()
+        chain.pending_count = 3  # 3 and 4 are still in flight to the node
+        manager.resync()
+        self.assertEqual([manager.allocate() for _ in range(2)], [5, 6])
+
+    def test_reclaims_only_nonces_the_chain_has_not_used(self):
+        chain = FakeNonceChain(0)
+        manager = NonceManager(chain, FARMER)
+        for _ in range(5):
+            manager.allocate()
+        chain.pending_count = 3
+        # 2 was mined after all; 3 and 4 were dropped
+        self.assertEqual(manager.reclaim_dropped([2, 3, 4]), [3, 4])
+        self.assertEqual([manager.allocate() for _ in range(3)], [3, 4, 5])
+
+    def test_database_store(self):
+        chain = FakeNonceChain(4)
+        manager = NonceManager(chain, FARMER, use_database=True)
+        other_worker = NonceManager(chain, FARMER, use_database=True)
+
+        self.assertEqual(manager.allocate(), 4)
+        self.assertEqual(other_worker.allocate(), 5)
+        manager.release(4)
+        self.assertEqual(other_worker.allocate(), 4)
+        self.assertEqual(AccountNonce.objects.get().next_nonce, 6)
+
+    def test_nonce_error_detection(self):
+        self.assertTrue(is_nonce_error(ValueError({'message': 'nonce too low: next nonce 5, tx nonce 4'})))
+        self.assertFalse(is_nonce_error(ValueError('insufficient funds for gas * price + value')))
+
+
+class ManagedNonceSendTests(TestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        self.service.nonce_manager = mock.Mock()
+        self.service.nonce_manager.allocate.side_effect = [7, 8]
+        self.contract_function = mock.Mock()
+        self.contract_function.build_transaction.side_effect = lambda params: {
+            'to': TEST_BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS'], 'data': '0x', 'value': 0, **params,
+        }
+        self.tx_params = {'gas': 500000, 'gasPrice': 1}
+
+    def test_already_known_returns_the_hash_instead_of_resending(self):
+        eth = self.service.w3.eth
+        with mock.patch.object(eth, 'send_raw_transaction', side_effect=ValueError('already known')) as send, \
+                mock.patch.object(eth, 'get_transaction', return_value={}):
+            tx_hash = self.service._send_with_managed_nonce(self.contract_function, self.tx_params)
+
+        raw_transaction = send.call_args.args[0]
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(tx_hash, self.service.w3.keccak(raw_transaction))
+        self.service.nonce_manager.resync.assert_not_called()
+        self.service.nonce_manager.release.assert_not_called()
+
+    def test_nonce_too_low_resends_with_a_fresh_nonce(self):
+        from web3.exceptions import TransactionNotFound
+        eth = self.service.w3.eth
+        with mock.patch.object(eth, 'send_raw_transaction', side_effect=[ValueError('nonce too low'), b'sent']), \
+                mock.patch.object(eth, 'get_transaction', side_effect=TransactionNotFound('not found')):
+            tx_hash = self.service._send_with_managed_nonce(self.contract_function, self.tx_params)
+
+        self.assertEqual(tx_hash, b'sent')
+        self.service.nonce_manager.resync.assert_called_once()
+        self.assertEqual([call.args[0]['nonce'] for call in self.contract_function.build_transaction.call_args_list],
+                         [7, 8])
+
+
+class FakeFeeChain:
+    """Stand-in for w3.eth serving block numbers and fee history"""
+
+    def __init__(self):
+        self.block_number = 100
+        self.fee_history_calls = 0
+        self.eth = self
+
+    def fee_history(self, block_count, newest_block, reward_percentiles):
+        self.fee_history_calls += 1
+        return {
+            'baseFeePerGas': [10**9] * block_count + [2 * 10**9],
+            'reward': [[3 * 10**9], [2 * 10**9], [4 * 10**9]],
+        }
+
+
+class FeeOracleTests(SimpleTestCase):
+
+    def test_fees_from_fee_history(self):
+        oracle = FeeOracle(FakeFeeChain(), min_priority_fee=0)
+        self.assertEqual(oracle.get_fee_params(), {
+            'maxFeePerGas': 2 * 2 * 10**9 + 3 * 10**9,
+            'maxPriorityFeePerGas': 3 * 10**9,
+        })
+
+    def test_fees_cached_until_ttl_and_new_block(self):
+        chain = FakeFeeChain()
+        oracle = FeeOracle(chain, ttl=0)
+        oracle.get_fee_params()
+        oracle.get_fee_params()
+        self.assertEqual(chain.fee_history_calls, 1)  # same block
+
+        chain.block_number += 1
+        oracle.get_fee_params()
+        self.assertEqual(chain.fee_history_calls, 2)
+
+        oracle = FeeOracle(chain, ttl=60)
+        oracle.get_fee_params()
+        chain.block_number += 1
+        oracle.get_fee_params()
+        self.assertEqual(chain.fee_history_calls, 3)  # within TTL
+
+    def test_gas_limit_learned_from_receipts(self):
+        oracle = FeeOracle(FakeFeeChain(), safety_margin=1.5)
+        contract_function = mock.Mock()
+        contract_function.estimate_gas.return_value = 200000
+
+        self.assertEqual(oracle.gas_limit('listProduce', 1, contract_function), 300000)
+        self.assertEqual(oracle.gas_limit('listProduce', 1, contract_function), 300000)
+        self.assertEqual(contract_function.estimate_gas.call_count, 1)
+
+        oracle.observe_gas_used('listProduce', 1, 150000)
+        oracle.observe_gas_used('listProduce', 1, 160000)
+        self.assertEqual(oracle.gas_limit('listProduce', 1, contract_function), 240000)
+
+    def test_name_length_bucket(self):
+        self.assertEqual(name_length_bucket('Maize'), 1)
+        self.assertEqual(name_length_bucket('x' * 32), 1)
+        self.assertEqual(name_length_bucket('x' * 33), 3)
+        self.assertEqual(name_length_bucket('x' * 100), 5)
+
+
+class FakeReceiptProvider:
+    """Answers eth_getTransactionReceipt batches from a dict of raw receipts"""
+
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.batches = []
+
+    def make_batch_request(self, batch):
+        self.batches.append(batch)
+        return [
+            {'jsonrpc': '2.0', 'id': request_id, 'result': self.receipts.get(params[0])}
+            for request_id, (method, params) in enumerate(batch)
+        ]
+
+
+def tx_hash(number):
+    return '0x' + f'{number:064x}'
+
+
+class ReceiptWorkerTests(TestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        for number in range(1, 5):
+            BlockchainTransaction.objects.create(
+                transaction_hash=tx_hash(number),
+                transaction_type='list_produce',
+                from_address=FARMER,
+                to_address=TEST_BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS'],
+                gas_bucket=1,
+            )
+        self.provider = FakeReceiptProvider({
+            tx_hash(1): {'status': '0x1', 'blockNumber': '0x10', 'gasUsed': '0x249f0', 'effectiveGasPrice': '0x3b9aca00'},
+            tx_hash(2): {'status': '0x0', 'blockNumber': '0x11', 'gasUsed': '0x5208', 'effectiveGasPrice': '0x3b9aca00'},
+        })
+        self.service.w3.provider = self.provider
+        self.worker = ReceiptWorker(service=self.service, batch_size=3)
+
+    def test_updates_confirmed_failed_and_pending(self):
+        with mock.patch.object(self.worker, 'revert_reason', return_value='Produce already sold'):
+            stats = self.worker.run_once()
+
+        self.assertEqual(stats, {'checked': 4, 'confirmed': 1, 'failed': 1, 'pending': 2})
+        self.assertEqual(len(self.provider.batches), 2)
+
+        confirmed = BlockchainTransaction.objects.get(transaction_hash=tx_hash(1))
+        self.assertEqual(confirmed.status, 'confirmed')
+        self.assertEqual(confirmed.block_number, 16)
+        self.assertEqual(confirmed.gas_used, 150000)
+        self.assertEqual(confirmed.gas_price, 10**9)
+        self.assertIsNotNone(confirmed.confirmed_at)
+
+        reverted = BlockchainTransaction.objects.get(transaction_hash=tx_hash(2))
+        self.assertEqual(reverted.status, 'failed')
+        self.assertEqual(reverted.error_message, 'Transaction reverted: Produce already sold')
+
+    def test_unknown_transactions_back_off(self):
+        self.worker.run_once()
+        unknown = BlockchainTransaction.objects.get(transaction_hash=tx_hash(3))
+        self.assertEqual(unknown.status, 'pending')
+        self.assertEqual(unknown.check_attempts, 1)
+
+        # Not due again yet, so an immediate re-run polls nothing
+        self.provider.batches.clear()
+        self.assertEqual(self.worker.run_once()['checked'], 0)
+        self.assertEqual(self.provider.batches, [])
+
+    def test_confirmed_gas_feeds_fee_oracle(self):
+        self.worker.run_once()
+        contract_function = mock.Mock()
+        limit = self.service.fee_oracle.gas_limit('listProduce', 1, contract_function)
+        self.assertEqual(limit, int(150000 * self.service.fee_oracle.safety_margin))
+        contract_function.estimate_gas.assert_not_called()
+
+    def test_query_count_does_not_grow_with_pending_rows(self):
+        for number in range(5, 51):
+            BlockchainTransaction.objects.create(
+                transaction_hash=tx_hash(number),
+                transaction_type='list_produce',
+                from_address=FARMER,
+                to_address=TEST_BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS'],
+            )
+        worker = ReceiptWorker(service=self.service, batch_size=50)
+        # One SELECT for the due rows and one bulk UPDATE for the chunk, with
+        # no per-row loads of deferred fields
+        with mock.patch.object(worker, 'revert_reason', return_value=''), self.assertNumQueries(2):
+            self.assertEqual(worker.run_once()['checked'], 50)
+
+
+class FakeEndpointProvider:
+    """Sub-provider with a fixed latency that can be made to fail"""
+
+    def __init__(self, name, latency=0.0, fail=False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.methods = []
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        if self.fail is True:
+            raise ConnectionError(f'{self.name} is down')
+        if self.fail == 'rate_limit':
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32005, 'message': 'rate limit exceeded'}}
+        if self.fail == 'lagging':
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'header not found'}}
+        time.sleep(self.latency)
+        return {'jsonrpc': '2.0', 'id': 1, 'result': self.name}
+
+
+class PooledHTTPProviderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = PooledHTTPProvider(['http://primary', 'http://fast', 'http://slow'], failure_threshold=2)
+        self.primary, self.fast, self.slow = (
+            FakeEndpointProvider('primary', 0.01), FakeEndpointProvider('fast'), FakeEndpointProvider('slow', 0.02),
+        )
+        for endpoint, provider in zip(self.pool.endpoints, (self.primary, self.fast, self.slow)):
+            endpoint.provider = provider
+
+    def test_reads_prefer_lowest_latency(self):
+        # First rounds measure every endpoint, after that reads settle on the fastest
+        for _ in range(5):
+            self.pool.make_request('eth_call', [])
+        self.assertEqual(self.pool.make_request('eth_call', [])['result'], 'fast')
+
+    def test_writes_are_pinned_to_primary(self):
+        for _ in range(3):
+            self.pool.make_request('eth_blockNumber', [])
+        self.pool.make_request('eth_sendRawTransaction', ['0x00'])
+        self.pool.make_request('eth_getTransactionCount', [FARMER, 'pending'])
+        self.assertEqual(self.primary.methods.count('eth_sendRawTransaction'), 1)
+        self.assertEqual(self.primary.methods.count('eth_getTransactionCount'), 1)
+
+    def test_failover_and_circuit_breaker(self):
+        for _ in range(3):
+            self.pool.make_request('eth_call', [])
+        self.fast.fail = 'rate_limit'
+        # The rate-limited endpoint is skipped within the same call
+        self.assertNotEqual(self.pool.make_request('eth_call', [])['result'], 'fast')
+        self.pool.make_request('eth_call', [])
+        self.assertTrue(self.pool.snapshot()[1]['circuit_open'])
+
+        calls = len(self.fast.methods)
+        self.pool.make_request('eth_call', [])
+        self.assertEqual(len(self.fast.methods), calls)
+
+    def test_unknown_block_is_retried_on_another_endpoint(self):
+        for _ in range(3):
+            self.pool.make_request('eth_call', [])
+        # The fastest endpoint hasn't seen the requested block yet
+        self.fast.fail = 'lagging'
+        response = self.pool.make_request('eth_getBlockByNumber', ['0x10', False])
+        self.assertIn(response['result'], ('primary', 'slow'))
+        self.assertEqual(self.fast.methods[-1], 'eth_getBlockByNumber')
+
+    def test_half_open_circuit_allows_one_trial_call(self):
+        fast = self.pool.endpoints[1]
+        for _ in range(3):
+            self.pool.make_request('eth_call', [])
+        fast.record_failure()
+        fast.record_failure()
+        fast.open_until = time.monotonic() - 1  # cooldown over
+
+        # Another request holds the trial call: this one goes elsewhere
+        self.assertTrue(fast.try_acquire(time.monotonic()))
+        self.assertFalse(fast.try_acquire(time.monotonic()))
+        calls = len(self.fast.methods)
+        self.assertNotEqual(self.pool.make_request('eth_call', [])['result'], 'fast')
+        self.assertEqual(len(self.fast.methods), calls)
+
+        # The trial succeeds and closes the breaker
+        fast.record_success(0.001)
+        self.assertTrue(fast.try_acquire(time.monotonic()))
+        self.assertTrue(fast.try_acquire(time.monotonic()))
+
+    def test_failed_trial_reopens_the_circuit(self):
+        fast = self.pool.endpoints[1]
+        for _ in range(3):
+            self.pool.make_request('eth_call', [])
+        self.fast.fail = True
+        for _ in range(2):
+            self.pool.make_request('eth_call', [])
+        fast.open_until = time.monotonic() - 1
+
+        self.pool.make_request('eth_call', [])
+        self.assertTrue(self.pool.snapshot()[1]['circuit_open'])
+        self.assertFalse(fast.trial_in_flight)
+
+    def test_primary_failure_is_not_hidden_for_writes(self):
+        self.primary.fail = True
+        with self.assertRaises(Exception):
+            self.pool.make_request('eth_sendRawTransaction', ['0x00'])
+        self.assertEqual(self.fast.methods, [])
+
+
+class FakeOutboxService:
+    """
+    Signs listProduce calls into fake raw transactions and records broadcasts
+
+    ``sign_errors`` and ``broadcast_errors`` are raised by the next calls, in order.
+    """
+
+    def __init__(self, sign_errors=(), broadcast_errors=(), known_hashes=()):
+        self.sign_errors = list(sign_errors)
+        self.broadcast_errors = list(broadcast_errors)
+        self.known_hashes = set(known_hashes)
+        self.signed = []
+        self.broadcasts = []
+        self.nonce_manager = mock.Mock()
+        self.next_nonce = 0
+
+    def sign_list_produce(self, name, quantity, price_per_unit, nonce=None):
+        if self.sign_errors:
+            raise self.sign_errors.pop(0)
+        if nonce is None:
+            nonce = self.next_nonce
+            self.next_nonce += 1
+        self.signed.append((name, quantity, price_per_unit, nonce))
+        return {
+            'raw_transaction': f'0xraw{len(self.signed)}',
+            'transaction_hash': tx_hash(len(self.signed)),
+            'nonce': nonce,
+            'gas_bucket': 1,
+        }
+
+    def broadcast(self, raw_transaction):
+        self.broadcasts.append(raw_transaction)
+        if self.broadcast_errors:
+            raise self.broadcast_errors.pop(0)
+
+    def transaction_known(self, transaction_hash):
+        return transaction_hash in self.known_hashes
+
+    def record_transaction(self, transaction_hash, transaction_type, gas_bucket=None):
+        return BlockchainTransaction.objects.create(
+            transaction_hash=transaction_hash,
+            transaction_type=transaction_type,
+            from_address=FARMER,
+            to_address=TEST_BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS'],
+            gas_bucket=gas_bucket,
+        )
+
+
+class OutboxDispatcherTests(TestCase):
+
+    def queue(self, name, price_per_unit=10**18):
+        return OutboxTransaction.objects.create(
+            transaction_type='list_produce',
+            payload={'name': name, 'quantity': 5, 'price_per_unit': str(price_per_unit)},
+        )
+
+    def test_sends_in_queue_order_and_links_transactions(self):
+        entries = [self.queue(name) for name in ('Maize', 'Beans', 'Rice')]
+        service = FakeOutboxService()
+
+        stats = OutboxDispatcher(service=service, max_per_second=0).run_once()
+
+        self.assertEqual(stats, {'sent': 3, 'failed': 0, 'retrying': 0})
+        self.assertEqual([call[0] for call in service.signed], ['Maize', 'Beans', 'Rice'])
+        self.assertEqual(service.signed[0][2], 10**18)
+        for nonce, entry in enumerate(entries):
+            entry.refresh_from_db()
+            self.assertEqual((entry.status, entry.nonce), ('sent', nonce))
+            self.assertEqual(entry.transaction.transaction_hash, entry.transaction_hash)
+
+    def test_transient_failure_blocks_later_rows(self):
+        first, second = self.queue('Maize'), self.queue('Beans')
+        service = FakeOutboxService(broadcast_errors=[TimeoutError('read timed out')])
+        dispatcher = OutboxDispatcher(service=service, max_per_second=0)
+
+        self.assertEqual(dispatcher.run_once(), {'sent': 0, 'failed': 0, 'retrying': 1})
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ('queued', 1))
+        self.assertIn('timed out', first.last_error)
+
+        # Still backing off: nothing overtakes it
+        self.assertEqual(dispatcher.run_once(), {'sent': 0, 'failed': 0, 'retrying': 0})
+        OutboxTransaction.objects.filter(pk=first.pk).update(next_attempt_at=first.created_at)
+        self.assertEqual(dispatcher.run_once()['sent'], 2)
+        self.assertEqual([call[0] for call in service.signed], ['Maize', 'Beans'])
+        # The timed-out send may have reached the node, so the retry resent the same bytes
+        self.assertEqual(service.broadcasts, ['0xraw1', '0xraw1', '0xraw2'])
+
+    def test_permanent_failure_is_skipped(self):
+        first, second = self.queue('Maize'), self.queue('Beans')
+        service = FakeOutboxService(sign_errors=[ValueError('execution reverted: Quantity must be greater than 0')])
+
+        stats = OutboxDispatcher(service=service, max_per_second=0).run_once()
+
+        self.assertEqual(stats, {'sent': 1, 'failed': 1, 'retrying': 0})
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'failed')
+        self.assertEqual(service.signed[0][0], 'Beans')
+
+    def test_rejected_broadcast_releases_the_nonce(self):
+        entry = self.queue('Maize')
+        service = FakeOutboxService(broadcast_errors=[ValueError('insufficient funds for gas * price + value')])
+
+        self.assertEqual(OutboxDispatcher(service=service, max_per_second=0).run_once()['failed'], 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.raw_transaction, entry.nonce), ('', None))
+        service.nonce_manager.release.assert_called_once_with(0)
+
+    def test_underpriced_send_is_signed_again_with_the_same_nonce(self):
+        entry = self.queue('Maize')
+        service = FakeOutboxService(broadcast_errors=[ValueError('transaction underpriced')])
+        dispatcher = OutboxDispatcher(service=service, max_per_second=0, base_backoff=0)
+
+        self.assertEqual(dispatcher.run_once()['retrying'], 1)
+        self.assertEqual(dispatcher.run_once()['sent'], 1)
+        self.assertEqual([call[3] for call in service.signed], [0, 0])
+        entry.refresh_from_db()
+        self.assertEqual(entry.transaction_hash, tx_hash(2))
+
+    def test_nonce_too_low_after_an_earlier_send_counts_as_sent(self):
+        entry = self.queue('Maize')
+        service = FakeOutboxService(broadcast_errors=[TimeoutError('read timed out'), ValueError('nonce too low')],
+                                    known_hashes=[tx_hash(1)])
+        dispatcher = OutboxDispatcher(service=service, max_per_second=0, base_backoff=0)
+
+        dispatcher.run_once()
+        self.assertEqual(dispatcher.run_once()['sent'], 1)
+        self.assertEqual(len(service.signed), 1)
+        entry.refresh_from_db()
+        self.assertEqual(entry.transaction.transaction_hash, tx_hash(1))
+
+    def test_stale_sending_row_is_resent(self):
+        entry = self.queue('Maize')
+        OutboxTransaction.objects.filter(pk=entry.pk).update(
+            status='sending', claimed_at=timezone.now() - timedelta(hours=1),
+            raw_transaction='0xsigned', transaction_hash=tx_hash(9), nonce=4,
+        )
+        service = FakeOutboxService()
+
+        self.assertEqual(OutboxDispatcher(service=service, max_per_second=0).run_once()['sent'], 1)
+        # Signed before the crash: resent as is, not signed again
+        self.assertEqual((service.signed, service.broadcasts), ([], ['0xsigned']))
+
+    def test_nonces_of_dropped_transactions_are_reclaimed(self):
+        entry = self.queue('Maize')
+        service = FakeOutboxService()
+        dispatcher = OutboxDispatcher(service=service, max_per_second=0)
+        dispatcher.run_once()
+        entry.refresh_from_db()
+        service.nonce_manager.reclaim_dropped.return_value = [0]
+
+        # Still pending: the nonce stays taken
+        self.assertEqual(dispatcher.reclaim_dropped_nonces(), [])
+        BlockchainTransaction.objects.filter(pk=entry.transaction_id).update(status='failed')
+        self.assertEqual(dispatcher.reclaim_dropped_nonces(), [0])
+        service.nonce_manager.reclaim_dropped.assert_called_once_with([0])
+        # Only once
+        self.assertEqual(dispatcher.reclaim_dropped_nonces(), [])
+
+
+class ListProduceBatchTests(TestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        self.service.fee_oracle = mock.Mock()
+        self.service.fee_oracle.gas_limit.return_value = 500000
+        self.service.fee_oracle.get_fee_params.return_value = {'gasPrice': 1}
+        self.sent = []
+
+        def send(contract_function, tx_params):
+            self.sent.append((contract_function, tx_params))
+            return HexBytes(tx_hash(len(self.sent)))
+
+        self.service._send_with_managed_nonce = send
+
+    def test_list_produce_many_sends_one_transaction_per_batch(self):
+        items = [{'name': f'Lot {i}', 'quantity': i + 1, 'price_per_unit': 10**15} for i in range(60)]
+
+        tx_hashes = self.service.list_produce_many(items)
+
+        self.assertEqual(tx_hashes, [tx_hash(1), tx_hash(2)])
+        first_call, _ = self.sent[0]
+        self.assertEqual(first_call.fn_name, 'listProduceBatch')
+        self.assertEqual(len(first_call.args[0]), services.MAX_LIST_BATCH_SIZE)
+        self.assertEqual(len(self.sent[1][0].args[0]), 10)
+
+        recorded = BlockchainTransaction.objects.get(transaction_hash=tx_hash(2))
+        self.assertEqual(recorded.transaction_type, 'list_produce_batch')
+        self.assertEqual(recorded.gas_bucket, 10 * 10 + 1)
+        self.service.fee_oracle.gas_limit.assert_any_call(
+            'listProduceBatch', 10 * 10 + 1, mock.ANY, {'from': self.service.account.address},
+        )
+
+    def test_sign_list_produce_batch_returns_bytes_to_resend(self):
+        from eth_account import Account
+
+        self.service.nonce_manager = mock.Mock(allocate=mock.Mock(return_value=7))
+        items = [{'name': 'Maize', 'quantity': 5, 'price_per_unit': 10**15}]
+
+        signed = self.service.sign_list_produce_batch(items)
+
+        self.assertEqual((signed['nonce'], signed['gas_bucket']), (7, 11))
+        self.assertEqual(self.service.w3.to_hex(self.service.w3.keccak(hexstr=signed['raw_transaction'])),
+                         signed['transaction_hash'])
+        self.assertEqual(Account.recover_transaction(signed['raw_transaction']), self.service.account.address)
+
+        # Signing with a given nonce doesn't allocate another
+        again = self.service.sign_list_produce_batch(items, nonce=7)
+        self.assertEqual(again['transaction_hash'], signed['transaction_hash'])
+        self.service.nonce_manager.allocate.assert_called_once()
+
+        self.service.fee_oracle.get_fee_params.side_effect = TimeoutError('fee history timed out')
+        with self.assertRaises(TimeoutError):
+            self.service.sign_list_produce_batch(items)
+        self.service.nonce_manager.release.assert_called_once_with(7)
+
+
+class AvailableProducesTests(SimpleTestCase):
+
+    def test_walks_every_page_at_one_block(self):
+        service = make_test_service()
+        service.read_cache = services.BlockAwareReadCache(FakeHead(block_number=7))
+        available = list(range(1200, 0, -1))  # the contract's set is unordered
+        calls = []
+
+        def page(offset, limit):
+            call = mock.Mock()
+            call.call.side_effect = lambda block_identifier: (
+                calls.append((offset, block_identifier)) or available[offset:offset + limit]
+            )
+            return call
+
+        service.contract = mock.Mock(address=TEST_BLOCKCHAIN_CONFIG['CONTRACT_ADDRESS'])
+        service.contract.functions.getAvailableProduceCount.return_value.call.return_value = len(available)
+        service.contract.functions.getAvailableProducesPage.side_effect = page
+
+        self.assertEqual(service.get_available_produces(), list(range(1, 1201)))
+        self.assertEqual(calls, [(0, 7), (500, 7), (1000, 7)])
+
+        # Same block: served from the read cache
+        service.get_available_produces()
+        self.assertEqual(len(calls), 3)
+
+
+class ReconcileSoldStatusTests(TestCase):
+
+    def setUp(self):
+        self.service = make_test_service()
+        self.service.read_cache.head_block = lambda: None
+        chain = {produce_id: produce_tuple(produce_id, is_sold=produce_id in (2, 4, 600)) for produce_id in range(1, 601)}
+        self.provider = FakeBatchProvider(self.service, chain)
+        self.service.w3.provider = self.provider
+
+        # The database missed the sales of 2 and 600, and still has 5 sold
+        stored = {**chain, 5: produce_tuple(5, is_sold=True), 2: produce_tuple(2), 600: produce_tuple(600)}
+        Produce.objects.bulk_create([
+            produce_from_details(services.Web3Service._format_produce_details(stored[produce_id]), '0xabc')
+            for produce_id in (1, 2, 3, 4, 5, 600)
+        ])
+
+    def test_dry_run_only_reports(self):
+        result = self.service.reconcile_sold_status(apply=False)
+
+        self.assertEqual(result['newly_sold'], [2, 600])
+        self.assertEqual(result['unsold'], [5])
+        self.assertFalse(Produce.objects.get(blockchain_id=2).is_sold)
+        # IDs 1-600 fit in one getSoldBitmap call
+        (batch,) = self.provider.batches
+        self.assertEqual(len(batch), 1)
+
+    def test_apply_updates_the_rows(self):
+        with redirect_stdout(io.StringIO()):
+            self.service.reconcile_sold_status()
+
+        sold = Produce.objects.get(blockchain_id=600)
+        self.assertTrue(sold.is_sold)
+        self.assertEqual(sold.buyer_address, BUYER)
+        self.assertEqual(sold.sold_timestamp.timestamp(), 1700000600)
+        self.assertFalse(Produce.objects.get(blockchain_id=5).is_sold)
+        self.assertIsNone(Produce.objects.get(blockchain_id=5).buyer_address)
+        self.assertEqual(list(Produce.objects.filter(is_sold=True).values_list('blockchain_id', flat=True).order_by('blockchain_id')), [2, 4, 600])
+
+    def test_ranges_past_one_call_are_batched(self):
+        with mock.patch.object(services, 'SOLD_BITMAP_SIZE', 256):
+            self.assertEqual(self.service.get_sold_ids(1, 600), {2, 4, 600})
+        # Three getSoldBitmap calls in two JSON-RPC batches (RPC_BATCH_SIZE=2)
+        self.assertEqual([len(batch) for batch in self.provider.batches], [2, 1])
@@ -0,0 +1,11 @@
+"""
+URL configuration for the blockchain app
+"""
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('metrics/', views.metrics, name='blockchain-metrics'),
+    path('metrics/snapshot/', views.metrics_snapshot, name='blockchain-metrics-snapshot'),
+]
@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse
 
-# Create your views here.
+from . import services
+from .metrics import rpc_metrics
+
+
+def metrics(request):
+    """RPC metrics in the Prometheus text format"""
+    return HttpResponse(rpc_metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def metrics_snapshot(request):
+    """RPC metrics as JSON, slowest series first"""
+    snapshot = {'rpc': rpc_metrics.snapshot()}
+
+    # Read cache and RPC pool state, without starting the service just for this
+    service = services._web3_service
+    if service is not None:
+        snapshot['read_cache'] = service.read_cache.stats()
+        if hasattr(service.w3.provider, 'snapshot'):
+            snapshot['endpoints'] = service.w3.provider.snapshot()
+    return JsonResponse(snapshot)
@@ -0,0 +1,150 @@
+"""
+Async API views for the RPC-bound produce endpoints
+
+These mirror ``ProduceViewSet.create``, ``purchase`` and ``sync_from_blockchain``.
+Listings and syncs are queued (outbox, sync jobs); purchases await the node
+through AsyncWeb3Service, so under ASGI a slow RPC endpoint doesn't tie up a
+worker thread per request.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+
+from blockchain.async_services import get_async_web3_service
+from blockchain.models import OutboxTransaction
+
+from .jobs import enqueue_sync
+from .models import Produce
+from .serializers import ProduceCreateSerializer, ProducePurchaseSerializer
+
+
+def _parse_json(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return None
+
+
+@csrf_exempt
+@require_POST
+async def create_produce(request):
+    """
+    Queue a new produce listing for the blockchain
+
+    Like ``ProduceViewSet.create`` this only inserts an OutboxTransaction; the
+    dispatcher signs and sends it, so the server account's nonces are only
+    ever handed out by one process.
+    """
+    data = _parse_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ProduceCreateSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Convert ETH to wei
+    price_per_unit_wei = int(serializer.validated_data['price_per_unit_eth'] * 10**18)
+
+    entry = await OutboxTransaction.objects.acreate(
+        transaction_type='list_produce',
+        payload={
+            'name': serializer.validated_data['name'],
+            'quantity': serializer.validated_data['quantity'],
+            # Wei amounts can exceed the 64-bit integers JSON columns store
+            'price_per_unit': str(price_per_unit_wei),
+        },
+    )
+
+    return JsonResponse(
+        {
+            'message': 'Produce listing queued for the blockchain',
+            'outbox_id': entry.id,
+            'status': entry.status,
+            'status_url': request.build_absolute_uri(reverse('produce-outbox', kwargs={'outbox_id': entry.id})),
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+@csrf_exempt
+@require_POST
+async def purchase_produce(request, pk):
+    """Purchase a produce item"""
+    produce = await Produce.objects.filter(pk=pk).afirst()
+    if produce is None:
+        return JsonResponse({'detail': 'No Produce matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if produce.is_sold:
+        return JsonResponse(
+            {'error': 'This produce has already been sold'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not produce.is_confirmed:
+        return JsonResponse(
+            {'error': 'This listing is not on the canonical chain'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    data = _parse_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ProducePurchaseSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Extract buyer address from private key
+    from eth_account import Account
+    buyer_account = Account.from_key(serializer.validated_data['buyer_private_key'])
+
+    service = await sync_to_async(get_async_web3_service)()
+    tx_hash = await service.buy_produce(
+        produce_id=produce.blockchain_id,
+        buyer_address=buyer_account.address,
+        buyer_private_key=serializer.validated_data['buyer_private_key']
+    )
+
+    if not tx_hash:
+        return JsonResponse(
+            {'error': 'Failed to purchase produce on blockchain'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return JsonResponse(
+        {
+            'message': 'Purchase submitted to blockchain',
+            'transaction_hash': tx_hash,
+            'buyer_address': buyer_account.address,
+            'status': 'pending'
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+@csrf_exempt
+@require_POST
+async def sync_from_blockchain(request):
+    """
+    Queue a sync from the blockchain and return its job ID
+
+    Same as ``ProduceViewSet.sync_from_blockchain``: the sync itself runs as
+    a background job (produce.jobs), so nothing here waits on the node.
+    """
+    kind = 'full' if request.GET.get('full', '').lower() == 'true' else 'events'
+    job, created = await sync_to_async(enqueue_sync)(kind)
+    return JsonResponse(
+        {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'status_url': request.build_absolute_uri(reverse('produce-sync-job', kwargs={'job_id': job.id})),
+            'message': 'Sync queued' if created else 'A sync is already in progress',
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
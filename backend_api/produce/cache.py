@@ -0,0 +1,103 @@
+"""
+Versioned response cache for the marketplace list endpoints
+
+Every write to Produce, ProduceImage or ProduceCategory bumps a version
+counter in the cache (through the receivers in produce.models, or explicitly
+by the bulk paths that bypass signals: the full sync, the event indexer and
+the sold-status reconciliation). Cached responses are keyed by that version,
+so a write invalidates all of them at once and stale entries simply expire.
+
+Responses carry a strong ETag (a hash of the body). A request whose
+If-None-Match matches the cached entry gets a 304 straight from the cache,
+without touching the ORM.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+VERSION_KEY = 'marketplace:version'
+CACHED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+
+
+def get_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so a cleared cache never hands
+        # out a version (and so an ETag) that was already used
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached marketplace response once the transaction commits"""
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def response_key(request, version: int) -> str:
+    digest = hashlib.sha256(
+        f"{request.build_absolute_uri()}|{request.META.get('HTTP_ACCEPT', '')}".encode()
+    ).hexdigest()
+    return f'marketplace:response:{version}:{digest}'
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison
+    tags = {tag.removeprefix('W/') for tag in parse_etags(header)}
+    return '*' in tags or etag in tags
+
+
+class MarketplaceCacheMixin:
+    """
+    Serve the viewset's ``cached_actions`` from the versioned response cache
+
+    Only successful GETs are cached. The responses don't vary by user, so a
+    hit skips the whole DRF pipeline.
+    """
+
+    cached_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or self.action_map.get('get') not in self.cached_actions:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Read the version before the queries, so a write racing with this
+        # request can only make the stored entry newer than its version
+        key = response_key(request, get_version())
+        entry = cache.get(key)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.render()
+            entry = {
+                'content': response.content,
+                'etag': f'"{hashlib.sha256(response.content).hexdigest()[:32]}"',
+                'headers': {name: response[name] for name in CACHED_HEADERS if response.has_header(name)},
+            }
+            cache.set(key, entry, settings.MARKETPLACE_CACHE_TIMEOUT)
+        else:
+            response = HttpResponse(entry['content'], headers=entry['headers'])
+
+        if etag_matches(request, entry['etag']):
+            response = HttpResponseNotModified()
+        response['ETag'] = entry['etag']
+        # Clients may keep the body but should revalidate it with the ETag
+        patch_cache_control(response, no_cache=True)
+        return response
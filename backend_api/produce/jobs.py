@@ -0,0 +1,187 @@
+"""
+Background sync jobs
+
+sync_from_blockchain no longer syncs inside the request: it records a
+SyncJob and runs it on a background thread once the request's transaction
+commits. A partial unique constraint on SyncJob allows one queued or running
+job per contract, so repeated clicks join the job already in flight instead
+of starting overlapping scans. The index_events and sync_produces commands
+take the same lock. A running job touches updated_at on a heartbeat; one
+that stopped doing so for SYNC_JOB_STALE_SECONDS (its process died) no
+longer holds the lock.
+"""
+import threading
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.utils import timezone
+
+from blockchain.indexer import EventIndexer
+
+from .models import SyncJob
+from .sync import FullSync
+
+
+def contract_address() -> str:
+    return settings.BLOCKCHAIN_CONFIG.get('CONTRACT_ADDRESS', '')
+
+
+def stale_after() -> int:
+    return settings.BLOCKCHAIN_CONFIG.get('SYNC_JOB_STALE_SECONDS', 600)
+
+
+def expire_stale_jobs(address: str) -> int:
+    """Fail active jobs whose heartbeat stopped, releasing the lock"""
+    return SyncJob.objects.filter(
+        contract_address=address,
+        status__in=SyncJob.ACTIVE_STATUSES,
+        updated_at__lt=timezone.now() - timedelta(seconds=stale_after()),
+    ).update(status='failed', error='Stopped reporting progress', finished_at=timezone.now())
+
+
+def enqueue_sync(kind: str, start=True) -> Tuple[SyncJob, bool]:
+    """
+    Queue a sync job for the configured contract
+
+    Returns (job, created). If a job is already queued or running, that job
+    is returned instead and nothing new is started.
+    """
+    address = contract_address()
+    expire_stale_jobs(address)
+    try:
+        with transaction.atomic():
+            job = SyncJob.objects.create(
+                contract_address=address, kind=kind, unit='blocks' if kind == 'events' else 'produces',
+            )
+    except IntegrityError:
+        active = SyncJob.objects.filter(contract_address=address, status__in=SyncJob.ACTIVE_STATUSES).first()
+        if active is None:
+            # The other job finished in between, try again
+            return enqueue_sync(kind, start)
+        return active, False
+
+    if start:
+        transaction.on_commit(lambda: start_sync_job(job.pk))
+    return job, True
+
+
+def start_sync_job(job_id: int):
+    threading.Thread(target=_run_in_thread, args=(job_id,), name=f'sync-job-{job_id}', daemon=True).start()
+
+
+def _run_in_thread(job_id: int):
+    try:
+        run_sync_job(job_id)
+    finally:
+        # The thread opened its own connection; don't leave it dangling
+        connections.close_all()
+
+
+def run_sync_job(job_id: int, service=None, chunk_size: Optional[int] = None, progress=None) -> Optional[SyncJob]:
+    """
+    Claim a queued job, run it and record the outcome
+
+    ``chunk_size`` goes to the indexer or FullSync; ``progress(done, total)``
+    is called alongside the job's own progress updates.
+    """
+    now = timezone.now()
+    if not SyncJob.objects.filter(pk=job_id, status='queued').update(
+        status='running', started_at=now, updated_at=now,
+    ):
+        return None
+    job = SyncJob.objects.get(pk=job_id)
+    running = SyncJob.objects.filter(pk=job_id, status='running')
+
+    def report(done: int, total: int):
+        running.update(processed=done, total=total, updated_at=timezone.now())
+        if progress is not None:
+            progress(done, total)
+
+    try:
+        with _Heartbeat(job_id, interval=max(stale_after() / 4, 1)):
+            if job.kind == 'events':
+                stats = EventIndexer(service=service, chunk_size=chunk_size).run_once(progress=report)
+            else:
+                stats = FullSync(service=service, chunk_size=chunk_size).run(progress=report)
+    except Exception as e:
+        print(f"Sync job {job_id} failed: {e}")
+        running.update(status='failed', error=f"{type(e).__name__}: {e}"[:1000], finished_at=timezone.now())
+    else:
+        # Filtered on 'running', so a job expired in the meantime stays failed
+        if not running.update(status='succeeded', result=stats, finished_at=timezone.now()):
+            print(f"Sync job {job_id} finished after it was marked stale")
+    return SyncJob.objects.get(pk=job_id)
+
+
+class _Heartbeat:
+    """Touches a running job's updated_at every ``interval`` seconds, so a slow stage doesn't look dead"""
+
+    def __init__(self, job_id: int, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'sync-job-{job_id}-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    SyncJob.objects.filter(pk=self.job_id, status='running').update(updated_at=timezone.now())
+                except DatabaseError as e:
+                    print(f"Sync job {self.job_id} heartbeat failed: {e}")
+        finally:
+            connection.close()
+
+
+def job_status(job: SyncJob) -> Dict:
+    """Progress, rate and ETA of a job, as returned by the status endpoint"""
+    elapsed = None
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+    rate = job.processed / elapsed if elapsed and job.processed else None
+    remaining = job.total - job.processed if job.total is not None else None
+    eta = None
+    if job.status == 'running' and rate and remaining is not None:
+        eta = round(remaining / rate, 1)
+    elif job.status == 'succeeded':
+        eta = 0
+
+    return {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'message': _message(job),
+        'unit': job.unit,
+        'processed': job.processed,
+        'total': job.total,
+        'percent': round(job.processed / job.total * 100, 1) if job.total else None,
+        'rate_per_second': round(rate, 2) if rate else None,
+        'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+        'eta_seconds': eta,
+        'result': job.result,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def _message(job: SyncJob) -> str:
+    if job.status == 'failed':
+        return f'Sync failed: {job.error}'
+    if job.status != 'succeeded':
+        return f'Sync {job.status}'
+    result = job.result or {}
+    if job.kind == 'events':
+        return f"Indexed {result.get('events', 0)} events from blockchain"
+    return f"Successfully synced {result.get('created', 0)} produces from blockchain"
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...jobs import enqueue_sync, run_sync_job
+
+
+class Command(BaseCommand):
+    help = 'Full sync of every produce on the contract into Produce, in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Produce IDs per chunk')
+
+    def handle(self, *args, **options):
+        # Same per-contract lock as the API's sync jobs
+        job, created = enqueue_sync('full', start=False)
+        if not created:
+            raise CommandError(f"Sync job #{job.pk} ({job.kind}) is already {job.status}")
+
+        job = run_sync_job(
+            job.pk,
+            chunk_size=options['chunk_size'],
+            progress=lambda done, total: self.stdout.write(f"  {done}/{total}"),
+        )
+        if job.status != 'succeeded':
+            raise CommandError(f"Sync job #{job.pk} failed: {job.error}")
+
+        stats = job.result
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {stats['total_blockchain_produces']} produces in {stats['chunks']} chunks: "
+            f"{stats['created']} created, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed."
+        ))
+        for stage, seconds in stats['timings'].items():
+            self.stdout.write(f"  {stage:<14}{seconds * 1000:10.1f} ms")
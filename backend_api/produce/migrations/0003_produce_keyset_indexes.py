@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produce', '0002_syncjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='produce',
+            name='produce_pro_farmer__6fafca_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='produce',
+            name='produce_pro_is_sold_6325d9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='produce',
+            index=models.Index(fields=['created_at', 'id'], name='produce_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produce',
+            index=models.Index(fields=['price_per_unit', 'id'], name='produce_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produce',
+            index=models.Index(fields=['is_sold', 'created_at', 'id'], name='produce_sold_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produce',
+            index=models.Index(fields=['is_sold', 'price_per_unit', 'id'], name='produce_sold_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produce',
+            index=models.Index(fields=['farmer_address', 'created_at', 'id'], name='produce_farmer_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produce', '0003_produce_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produce',
+            name='is_confirmed',
+            field=models.BooleanField(default=True, help_text="False while the listing's block was reorged away and not seen again"),
+        ),
+    ]
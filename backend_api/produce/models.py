@@ -1,6 +1,11 @@
 from django.db import models
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 
+from .cache import bump_version
+
 
 class Produce(models.Model):
     """Model representing agricultural produce listings"""
@@ -21,6 +26,9 @@ class Produce(models.Model):
 
     # Status
     is_sold = models.BooleanField(default=False)
+    is_confirmed = models.BooleanField(
+        default=True, help_text="False while the listing's block was reorged away and not seen again",
+    )
 
     # Timestamps
     listed_timestamp = models.DateTimeField(help_text="When produce was listed on blockchain")
@@ -36,10 +44,15 @@ class Produce(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Composite indexes for the keyset pagination (produce.pagination):
+        # each serves one filter plus one (sort column, id) order
         indexes = [
             models.Index(fields=['blockchain_id']),
-            models.Index(fields=['farmer_address']),
-            models.Index(fields=['is_sold']),
+            models.Index(fields=['created_at', 'id'], name='produce_created_id_idx'),
+            models.Index(fields=['price_per_unit', 'id'], name='produce_price_id_idx'),
+            models.Index(fields=['is_sold', 'created_at', 'id'], name='produce_sold_created_id_idx'),
+            models.Index(fields=['is_sold', 'price_per_unit', 'id'], name='produce_sold_price_id_idx'),
+            models.Index(fields=['farmer_address', 'created_at', 'id'], name='produce_farmer_created_id_idx'),
         ]
 
     def __str__(self):
@@ -79,3 +92,60 @@ class ProduceImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.produce.name}"
+
+
+@receiver([post_save, post_delete], sender=Produce)
+@receiver([post_save, post_delete], sender=ProduceImage)
+@receiver([post_save, post_delete], sender=ProduceCategory)
+def bump_marketplace_version(sender, **kwargs):
+    """Invalidate the cached marketplace responses (produce.cache)"""
+    bump_version()
+
+
+class SyncJob(models.Model):
+    """A sync_from_blockchain run, executed in the background (see produce.jobs)"""
+
+    KIND_CHOICES = [
+        ('events', 'Index new events'),
+        ('full', 'Full sync'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    contract_address = models.CharField(max_length=42)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+
+    # Progress, in blocks for event syncs and produce IDs for full syncs
+    unit = models.CharField(max_length=10)
+    processed = models.PositiveBigIntegerField(default=0)
+    total = models.PositiveBigIntegerField(null=True, blank=True)
+
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # The lock: at most one queued or running job per contract
+            models.UniqueConstraint(
+                fields=['contract_address'],
+                condition=Q(status__in=['queued', 'running']),
+                name='one_active_sync_job_per_contract',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} sync #{self.pk} ({self.status})"
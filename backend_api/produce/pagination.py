@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination for produce listings
+
+PageNumberPagination runs a COUNT(*) and an OFFSET scan for every page, so
+deep pages get slower as listings grow. ProduceCursorPagination orders by a
+sort column plus ``id`` as tie-breaker and encodes the last row's
+(value, id) in an opaque cursor; the next page is the rows strictly after
+that pair, which the composite indexes on Produce serve with one range scan
+whatever the depth. Unlike DRF's CursorPagination it needs no offset to skip
+rows that share a sort value (many lots are listed at the same price).
+"""
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProduceCursorPagination(BasePagination):
+    """Cursor pagination on (created_at, id) or (price_per_unit, id)"""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+
+    # ?ordering= value -> (field, descending)
+    orderings = {
+        '-created_at': ('created_at', True),
+        'created_at': ('created_at', False),
+        'price': ('price_per_unit', False),
+        '-price': ('price_per_unit', True),
+    }
+    default_ordering = '-created_at'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+        if self.ordering not in self.orderings:
+            self.ordering = self.default_ordering
+        self.field, descending = self.orderings[self.ordering]
+
+        cursor = self.decode_cursor(request)
+        # A "previous" cursor walks backwards: flip the order, then flip the page back
+        reverse = cursor is not None and cursor['r']
+        self.descending = descending != reverse
+
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor['v'], cursor['id']))
+
+        # One extra row tells whether there is another page
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_row = None
+        self.previous_row = None
+        if rows:
+            if has_more or reverse:
+                self.next_row = rows[-1]
+            if cursor is not None and (has_more or not reverse):
+                self.previous_row = rows[0]
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def after(self, value, row_id):
+        """
+        Rows strictly after (value, row_id) in the current direction
+
+        Written as ``field <= value AND (field < value OR id < row_id)``
+        rather than a plain OR, so the leading range is a seek on the index.
+        """
+        lookup = 'lt' if self.descending else 'gt'
+        return Q(**{f'{self.field}__{lookup}e': value}) & (
+            Q(**{f'{self.field}__{lookup}': value}) | Q(**{f'id__{lookup}': row_id})
+        )
+
+    def get_next_link(self):
+        if self.next_row is None:
+            return None
+        return self.encode_cursor(self.next_row, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_row is None:
+            return None
+        return self.encode_cursor(self.previous_row, reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        payload = {
+            'v': value.isoformat() if isinstance(value, datetime) else str(value),
+            'id': row.pk,
+            'r': reverse,
+        }
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if self.field == 'created_at':
+                payload['v'] = datetime.fromisoformat(payload['v'])
+            else:
+                payload['v'] = Decimal(payload['v'])
+            payload['id'] = int(payload['id'])
+            payload['r'] = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+        return payload
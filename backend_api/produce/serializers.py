@@ -40,12 +40,12 @@ class ProduceSerializer(serializers.ModelSerializer):
             'price_per_unit_eth', 'total_price_eth',
             'farmer_address', 'buyer_address',
             'farmer_username', 'buyer_username',
-            'is_sold', 'listed_timestamp', 'sold_timestamp',
+            'is_sold', 'is_confirmed', 'listed_timestamp', 'sold_timestamp',
             'created_at', 'updated_at', 'images'
         ]
         read_only_fields = [
             'id', 'blockchain_id', 'contract_address', 'buyer_address',
-            'is_sold', 'listed_timestamp', 'sold_timestamp',
+            'is_sold', 'is_confirmed', 'listed_timestamp', 'sold_timestamp',
             'created_at', 'updated_at', 'farmer_username', 'buyer_username'
         ]
 
@@ -54,7 +54,8 @@ class ProduceCreateSerializer(serializers.Serializer):
     """Serializer for creating new produce listings"""
     
     name = serializers.CharField(max_length=100)
-    quantity = serializers.IntegerField(min_value=1)
+    # The contract stores quantities in 128 bits
+    quantity = serializers.IntegerField(min_value=1, max_value=2**128 - 1)
     price_per_unit_eth = serializers.DecimalField(max_digits=10, decimal_places=6, min_value=0.000001)
     
     def validate_name(self, value):
@@ -73,6 +74,12 @@ class ProduceCreateSerializer(serializers.Serializer):
         return value
 
 
+class ProduceBulkCreateSerializer(serializers.Serializer):
+    """Serializer for listing several lots in one listProduceBatch transaction"""
+
+    items = ProduceCreateSerializer(many=True, min_length=1, max_length=50)
+
+
 class ProducePurchaseSerializer(serializers.Serializer):
     """Serializer for purchasing produce"""
     
@@ -96,6 +103,6 @@ class ProduceListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'blockchain_id', 'name', 'quantity',
             'price_per_unit_eth', 'total_price_eth',
-            'farmer_address', 'farmer_username', 'is_sold',
+            'farmer_address', 'farmer_username', 'is_sold', 'is_confirmed',
             'listed_timestamp', 'created_at'
         ]
@@ -0,0 +1,129 @@
+"""
+Full sync of Produce rows from the contract
+
+Walks every produce ID in chunks instead of one query and one create per
+produce: the known IDs (and their sold flag) are loaded in one query, each
+chunk's sold flags come from getSoldBitmap and the details of new or changed
+produces from getProduceDetailsBatch, and each chunk is written with a single
+upsert in its own transaction. Rows that already exist are refreshed when
+their sold status changed on chain. Everything is read CONFIRMATIONS blocks
+behind the head, like the event indexer, since the upsert marks rows confirmed.
+"""
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from blockchain.indexer import produce_from_details
+from blockchain.services import get_web3_service
+
+from .cache import bump_version
+from .models import Produce
+
+UPSERT_FIELDS = [
+    'contract_address', 'name', 'quantity', 'price_per_unit', 'total_price', 'farmer_address',
+    'buyer_address', 'is_sold', 'is_confirmed', 'listed_timestamp', 'sold_timestamp', 'updated_at',
+]
+
+
+class FullSync:
+    """Bring Produce in line with every produce on the contract"""
+
+    def __init__(self, service=None, chunk_size: Optional[int] = None):
+        self.service = service or get_web3_service()
+        self.chunk_size = chunk_size or settings.BLOCKCHAIN_CONFIG.get('SYNC_CHUNK_SIZE', 1000)
+        self.confirmations = settings.BLOCKCHAIN_CONFIG.get('CONFIRMATIONS', 0)
+        self.timings = defaultdict(float)
+
+    def run(self, progress=None) -> Dict:
+        """
+        Sync all produces; ``progress(done, total)`` is called after each chunk
+
+        Returns counts plus the seconds spent in each stage.
+        """
+        self.timings.clear()
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'chunks': 0}
+
+        with self._stage('count'):
+            head = self.service.read_cache.head_block()
+            block = None if head is None else max(head - self.confirmations, 0)
+            total = self.service.get_total_produces(block)
+        with self._stage('load_known'):
+            # Unconfirmed rows (rolled back by the indexer) map to None, so
+            # they are refetched and confirmed if the contract has them
+            known = {
+                produce_id: is_sold if is_confirmed else None
+                for produce_id, is_sold, is_confirmed in Produce.objects.filter(
+                    blockchain_id__lte=total,
+                ).values_list('blockchain_id', 'is_sold', 'is_confirmed')
+            }
+
+        for start in range(1, total + 1, self.chunk_size):
+            count = min(self.chunk_size, total + 1 - start)
+            self.sync_chunk(start, count, known, stats, block)
+            stats['chunks'] += 1
+            if progress is not None:
+                progress(start + count - 1, total)
+
+        stats['total_blockchain_produces'] = total
+        stats['timings'] = {stage: round(seconds, 4) for stage, seconds in self.timings.items()}
+        return stats
+
+    def sync_chunk(self, start: int, count: int, known: Dict[int, Optional[bool]], stats: Dict,
+                   block: Optional[int] = None):
+        with self._stage('fetch_sold'):
+            chain_sold = self.service.get_sold_ids(start, count, 'latest' if block is None else block)
+
+        new_ids = []
+        changed_ids = []
+        for produce_id in range(start, start + count):
+            if produce_id not in known:
+                new_ids.append(produce_id)
+            elif known[produce_id] != (produce_id in chain_sold):
+                changed_ids.append(produce_id)
+        stats['unchanged'] += count - len(new_ids) - len(changed_ids)
+        if not new_ids and not changed_ids:
+            return
+
+        with self._stage('fetch_details'):
+            details = self.service.get_produce_details_many(new_ids + changed_ids, block=block)
+
+        with self._stage('build'):
+            produces = []
+            for produce_id in new_ids + changed_ids:
+                data = details.get(produce_id)
+                if not data:
+                    stats['failed'] += 1
+                    continue
+                produces.append(produce_from_details(data, self.service.contract_address))
+                stats['created' if produce_id not in known else 'updated'] += 1
+
+        with self._stage('write'), transaction.atomic():
+            Produce.objects.bulk_create(
+                produces,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['blockchain_id'],
+                update_fields=UPSERT_FIELDS,
+            )
+            # bulk_create sends no post_save
+            bump_version()
+
+    def _stage(self, name: str):
+        return _Timer(self.timings, name)
+
+
+class _Timer:
+    """Adds the time spent in a ``with`` block to timings[name]"""
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings[self.name] += time.perf_counter() - self.start
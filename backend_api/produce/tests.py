@@ -1,3 +1,497 @@
-from django.test import TestCase
+import io
+from contextlib import redirect_stdout
+from datetime import timedelta
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blockchain.indexer import produce_from_details
+from blockchain.models import OutboxTransaction
+from blockchain.services import Web3Service
+
+from . import cache as marketplace_cache
+from .jobs import _Heartbeat, enqueue_sync, run_sync_job
+from .models import Produce, ProduceCategory, ProduceImage, SyncJob
+from .sync import FullSync
+
+FARMER = '0x70997970C51812dc3A010C7d01b50e0d17dc79C8'
+BUYER = '0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# Tests that read the cached list endpoints get a private, empty cache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class AsyncProduceViewTests(TestCase):
+
+    async def test_create_validates_before_touching_the_chain(self):
+        with mock.patch('produce.async_views.get_async_web3_service') as get_service:
+            response = await self.async_client.post(
+                '/api/async/produces/', {'name': ' ', 'quantity': 0}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+        get_service.assert_not_called()
+
+    async def test_create_queues_in_the_outbox(self):
+        with mock.patch('produce.async_views.get_async_web3_service') as get_service:
+            response = await self.async_client.post(
+                '/api/async/produces/',
+                {'name': 'Maize', 'quantity': 5, 'price_per_unit_eth': '0.001'},
+                content_type='application/json',
+            )
+        get_service.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        outbox_id = response.json()['outbox_id']
+        self.assertEqual(response.json()['status_url'], f'http://testserver/api/produces/outbox/{outbox_id}/')
+
+        entry = await OutboxTransaction.objects.aget(pk=outbox_id)
+        self.assertEqual((entry.transaction_type, entry.status), ('list_produce', 'queued'))
+        self.assertEqual(entry.payload, {'name': 'Maize', 'quantity': 5, 'price_per_unit': str(10**15)})
+
+    async def test_purchase_refuses_listings_off_the_canonical_chain(self):
+        produce = produce_from_details(produce_details(1), FakeChainService.contract_address)
+        produce.is_confirmed = False
+        await produce.asave()
+        with mock.patch('produce.async_views.get_async_web3_service') as get_service:
+            response = await self.async_client.post(
+                f'/api/async/produces/{produce.pk}/purchase/', {}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'This listing is not on the canonical chain'})
+        get_service.assert_not_called()
+
+
+class ProduceOutboxViewTests(TestCase):
+
+    def test_create_queues_without_touching_the_chain(self):
+        with mock.patch('blockchain.services.get_web3_service') as get_service:
+            response = self.client.post(
+                '/api/produces/',
+                {'name': 'Maize', 'quantity': 5, 'price_per_unit_eth': '0.001'},
+                content_type='application/json',
+            )
+        get_service.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+
+        entry = OutboxTransaction.objects.get(pk=response.json()['outbox_id'])
+        self.assertEqual(entry.status, 'queued')
+        self.assertEqual(entry.payload, {'name': 'Maize', 'quantity': 5, 'price_per_unit': str(10**15)})
+
+        self.assertEqual(response.json()['status_url'], f"http://testserver/api/produces/outbox/{entry.id}/")
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'queued')
+        self.assertIsNone(status['transaction_hash'])
+
+    def test_bulk_create_queues_one_batch(self):
+        response = self.client.post(
+            '/api/produces/bulk/',
+            {'items': [
+                {'name': 'Maize', 'quantity': 5, 'price_per_unit_eth': '0.001'},
+                {'name': 'Beans', 'quantity': 2, 'price_per_unit_eth': '0.002'},
+            ]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['status_url'].endswith(f"/api/produces/outbox/{response.json()['outbox_id']}/"))
+
+        entry = OutboxTransaction.objects.get(pk=response.json()['outbox_id'])
+        self.assertEqual(entry.transaction_type, 'list_produce_batch')
+        self.assertEqual([item['price_per_unit'] for item in entry.payload['items']], [str(10**15), str(2 * 10**15)])
+
+    def test_bulk_create_rejects_oversized_batch(self):
+        items = [{'name': f'Lot {i}', 'quantity': 1, 'price_per_unit_eth': '0.001'} for i in range(51)]
+        response = self.client.post('/api/produces/bulk/', {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboxTransaction.objects.exists())
+
+
+def produce_details(produce_id, is_sold=False):
+    return {
+        'id': produce_id, 'farmer': FARMER, 'name': f'Lot {produce_id}', 'quantity': 10,
+        'price_per_unit': 1000, 'total_price': 10000, 'is_sold': is_sold,
+        'buyer': BUYER if is_sold else ZERO_ADDRESS, 'listed_timestamp': 1700000000,
+        'sold_timestamp': 1700000600 if is_sold else 0,
+    }
+
+
+class FakeChainService:
+    """The slice of Web3Service FullSync uses, over an in-memory chain"""
+
+    contract_address = '0x5FbDB2315678afecb367f032d93F642f64180aa3'
+
+    def __init__(self, total, sold):
+        self.total = total
+        self.sold = set(sold)
+        self.read_cache = mock.Mock(head_block=mock.Mock(return_value=100))
+        self.detail_requests = []
+        self.blocks_read = set()
+
+    def get_total_produces(self, block=None):
+        self.blocks_read.add(block)
+        return self.total
+
+    def get_sold_ids(self, start_id, count, block_identifier='latest'):
+        self.blocks_read.add(block_identifier)
+        return {produce_id for produce_id in self.sold if start_id <= produce_id < start_id + count}
+
+    def get_produce_details_many(self, produce_ids, chunk_size=None, block=None):
+        self.blocks_read.add(block)
+        self.detail_requests.append(list(produce_ids))
+        return {produce_id: produce_details(produce_id, produce_id in self.sold) for produce_id in produce_ids}
+
+
+class FullSyncTests(TestCase):
+
+    def test_creates_missing_and_refreshes_sold_status(self):
+        # 1 and 2 are stored as unsold, but 2 sold on chain since
+        Produce.objects.bulk_create([
+            produce_from_details(produce_details(produce_id), FakeChainService.contract_address)
+            for produce_id in (1, 2)
+        ])
+        service = FakeChainService(total=5, sold={2, 4})
+
+        stats = FullSync(service=service, chunk_size=2).run()
+
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (3, 1, 1))
+        self.assertEqual(stats['chunks'], 3)
+        self.assertEqual(service.detail_requests, [[2], [3, 4], [5]])
+        self.assertEqual(Produce.objects.count(), 5)
+        sold = Produce.objects.get(blockchain_id=2)
+        self.assertTrue(sold.is_sold)
+        self.assertEqual(sold.buyer_address, BUYER)
+        self.assertEqual(
+            list(Produce.objects.filter(is_sold=True).order_by('blockchain_id').values_list('blockchain_id', flat=True)),
+            [2, 4],
+        )
+        self.assertTrue({'count', 'load_known', 'fetch_sold', 'fetch_details', 'write'} <= set(stats['timings']))
+
+    def test_confirms_rows_the_indexer_rolled_back(self):
+        produce = produce_from_details(produce_details(1), FakeChainService.contract_address)
+        produce.is_confirmed = False
+        produce.save()
+
+        stats = FullSync(service=FakeChainService(total=1, sold=())).run()
+        self.assertEqual(stats['updated'], 1)
+        self.assertTrue(Produce.objects.get(blockchain_id=1).is_confirmed)
+
+    @override_settings(BLOCKCHAIN_CONFIG={'CONFIRMATIONS': 5})
+    def test_reads_behind_the_head_by_the_confirmation_depth(self):
+        service = FakeChainService(total=3, sold={2})
+        FullSync(service=service).run()
+        # The upsert marks rows confirmed, so nothing may be read at the tip
+        self.assertEqual(service.blocks_read, {95})
+
+    def test_writes_in_bulk(self):
+        service = FakeChainService(total=600, sold=range(1, 600, 3))
+        with CaptureQueriesContext(connection) as context:
+            FullSync(service=service, chunk_size=300).run()
+        self.assertEqual(Produce.objects.count(), 600)
+        # One query for the known IDs, then multi-row upserts per chunk (SQLite's
+        # variable limit splits them at ~60 rows) instead of two queries per produce
+        inserts = [query for query in context.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertLessEqual(len(inserts), 12)
+        self.assertLessEqual(len(context.captured_queries) - len(inserts), 1 + 2 * 2)
+
+        # A second run with nothing new only reads the known IDs
+        with CaptureQueriesContext(connection) as context:
+            stats = FullSync(service=service, chunk_size=300).run()
+        self.assertEqual(stats['unchanged'], 600)
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+class SyncJobTests(TestCase):
+
+    def test_sync_is_queued_once_per_contract(self):
+        with mock.patch('produce.jobs.start_sync_job') as start:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post('/api/produces/sync_from_blockchain/?full=true')
+            with self.captureOnCommitCallbacks(execute=True):
+                second = self.client.post('/api/produces/sync_from_blockchain/')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.json()['job_id'], first.json()['job_id'])
+        self.assertEqual(second.json()['kind'], 'full')
+        self.assertTrue(first.json()['status_url'].endswith(f"/api/produces/sync-jobs/{first.json()['job_id']}/"))
+        start.assert_called_once_with(first.json()['job_id'])
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+    def test_job_reports_progress_and_counts(self):
+        job, _ = enqueue_sync('full', start=False)
+        service = FakeChainService(total=5, sold={4})
+        reported = []
+        original = FullSync.sync_chunk
+
+        def sync_chunk(sync, *args):
+            reported.append(SyncJob.objects.get(pk=job.pk).processed)
+            return original(sync, *args)
+
+        with mock.patch.object(FullSync, 'sync_chunk', sync_chunk), \
+                self.settings(BLOCKCHAIN_CONFIG={'SYNC_CHUNK_SIZE': 2}):
+            run_sync_job(job.pk, service=service)
+        self.assertEqual(reported, [0, 2, 4])
+
+        status = self.client.get(f'/api/produces/sync-jobs/{job.pk}/').json()
+        self.assertEqual(status['status'], 'succeeded')
+        self.assertEqual((status['processed'], status['total'], status['percent']), (5, 5, 100.0))
+        self.assertEqual(status['eta_seconds'], 0)
+        self.assertEqual(status['result']['created'], 5)
+        self.assertEqual(status['message'], 'Successfully synced 5 produces from blockchain')
+
+        # The finished job no longer blocks a new one
+        self.assertTrue(enqueue_sync('events', start=False)[1])
+
+    def test_failed_job_records_error(self):
+        job, _ = enqueue_sync('full', start=False)
+        service = FakeChainService(total=5, sold=())
+        service.get_sold_ids = mock.Mock(side_effect=ConnectionError('node down'))
+        run_sync_job(job.pk, service=service)
+
+        status = self.client.get(f'/api/produces/sync-jobs/{job.pk}/').json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(status['error'], 'ConnectionError: node down')
+        # Already claimed, so it won't run twice
+        self.assertIsNone(run_sync_job(job.pk, service=service))
+
+    def test_failed_count_fails_the_job(self):
+        job, _ = enqueue_sync('full', start=False)
+        service = FakeChainService(total=5, sold=())
+        # The real count, over a contract whose call fails
+        service.contract = mock.Mock()
+        service.contract.functions.getTotalProduces.return_value.call.side_effect = ConnectionError('node down')
+        service.get_total_produces = partial(Web3Service.get_total_produces, service)
+        with redirect_stdout(io.StringIO()):
+            run_sync_job(job.pk, service=service)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'ConnectionError: node down'))
+        self.assertFalse(Produce.objects.exists())
+
+    def test_stale_job_releases_the_lock(self):
+        job, _ = enqueue_sync('events', start=False)
+        SyncJob.objects.filter(pk=job.pk).update(status='running', updated_at=timezone.now() - timedelta(hours=1))
+        new_job, created = enqueue_sync('events', start=False)
+        self.assertTrue(created)
+        self.assertEqual(SyncJob.objects.get(pk=job.pk).status, 'failed')
+        self.assertNotEqual(new_job.pk, job.pk)
+
+    def test_claim_and_heartbeat_touch_updated_at(self):
+        job, _ = enqueue_sync('full', start=False)
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        SyncJob.objects.filter(pk=job.pk).update(updated_at=an_hour_ago)
+        claimed_at = []
+
+        def run(sync, progress=None):
+            claimed_at.append(SyncJob.objects.get(pk=job.pk).updated_at)
+            SyncJob.objects.filter(pk=job.pk).update(updated_at=an_hour_ago)
+            heartbeat = _Heartbeat(job.pk, interval=0)
+            heartbeat._stop.wait = mock.Mock(side_effect=[False, True])
+            heartbeat._beat()
+            return {'created': 0}
+
+        with mock.patch.object(FullSync, 'run', run):
+            run_sync_job(job.pk, service=FakeChainService(total=0, sold=()))
+        self.assertGreater(claimed_at[0], an_hour_ago)
+        self.assertGreater(SyncJob.objects.get(pk=job.pk).updated_at, an_hour_ago)
+
+    def test_expired_job_stays_failed(self):
+        job, _ = enqueue_sync('full', start=False)
+
+        def run(sync, progress=None):
+            # Another process judged the job dead while it was still working
+            SyncJob.objects.filter(pk=job.pk).update(status='failed', error='Stopped reporting progress')
+            return {'created': 0}
+
+        with mock.patch.object(FullSync, 'run', run):
+            job = run_sync_job(job.pk, service=FakeChainService(total=0, sold=()))
+        self.assertEqual((job.status, job.error, job.result), ('failed', 'Stopped reporting progress', None))
+
+    def test_commands_take_the_sync_lock(self):
+        active, _ = enqueue_sync('events', start=False)
+        for command, module in (('sync_produces', 'produce'), ('index_events', 'blockchain')):
+            with mock.patch(f'{module}.management.commands.{command}.run_sync_job') as run, \
+                    self.assertRaisesMessage(CommandError, f'Sync job #{active.pk} (events) is already queued'):
+                call_command(command)
+            run.assert_not_called()
+
+    def test_sync_command_runs_as_a_job(self):
+        with mock.patch('produce.sync.get_web3_service', return_value=FakeChainService(total=3, sold=())):
+            call_command('sync_produces', stdout=mock.Mock())
+        job = SyncJob.objects.get()
+        self.assertEqual((job.kind, job.status, job.result['created']), ('full', 'succeeded', 3))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProduceCursorPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Ten lots sharing one created_at and few prices, so the id tie-breaker matters
+        now = timezone.now()
+        Produce.objects.bulk_create([
+            produce_from_details(produce_details(produce_id), FakeChainService.contract_address)
+            for produce_id in range(1, 31)
+        ])
+        Produce.objects.filter(blockchain_id__lte=10).update(created_at=now)
+        for produce in Produce.objects.all():
+            produce.price_per_unit = 1000 * (produce.blockchain_id % 3 + 1)
+            produce.is_sold = produce.blockchain_id % 4 == 0
+            produce.save(update_fields=['price_per_unit', 'is_sold'])
+
+    def walk(self, url):
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen += [item['blockchain_id'] for item in data['results']]
+            url = data['next']
+        return seen
+
+    def test_walks_every_row_once_in_order(self):
+        expected = list(Produce.objects.order_by('-created_at', '-id').values_list('blockchain_id', flat=True))
+        self.assertEqual(self.walk('/api/produces/?page_size=7'), expected)
+
+        by_price = list(Produce.objects.filter(is_sold=False).order_by('price_per_unit', 'id')
+                        .values_list('blockchain_id', flat=True))
+        self.assertEqual(self.walk('/api/produces/available/?ordering=price&page_size=4'), by_price)
+
+    def test_list_reports_unconfirmed_listings(self):
+        Produce.objects.filter(blockchain_id=1).update(is_confirmed=False)
+        results = self.client.get('/api/produces/?page_size=30').json()['results']
+        unconfirmed = [item['blockchain_id'] for item in results if not item['is_confirmed']]
+        self.assertEqual(unconfirmed, [1])
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get('/api/produces/?ordering=-price&page_size=8').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertEqual(self.client.get(back['next']).json()['results'], second['results'])
+
+    def test_deep_page_is_one_range_query(self):
+        url = '/api/produces/?page_size=5'
+        for _ in range(4):
+            url = self.client.get(url).json()['next']
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertEqual(len(context.captured_queries), 1)
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('COUNT', sql)
+        self.assertNotIn('OFFSET', sql)
+        if connection.vendor == 'sqlite':
+            # The cursor is a range seek on (created_at, id), not a scan from the top
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('SEARCH produce_produce USING INDEX produce_created_id_idx (created_at<?)', plan)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/produces/?cursor=not-a-cursor').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MarketplaceResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            produce_from_details(produce_details(1), FakeChainService.contract_address).save()
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get('/api/produces/available/')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get('/api/produces/available/')
+            not_modified = self.client.get('/api/produces/available/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+    def test_writes_invalidate_the_cache(self):
+        etag = self.client.get('/api/produces/')['ETag']
+        categories_etag = self.client.get('/api/categories/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Produce.objects.filter(blockchain_id=1).get().delete()
+        response = self.client.get('/api/produces/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProduceCategory.objects.create(name='Grains')
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=categories_etag).status_code, 200)
+
+    def test_bulk_sync_invalidates_the_cache(self):
+        version = marketplace_cache.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            FullSync(service=FakeChainService(total=3, sold=()), chunk_size=2).run()
+        self.assertGreater(marketplace_cache.get_version(), version)
+        self.assertEqual(len(self.client.get('/api/produces/').json()['results']), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTests(TestCase):
+    """
+    Maximum queries per endpoint, whatever the number of rows
+
+    A serializer field that reaches a relation the viewset doesn't load
+    adds a query per row and fails these at 20 and 1000 rows.
+    """
+
+    # endpoint -> max queries for one response
+    BUDGETS = {
+        '/api/produces/': 1,
+        '/api/produces/available/': 1,
+        '/api/produces/?farmer=' + FARMER.lower(): 1,
+        '/api/produces/{pk}/': 2,  # the produce with its users, then its images
+        '/api/categories/': 2,  # page count, then the page
+    }
+
+    def create_rows(self, count):
+        farmer = User.objects.create(username='farmer')
+        buyer = User.objects.create(username='buyer')
+        produces = []
+        for produce_id in range(1, count + 1):
+            details = produce_details(produce_id, is_sold=produce_id % 2 == 0)
+            produce = produce_from_details(details, FakeChainService.contract_address)
+            produce.farmer_address = FARMER.lower()
+            produce.farmer_user = farmer
+            produce.buyer_user = buyer if produce.is_sold else None
+            produces.append(produce)
+        produces = Produce.objects.bulk_create(produces)
+        ProduceImage.objects.bulk_create([
+            ProduceImage(produce=produces[0], image=f'produce_images/lot-{i}.jpg') for i in range(3)
+        ])
+        ProduceCategory.objects.bulk_create([ProduceCategory(name=f'Category {i}') for i in range(min(count, 50))])
+        return produces[0]
+
+    def assert_budgets(self, rows):
+        produce = self.create_rows(rows)
+        for url, budget in self.BUDGETS.items():
+            url = url.format(pk=produce.pk)
+            with self.subTest(url=url, rows=rows):
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(context.captured_queries), budget, '\n'.join(
+                    query['sql'] for query in context.captured_queries
+                ))
+
+    def test_one_row(self):
+        self.assert_budgets(1)
+
+    def test_twenty_rows(self):
+        self.assert_budgets(20)
+
+    def test_thousand_rows(self):
+        self.assert_budgets(1000)
@@ -3,6 +3,7 @@ URL configuration for the produce app
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import ProduceViewSet, ProduceCategoryViewSet
 
 router = DefaultRouter()
@@ -11,4 +12,9 @@ router.register(r'categories', ProduceCategoryViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+
+    # Async variants of the RPC-bound endpoints (non-blocking under ASGI)
+    path('async/produces/', async_views.create_produce, name='async-produce-create'),
+    path('async/produces/<int:pk>/purchase/', async_views.purchase_produce, name='async-produce-purchase'),
+    path('async/produces/sync_from_blockchain/', async_views.sync_from_blockchain, name='async-produce-sync'),
 ]
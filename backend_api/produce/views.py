@@ -1,42 +1,51 @@
 """
 API views for the produce app
 """
-from datetime import datetime
 from decimal import Decimal
 
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
-from .models import Produce, ProduceCategory
+from .cache import MarketplaceCacheMixin
+from .jobs import enqueue_sync, job_status
+from .models import Produce, ProduceCategory, SyncJob
+from .pagination import ProduceCursorPagination
 from .serializers import (
-    ProduceSerializer, ProduceListSerializer, ProduceCreateSerializer,
+    ProduceSerializer, ProduceListSerializer, ProduceCreateSerializer, ProduceBulkCreateSerializer,
     ProducePurchaseSerializer, ProduceCategorySerializer
 )
+from blockchain.models import OutboxTransaction
 from blockchain.services import web3_service
 
 
-class ProduceCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class ProduceCategoryViewSet(MarketplaceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for produce categories"""
 
     queryset = ProduceCategory.objects.all()
     serializer_class = ProduceCategorySerializer
     permission_classes = [AllowAny]
+    cached_actions = ('list',)
 
 
-class ProduceViewSet(viewsets.ModelViewSet):
+class ProduceViewSet(MarketplaceCacheMixin, viewsets.ModelViewSet):
     """ViewSet for produce listings"""
 
     queryset = Produce.objects.all()
     permission_classes = [AllowAny]  # For now, allow all access
+    pagination_class = ProduceCursorPagination
+    cached_actions = ('list', 'available')
 
     def get_serializer_class(self):
         if self.action == 'list':
             return ProduceListSerializer
         elif self.action == 'create':
             return ProduceCreateSerializer
+        elif self.action == 'bulk_create':
+            return ProduceBulkCreateSerializer
         elif self.action == 'purchase':
             return ProducePurchaseSerializer
         return ProduceSerializer
@@ -44,56 +53,103 @@ class ProduceViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Produce.objects.all()
 
+        # Load what each action's serializer reads, instead of a query per row
+        if self.action in ('list', 'available'):
+            queryset = queryset.select_related('farmer_user')
+        elif self.action in ('retrieve', 'update', 'partial_update'):
+            queryset = queryset.select_related('farmer_user', 'buyer_user').prefetch_related('images')
+
         # Filter by availability
         is_available = self.request.query_params.get('available', None)
         if is_available is not None:
             if is_available.lower() == 'true':
-                queryset = queryset.filter(is_sold=False)
+                queryset = queryset.filter(is_sold=False, is_confirmed=True)
             elif is_available.lower() == 'false':
                 queryset = queryset.filter(is_sold=True)
 
         # Filter by farmer
         farmer_address = self.request.query_params.get('farmer', None)
         if farmer_address:
-            farmer_address = farmer_address.lower()
-            print(f"[DEBUG] Filtering produces for farmer_address: {farmer_address}")
-            queryset = queryset.filter(farmer_address=farmer_address)
-            print(f"[DEBUG] Found {queryset.count()} produces for farmer_address: {farmer_address}")
-            for p in queryset:
-                print(f"[DEBUG] Produce: {p.name}, Farmer Address: {p.farmer_address}")
+            queryset = queryset.filter(farmer_address=farmer_address.lower())
 
         return queryset.order_by('-created_at')
 
     def create(self, request):
-        """Create a new produce listing on the blockchain"""
+        """
+        Queue a new produce listing for the blockchain
+
+        The transaction is signed and sent by the outbox dispatcher
+        (``manage.py dispatch_outbox``); poll ``outbox/<id>/`` for its hash.
+        """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         # Convert ETH to wei
         price_per_unit_wei = int(serializer.validated_data['price_per_unit_eth'] * 10**18)
 
-        # List produce on blockchain
-        tx_hash = web3_service.list_produce(
-            produce_name=serializer.validated_data['name'],
-            quantity=serializer.validated_data['quantity'],
-            price_per_unit=price_per_unit_wei
+        entry = OutboxTransaction.objects.create(
+            transaction_type='list_produce',
+            payload={
+                'name': serializer.validated_data['name'],
+                'quantity': serializer.validated_data['quantity'],
+                # Wei amounts can exceed the 64-bit integers JSON columns store
+                'price_per_unit': str(price_per_unit_wei),
+            },
         )
 
-        if not tx_hash:
-            return Response(
-                {'error': 'Failed to list produce on blockchain'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return Response(
+            {
+                'message': 'Produce listing queued for the blockchain',
+                'outbox_id': entry.id,
+                'status': entry.status,
+                'status_url': reverse('produce-outbox', kwargs={'outbox_id': entry.id}, request=request),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Queue up to 50 lots to be listed in a single listProduceBatch transaction"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        entry = OutboxTransaction.objects.create(
+            transaction_type='list_produce_batch',
+            payload={
+                'items': [
+                    {
+                        'name': item['name'],
+                        'quantity': item['quantity'],
+                        'price_per_unit': str(int(item['price_per_unit_eth'] * 10**18)),
+                    }
+                    for item in serializer.validated_data['items']
+                ],
+            },
+        )
 
         return Response(
             {
-                'message': 'Produce listing submitted to blockchain',
-                'transaction_hash': tx_hash,
-                'status': 'pending'
+                'message': f"{len(serializer.validated_data['items'])} produce listings queued for the blockchain",
+                'outbox_id': entry.id,
+                'status': entry.status,
+                'status_url': reverse('produce-outbox', kwargs={'outbox_id': entry.id}, request=request),
             },
-            status=status.HTTP_201_CREATED
+            status=status.HTTP_202_ACCEPTED
         )
 
+    @action(detail=False, methods=['get'], url_path=r'outbox/(?P<outbox_id>\d+)', url_name='outbox')
+    def outbox(self, request, outbox_id=None):
+        """Dispatch status of a queued listing"""
+        entry = get_object_or_404(OutboxTransaction.objects.select_related('transaction'), pk=outbox_id)
+        return Response({
+            'outbox_id': entry.id,
+            'status': entry.status,
+            'attempts': entry.attempts,
+            'error': entry.last_error or None,
+            'transaction_hash': entry.transaction.transaction_hash if entry.transaction else None,
+            'transaction_status': entry.transaction.status if entry.transaction else None,
+        })
+
     @action(detail=True, methods=['post'])
     def purchase(self, request, pk=None):
         """Purchase a produce item"""
@@ -104,6 +160,11 @@ class ProduceViewSet(viewsets.ModelViewSet):
                 {'error': 'This produce has already been sold'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not produce.is_confirmed:
+            return Response(
+                {'error': 'This listing is not on the canonical chain'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -137,57 +198,36 @@ class ProduceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def available(self, request):
-        """Get all available (unsold) produces"""
-        available_produces = self.get_queryset().filter(is_sold=False)
-        serializer = ProduceListSerializer(available_produces, many=True)
-        return Response(serializer.data)
+        """Get all available (unsold) produces, a page at a time"""
+        page = self.paginate_queryset(self.get_queryset().filter(is_sold=False, is_confirmed=True))
+        serializer = ProduceListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def sync_from_blockchain(self, request):
-        """Sync produce data from blockchain"""
-        try:
-            # Get total produces from blockchain
-            total_produces = web3_service.get_total_produces()
-            synced_count = 0
-
-            for produce_id in range(1, total_produces + 1):
-                # Check if we already have this produce
-                if Produce.objects.filter(blockchain_id=produce_id).exists():
-                    continue
-
-                # Get produce details from blockchain
-                produce_data = web3_service.get_produce_details(produce_id)
-                if not produce_data:
-                    continue
-
-                # Create produce record
-                print(f"[DEBUG] Syncing produce: {produce_data['name']} for farmer {produce_data['farmer']}")
-                Produce.objects.create(
-                    blockchain_id=produce_data['id'],
-                    contract_address=web3_service.contract_address,
-                    name=produce_data['name'],
-                    quantity=produce_data['quantity'],
-                    price_per_unit=produce_data['price_per_unit'],
-                    total_price=produce_data['total_price'],
-                    farmer_address=produce_data['farmer'].lower(),
-                    buyer_address=produce_data['buyer'] if produce_data['buyer'] != '0x0000000000000000000000000000000000000000' else None,
-                    is_sold=produce_data['is_sold'],
-                    listed_timestamp=datetime.fromtimestamp(produce_data['listed_timestamp']),
-                    sold_timestamp=datetime.fromtimestamp(produce_data['sold_timestamp']) if produce_data['sold_timestamp'] > 0 else None,
-                )
-                synced_count += 1
-
-            return Response(
-                {
-                    'message': f'Successfully synced {synced_count} produces from blockchain',
-                    'total_blockchain_produces': total_produces,
-                    'synced_count': synced_count
-                },
-                status=status.HTTP_200_OK
-            )
+        """
+        Queue a sync from the blockchain and return its job ID
+
+        By default only the contract events emitted since the last sync are
+        indexed. Pass ``?full=true`` to re-walk every produce ID instead
+        (see produce.sync.FullSync). Only one sync runs per contract; while
+        one is queued or running, its job is returned instead.
+        """
+        kind = 'full' if request.query_params.get('full', '').lower() == 'true' else 'events'
+        job, created = enqueue_sync(kind)
+        return Response(
+            {
+                'job_id': job.id,
+                'kind': job.kind,
+                'status': job.status,
+                'status_url': reverse('produce-sync-job', kwargs={'job_id': job.id}, request=request),
+                'message': 'Sync queued' if created else 'A sync is already in progress',
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
-        except Exception as e:
-            return Response(
-                {'error': f'Failed to sync from blockchain: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    @action(detail=False, methods=['get'], url_path=r'sync-jobs/(?P<job_id>\d+)', url_name='sync-job')
+    def sync_job(self, request, job_id=None):
+        """Progress of a sync job, with its counts once it finished"""
+        job = get_object_or_404(SyncJob, pk=job_id)
+        return Response(job_status(job))
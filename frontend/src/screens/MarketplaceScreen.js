@@ -16,11 +16,15 @@ import { Ionicons } from '@expo/vector-icons';
 import { produceAPI, apiUtils } from '../services/api';
 import { colors, spacing, radii, font, shadow } from '../theme';
 
+const SYNC_POLL_INTERVAL_MS = 1500;
+
 export default function MarketplaceScreen({ navigation }) {
   const [produces, setProduces] = useState([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const [filter, setFilter] = useState('all'); // 'all' or 'available'
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadProduces();
@@ -38,6 +42,7 @@ export default function MarketplaceScreen({ navigation }) {
       }
 
       setProduces(response.data.results || response.data);
+      setNextPage(response.data.next || null);
     } catch (error) {
       console.error('Failed to load produces:', error);
       const errorInfo = apiUtils.handleError(error);
@@ -47,17 +52,50 @@ export default function MarketplaceScreen({ navigation }) {
     }
   };
 
+  // Pages are cursor-based, so scrolling deep costs the same as the first page
+  const loadMore = async () => {
+    if (!nextPage || loadingMore) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const response = await produceAPI.getPage(nextPage);
+      setProduces((current) => [...current, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Failed to load more produces:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const onRefresh = async () => {
     setRefreshing(true);
     await loadProduces();
     setRefreshing(false);
   };
 
+  // The sync runs as a background job; poll it until it finishes
+  const waitForSyncJob = async (jobId) => {
+    for (;;) {
+      const { data } = await produceAPI.getSyncJob(jobId);
+      if (data.status === 'succeeded' || data.status === 'failed') {
+        return data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, SYNC_POLL_INTERVAL_MS));
+    }
+  };
+
   const syncFromBlockchain = async () => {
     try {
       setLoading(true);
       const response = await produceAPI.syncFromBlockchain();
-      Alert.alert('Success', response.data.message);
+      const job = await waitForSyncJob(response.data.job_id);
+      if (job.status === 'failed') {
+        Alert.alert('Error', job.message);
+      } else {
+        Alert.alert('Success', job.message);
+      }
       await loadProduces();
     } catch (error) {
       const errorInfo = apiUtils.handleError(error);
@@ -184,6 +222,11 @@ export default function MarketplaceScreen({ navigation }) {
         refreshControl={
           <RefreshControl refreshing={refreshing} onRefresh={onRefresh} />
         }
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={
+          loadingMore ? <ActivityIndicator style={{ margin: spacing.md }} color={colors.primary} /> : null
+        }
         contentContainerStyle={styles.listContainer}
         showsVerticalScrollIndicator={false}
       />
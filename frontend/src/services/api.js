@@ -88,18 +88,30 @@ export const produceAPI = {
   
   // Get available produces only
   getAvailable: () => api.get('/produces/available/'),
+
+  // Follow a list's `next` cursor link to the following page
+  getPage: (url) => api.get(url),
   
   // Get specific produce by ID
   getById: (id) => api.get(`/produces/${id}/`),
   
-  // Create new produce listing
+  // Queue new produce listing (202, returns an outbox_id)
   create: (produceData) => api.post('/produces/', produceData),
+
+  // Queue up to 50 lots as one listProduceBatch transaction
+  createBatch: (items) => api.post('/produces/bulk/', { items }),
+
+  // Dispatch status of a queued listing (transaction hash once sent)
+  getOutboxStatus: (outboxId) => api.get(`/produces/outbox/${outboxId}/`),
   
   // Purchase produce
   purchase: (id, purchaseData) => api.post(`/produces/${id}/purchase/`, purchaseData),
   
   // Sync from blockchain
   syncFromBlockchain: () => api.post('/produces/sync_from_blockchain/'),
+
+  // Progress of a queued sync (counts once it finished)
+  getSyncJob: (jobId) => api.get(`/produces/sync-jobs/${jobId}/`),
   
   // Filter produces
   filter: (params) => api.get('/produces/', { params }),